@@ -0,0 +1,86 @@
+import time
+import traceback
+from plico.utils.control_loop import FaultTolerantControlLoop
+
+
+class AdaptiveRateControlLoop(FaultTolerantControlLoop):
+    '''
+    Fault tolerant control loop whose period is chosen by the steppable.
+
+    After every step the loop sleeps for steppable.loopPeriod() seconds
+    instead of a fixed period.
+    '''
+
+    def __init__(self,
+                 steppable,
+                 logger,
+                 timeModule=time):
+        FaultTolerantControlLoop.__init__(self, steppable, logger,
+                                          timeModule)
+
+    def start(self):
+        while self._isAlive():
+            try:
+                self._steppable.step()
+            except Exception as e:
+                traceback.print_exc()
+                self._logger.error(str(e))
+            self._timeModule.sleep(self._steppable.loopPeriod())
+
+
+class LoopRateScheduler(object):
+    '''
+    Choose the control loop period from the motion state.
+
+    The fast period is used while any axis is moving or a command
+    arrived less than <activityHoldSec> seconds ago. Afterwards the
+    period grows by <decayFactor> at every step, up to the idle period.
+    '''
+
+    def __init__(self,
+                 fastPeriodSec=0.02,
+                 idlePeriodSec=0.1,
+                 activityHoldSec=2.0,
+                 decayFactor=1.5,
+                 timeMod=time):
+        assert fastPeriodSec <= idlePeriodSec
+        self._fastPeriodSec = fastPeriodSec
+        self._idlePeriodSec = idlePeriodSec
+        self._activityHoldSec = activityHoldSec
+        self._decayFactor = decayFactor
+        self._timeMod = timeMod
+        self._lastActivityTime = None
+        self._period = fastPeriodSec
+
+    def notifyCommand(self):
+        self._lastActivityTime = self._timeMod.time()
+
+    def update(self, anyAxisMoving):
+        '''
+        Recompute the loop period after a step
+
+        Parameters
+        ----------
+        anyAxisMoving: bool
+            True if any axis was reported as moving in the last status
+        '''
+        if anyAxisMoving:
+            self._lastActivityTime = self._timeMod.time()
+        if self._isActive():
+            self._period = self._fastPeriodSec
+        else:
+            self._period = min(self._period * self._decayFactor,
+                               self._idlePeriodSec)
+        return self._period
+
+    def _isActive(self):
+        if self._lastActivityTime is None:
+            return False
+        elapsed = self._timeMod.time() - self._lastActivityTime
+        return elapsed < self._activityHoldSec
+
+    def period(self):
+        return self._period
+
+    def rate(self):
+        return 1.0 / self._period
@@ -1,12 +1,24 @@
+import threading
 import time
+import numpy as np
 from plico.utils.hackerable import Hackerable
 from plico.utils.snapshotable import Snapshotable
 from plico.utils.stepable import Stepable
 from plico.utils.serverinfoable import ServerInfoable
 from plico.utils.logger import Logger
-from plico.utils.decorator import override, logEnterAndExit
+from plico.utils.decorator import override, logEnterAndExit, synchronized
 from plico.utils.timekeeper import TimeKeeper
-from plico_motor.types.motor_status import MotorStatus
+from plico_motor_server.controller.status_cache import MotorStatusCache
+from plico_motor_server.controller.status_poller import StatusPoller
+from plico_motor_server.controller.delta_status import DeltaStatusEncoder
+from plico_motor_server.controller.adaptive_control_loop import \
+    LoopRateScheduler
+from plico_motor_server.controller.motion_jobs import MotionJobRunner, \
+    MotionJob
+from plico_motor_server.utils.latency_histogram import LoopStatistics
+from plico_motor_server.utils.position_history import PositionHistory
+from plico_motor_server.controller.waypoint_queue import WaypointQueue, \
+    WaypointQueueException
 
 
 class MotorController(Stepable,
@@ -21,7 +33,17 @@ class MotorController(Stepable,
                  replySocket,
                  statusSocket,
                  rpcHandler,
-                 timeMod=time):
+                 timeMod=time,
+                 statusCacheTtlSec=1.0,
+                 statusPollingPeriodSec=None,
+                 statusPublishMode='full',
+                 statusKeyframePeriodSec=1.0,
+                 fastLoopPeriodSec=0.02,
+                 idleLoopPeriodSec=0.1,
+                 activityHoldSec=2.0,
+                 nonBlockingMotion=False,
+                 statisticsLogPeriodSec=60,
+                 positionHistorySamples=1000):
         self._motor = motor
         self._replySocket = replySocket
         self._statusSocket = statusSocket
@@ -35,21 +57,99 @@ class MotorController(Stepable,
         self._isTerminated = False
         self._stepCounter = 0
         self._timekeep = TimeKeeper()
+        self._loopStatistics = LoopStatistics()
+        self._statisticsLogPeriodSec = statisticsLogPeriodSec
+        self._lastStatisticsLogTime = timeMod.time()
+        self._statusCache = MotorStatusCache(motor,
+                                             ttlSec=statusCacheTtlSec,
+                                             timeMod=timeMod,
+                                             statistics=self._loopStatistics)
+        self._waypointQueues = {}
+        self._positionHistorySamples = positionHistorySamples
+        self._positionHistory = {}
+        self._motorLock = threading.RLock()
+        self._loopScheduler = LoopRateScheduler(fastLoopPeriodSec,
+                                                idleLoopPeriodSec,
+                                                activityHoldSec,
+                                                timeMod=timeMod)
+        self._anyAxisMoving = False
+        self._lastStatus = None
+        self._lastStatusTime = None
+        self._pendingWaits = {}
+        self._jobRunner = MotionJobRunner(nonBlocking=nonBlockingMotion,
+                                          deviceLock=self._commandLock(),
+                                          timeMod=timeMod)
+        self._statusPoller = None
+        if statusPollingPeriodSec is not None:
+            self._statusPoller = StatusPoller(self._getMotorStatus,
+                                              statusPollingPeriodSec,
+                                              self._motorLock,
+                                              timeMod=timeMod)
+            self._statusPoller.start()
+        if statusPublishMode == 'full':
+            self._deltaEncoder = None
+        elif statusPublishMode == 'delta':
+            self._deltaEncoder = DeltaStatusEncoder(statusKeyframePeriodSec,
+                                                    timeMod=timeMod)
+        else:
+            raise ValueError('Unsupported status publish mode %s' %
+                             statusPublishMode)
 
     @override
     def step(self):
-        self._rpcHandler.handleRequest(self, self._replySocket, multi=True)
-        self._publishStatus()
+        with self._loopStatistics.timing('step'):
+            with self._loopStatistics.timing('rpc'):
+                self._rpcHandler.handleRequest(self, self._replySocket,
+                                               multi=True)
+            self._publishStatus()
+            with self._loopStatistics.timing('waypoints'):
+                self._advanceWaypointQueues()
+            self._resolvePendingWaits()
+            self._loopScheduler.update(self._anyAxisMoving)
         if self._timekeep.inc():
             self._logger.notice(
-                'Stepping at %5.2f Hz' % (self._timekeep.rate))
+                'Stepping at %5.2f Hz (target %5.2f Hz)' % (
+                    self._timekeep.rate, self._loopScheduler.rate()))
+        self._logLoopStatisticsIfDue()
         self._stepCounter += 1
 
     def getStepCounter(self):
         return self._stepCounter
 
+    def getLoopStatistics(self):
+        '''
+        Returns
+        -------
+        statistics: dict
+            {phase: {'count', 'mean', 'p50', 'p99', 'max'}} with times
+            in seconds. Phases are 'step', 'rpc', 'status', 'publish',
+            'waypoints' and one 'device.<query>' entry per device query.
+        '''
+        return self._loopStatistics.summary()
+
+    def resetLoopStatistics(self):
+        self._loopStatistics.reset()
+
+    def _logLoopStatisticsIfDue(self):
+        now = self._timeMod.time()
+        if now - self._lastStatisticsLogTime >= self._statisticsLogPeriodSec:
+            self._logger.notice('Loop statistics: %s' %
+                                self._loopStatistics.format())
+            self._lastStatisticsLogTime = now
+
+    def loopPeriod(self):
+        return self._loopScheduler.period()
+
+    def serverInfo(self):
+        info = ServerInfoable.serverInfo(self)
+        info.loopRateHz = self._loopScheduler.rate()
+        return info
+
     def terminate(self):
         self._logger.notice("Got request to terminate")
+        if self._statusPoller is not None:
+            self._statusPoller.stop()
+        self._jobRunner.shutdown()
         try:
             for i in range(self._motor.naxes()):
                 self._motor.stop(axis=i + 1)
@@ -63,48 +163,371 @@ class MotorController(Stepable,
     def isTerminated(self):
         return self._isTerminated
 
+    def _commandLock(self):
+        if self._motor.THREAD_SAFE:
+            return None
+        return self._motorLock
+
+    def _lastKnownPosition(self, axis):
+        if isinstance(axis, list):
+            return {a: self._lastKnownPosition(a) for a in axis}
+        status = self._lastStatus
+        if status is None or axis is None or axis > len(status):
+            return None
+        return status[axis - 1].position
+
+    def _submitJob(self, axis, command, func, target=None):
+        def job():
+            try:
+                func()
+            finally:
+                self._commandDone(axis)
+        self._loopScheduler.notifyCommand()
+        return self._jobRunner.submit(axis, command, job, target,
+                                      self._lastKnownPosition(axis))
+
     @logEnterAndExit('Entering home', 'Homing executed')
     def home(self, axis):
-        self._motor.home(axis)
+        return self._submitJob(axis, 'home',
+                               lambda: self._motor.home(axis))
 
     @logEnterAndExit('Entering move_to', 'move_to executed')
     def move_to(self, axis, position_in_steps):
-        self._motor.move_to(axis, position_in_steps)
-        self._logger.notice("moved axis %d to %g" % (axis, position_in_steps))
+        def move():
+            self._motor.move_to(axis, position_in_steps)
+            self._logger.notice("moved axis %d to %g" % (
+                axis, position_in_steps))
+        return self._submitJob(axis, 'move_to', move, position_in_steps)
 
     @logEnterAndExit('Entering move_by', 'move_by executed')
     def move_by(self, axis, delta_position_in_steps):
-        curpos = self._motor.position(axis)
-        self._motor.move_to(axis, curpos + delta_position_in_steps)
+        def move():
+            self._motor.move_by(axis, delta_position_in_steps)
+        target = self._lastKnownPosition(axis)
+        if target is not None:
+            target += delta_position_in_steps
+        return self._submitJob(axis, 'move_by', move, target)
+
+    @logEnterAndExit('Entering move_to_many', 'move_to_many executed')
+    def move_to_many(self, positions, wait_settled=False,
+                     timeout_in_sec=30):
+        '''
+        Command several axes within a single RPC, as one motion job
+        on all of them
+
+        Parameters
+        ----------
+        positions: dict
+            {axis: position in steps}
+        wait_settled: bool
+            if True, the job is 'done' only when all axes stopped
+            moving, and 'failed' if they are still moving after
+            <timeout_in_sec>
+        timeout_in_sec: float
+            maximum wait time when <wait_settled> is True
+
+        Returns
+        -------
+        job_id: int
+            identifier of the job, to be used with job_status
+        '''
+        axes = list(positions.keys())
+        self._checkAxes(axes)
+
+        def move():
+            try:
+                self._motor.move_to_many(positions)
+            finally:
+                for axis in axes:
+                    self._commandDone(axis)
+            self._logger.notice("moved axes %s" % str(positions))
+        self._loopScheduler.notifyCommand()
+        jobId = self._jobRunner.submitMany(
+            axes, 'move_to_many', move, dict(positions),
+            self._lastKnownPosition(axes), settle=wait_settled)
+        if wait_settled:
+            self._startWait(axes, timeout_in_sec, jobId)
+        return jobId
+
+    def _callWithCommandLock(self, func, *args):
+        lock = self._commandLock()
+        if lock is None:
+            return func(*args)
+        with lock:
+            return func(*args)
+
+    def _checkAxes(self, axes):
+        naxes = self._motor.naxes()
+        for axis in axes:
+            if not 1 <= axis <= naxes:
+                raise ValueError('Axis %d out of range 1-%d' % (axis, naxes))
+
+    def _startWait(self, axes, timeoutSec, jobId=None):
+        '''
+        Resolve job <jobId>, or a new wait_motion_done job, when <axes>
+        stop moving
+        '''
+        if jobId is None:
+            self._checkAxes(axes)
+            jobId = self._jobRunner.newWait(axes[0], 'wait_motion_done')
+        now = self._timeMod.time()
+        self._pendingWaits[jobId] = (axes, now, now + timeoutSec, timeoutSec)
+        self._loopScheduler.notifyCommand()
+        return jobId
+
+    def _motionDone(self, axes, since):
+        '''
+        True if the last status shows <axes> stopped, and was read
+        after <since> and after the end of their motion jobs
+        '''
+        # A queued motion job may not have reached the device yet
+        if self._jobRunner.hasActiveJobs(axes):
+            return False
+        statusTime = self._lastStatusTime
+        if statusTime is None or statusTime < since:
+            return False
+        endTime = self._jobRunner.lastEndTime(axes)
+        if endTime is not None and statusTime < endTime:
+            return False
+        return not any(self._lastStatus[axis - 1].is_moving for axis in axes)
+
+    def _resolvePendingWaits(self):
+        if not self._pendingWaits:
+            return
+        now = self._timeMod.time()
+        for jobId, wait in list(self._pendingWaits.items()):
+            axes, since, deadline, timeoutSec = wait
+            if self._jobRunner.isFinished(jobId):
+                # The command of the job failed
+                del self._pendingWaits[jobId]
+            elif self._motionDone(axes, since):
+                del self._pendingWaits[jobId]
+                self._jobRunner.finishWait(jobId)
+            elif now >= deadline:
+                del self._pendingWaits[jobId]
+                message = 'Axes %s still moving after %g s' % (
+                    str(axes), timeoutSec)
+                self._jobRunner.finishWait(jobId, message)
+                self._logger.warn(message)
+
+    @logEnterAndExit('Entering wait_motion_done', 'wait_motion_done executed')
+    def wait_motion_done(self, axis, timeout_in_sec=30):
+        '''
+        Start waiting for <axis> to complete its motion.
+
+        The wait is resolved by the control loop from the published
+        status, so that the loop keeps serving other requests: poll
+        job_status with the returned id. The job is 'done' when the
+        axis stopped, 'failed' if it is still moving after
+        <timeout_in_sec>.
+
+        Returns
+        -------
+        job_id: int
+            identifier of the wait, to be used with job_status
+        '''
+        return self._startWait([axis], timeout_in_sec)
 
+    def queue_waypoints(self, axis, positions, dwell_s=0):
+        '''
+        Load a list of positions to be visited by <axis>, waiting
+        <dwell_s> seconds at each of them. Use start_queue to run it.
+        '''
+        queue = self._waypointQueues.get(axis)
+        if queue is not None and queue.isActive():
+            raise WaypointQueueException(
+                'Waypoint queue of axis %d is running' % axis)
+        self._waypointQueues[axis] = WaypointQueue(axis, positions, dwell_s)
+        self._logger.notice('Loaded %d waypoints on axis %d' % (
+            len(positions), axis))
+
+    def start_queue(self, axis=None):
+        '''
+        Start the waypoint queue of <axis>, or all loaded queues
+        '''
+        now = self._timeMod.time()
+        for queueAxis in self._queueAxes(axis):
+            queue = self._waypointQueues[queueAxis]
+            if axis is not None or queue.state() == WaypointQueue.LOADED:
+                queue.start(now)
+        self._loopScheduler.notifyCommand()
+
+    def abort_queue(self, axis=None):
+        '''
+        Stop advancing the waypoint queue of <axis>, or of all axes.
+        A motion in progress is not interrupted: use stop() for that.
+        '''
+        for queueAxis in self._queueAxes(axis):
+            self._waypointQueues[queueAxis].abort()
+
+    def queue_status(self, axis):
+        return self._waypointQueues[axis].progress()
+
+    def _queueAxes(self, axis):
+        if axis is None:
+            return list(self._waypointQueues.keys())
+        if axis not in self._waypointQueues:
+            raise WaypointQueueException(
+                'No waypoints loaded on axis %d' % axis)
+        return [axis]
+
+    def _advanceWaypointQueues(self):
+        for axis, queue in self._waypointQueues.items():
+            if not queue.isActive():
+                continue
+            try:
+                self._advanceWaypointQueue(axis, queue)
+            except Exception as e:
+                queue.fail(str(e))
+                self._logger.error(
+                    'Waypoint queue of axis %d failed: %s' % (axis, str(e)))
+
+    def _advanceWaypointQueue(self, axis, queue):
+        if queue.isMoving():
+            job = self._jobRunner.jobStatus(queue.jobId())
+            if job['state'] == MotionJob.FAILED:
+                queue.fail(job['error'])
+                return
+            if job['state'] != MotionJob.DONE:
+                return
+            # Use the status read in this step: no extra device query
+            if not self._motionDone([axis], job['end_time']):
+                return
+            queue.motionDone(self._timeMod.time())
+        position = queue.nextPosition(self._timeMod.time())
+        if position is not None:
+            jobId = self._submitJob(
+                axis, 'waypoint',
+                lambda: self._motor.move_to(axis, position), position)
+            queue.motionStarted(jobId)
+
+    @logEnterAndExit('Entering stop', 'stop executed')
+    def stop(self, axis):
+        '''
+        Stop <axis> immediately, without waiting for running motion jobs
+        '''
+        try:
+            self._callWithCommandLock(self._motor.stop, axis)
+        finally:
+            self._commandDone(axis)
+
+    def job_status(self, job_id):
+        '''
+        Returns
+        -------
+        job: dict
+            state ('queued', 'running', 'done' or 'failed'), progress
+            between 0 and 1 and error message of motion job <job_id>
+        '''
+        axis = self._jobRunner.jobAxis(job_id)
+        return self._jobRunner.jobStatus(job_id,
+                                         self._lastKnownPosition(axis))
+
+    @synchronized('_motorLock')
     @logEnterAndExit('Entering set_velocity', 'set_velocity executed')
     def set_velocity(self, axis, velocity_in_steps_per_second):
-        self._motor.set_velocity(axis, velocity_in_steps_per_second)
+        try:
+            self._motor.set_velocity(axis, velocity_in_steps_per_second)
+        finally:
+            self._commandDone(axis)
         self._logger.notice("set axis %d velocity to %g" % (axis, velocity_in_steps_per_second))
 
+    def _commandDone(self, axis):
+        self._statusCache.invalidate(axis)
+        self._loopScheduler.notifyCommand()
+
     def _getMotorStatus(self):
-        axisStatus = []
-        for i in range(self._motor.naxes()):
-            axis = i + 1
-            motorStatus = MotorStatus(
-                self._motor.name(),
-                self._motor.position(axis),
-                self._motor.velocity(axis),
-                self._motor.steps_per_SI_unit(axis),
-                self._motor.was_homed(axis),
-                self._motor.type(axis),
-                self._motor.is_moving(axis),
-                self._motor.last_commanded_position(axis),
-                axis
-            )
-            axisStatus.append(motorStatus)
+        axes = [i + 1 for i in range(self._motor.naxes())]
+        axisStatus = self._statusCache.statusAllAxes(axes)
+        self._recordPositionHistory(axisStatus)
+        for motorStatus in axisStatus:
+            motorStatus.motion_job = self._jobRunner.lastJob(
+                motorStatus.axisno, motorStatus.position)
+            queue = self._waypointQueues.get(motorStatus.axisno)
+            motorStatus.waypoint_queue = \
+                queue.progress() if queue is not None else None
             self._logger.debug(
-                "Axis %d status %s" % (axis, motorStatus.as_dict()))
+                "Axis %d status %s" % (motorStatus.axisno,
+                                       motorStatus.as_dict()))
         return axisStatus
 
+    def _recordPositionHistory(self, axisStatus):
+        if not self._positionHistorySamples:
+            return
+        now = self._timeMod.time()
+        for motorStatus in axisStatus:
+            history = self._positionHistory.get(motorStatus.axisno)
+            if history is None:
+                history = PositionHistory(self._positionHistorySamples)
+                self._positionHistory[motorStatus.axisno] = history
+            history.append(now, motorStatus.position, motorStatus.is_moving)
+
+    def get_position_history(self, axis, since=None, max_samples=None):
+        '''
+        Positions of <axis> recorded at every status read
+
+        Parameters
+        ----------
+        since: float or None
+            return only the samples taken after this time
+        max_samples: int or None
+            return at most the <max_samples> oldest of them. Call again
+            with <since> set to the last returned timestamp to get the
+            following ones.
+
+        Returns
+        -------
+        history: numpy structured array
+            fields 'timestamp', 'position' and 'is_moving', oldest first
+        '''
+        if not 1 <= axis <= self._motor.naxes():
+            raise ValueError('Axis %d out of range 1-%d' % (
+                axis, self._motor.naxes()))
+        history = self._positionHistory.get(axis)
+        if history is None:
+            return np.zeros(0, dtype=PositionHistory.DTYPE)
+        return history.samples(since, max_samples)
+
+    def getStatusCacheStatistics(self):
+        return self._statusCache.statistics()
+
+    def resetStatusCacheStatistics(self):
+        self._statusCache.resetStatistics()
+
+    def _latestMotorStatus(self):
+        if self._statusPoller is None:
+            with self._motorLock:
+                return self._getMotorStatus()
+        return self._statusPoller.latestStatus()
+
     def _publishStatus(self):
-        self._rpcHandler.publishPickable(self._statusSocket,
-                                         self._getMotorStatus())
+        with self._loopStatistics.timing('status'):
+            statusTime = self._timeMod.time()
+            status = self._latestMotorStatus()
+        if status is None:
+            return
+        if self._statusPoller is not None:
+            statusTime = self._timeMod.time() - \
+                self._statusPoller.snapshotAge()
+        self._lastStatus = status
+        self._lastStatusTime = statusTime
+        self._anyAxisMoving = any(s.is_moving for s in status) or \
+            self._jobRunner.hasActiveJobs() or \
+            any(q.isActive() for q in self._waypointQueues.values())
+        if self._deltaEncoder is not None:
+            status = self._deltaEncoder.encode(status)
+            if status is None:
+                return
+        with self._loopStatistics.timing('publish'):
+            self._rpcHandler.publishPickable(self._statusSocket, status)
+
+    def requestStatusKeyframe(self):
+        '''
+        Force a full status keyframe at the next step.
+        Used by delta-mode subscribers after detecting a gap.
+        '''
+        if self._deltaEncoder is not None:
+            self._deltaEncoder.requestKeyframe()
 
     def getSnapshot(self, prefix):
         assert False, 'Should not be used, client uses getStatus instead'
@@ -0,0 +1,119 @@
+import time
+
+
+class DeltaStatusEncoder(object):
+    '''
+    Change-only encoding of the motor status stream.
+
+    A full keyframe with the status of every axis is produced every
+    <keyframePeriodSec> seconds, or on request. Between keyframes only
+    the axes whose fields changed since the last published message are
+    sent; nothing is sent when no axis changed.
+
+    Every message is a dict::
+
+        {'seq': int,          # incremented at every published message
+         'type': 'keyframe' or 'delta',
+         'timestamp': float,
+         'status': {axisno: MotorStatus}}
+
+    Subscribers detecting a gap in 'seq' should ask the server for a
+    new keyframe (see MotorController.requestStatusKeyframe).
+    '''
+
+    KEYFRAME = 'keyframe'
+    DELTA = 'delta'
+
+    def __init__(self, keyframePeriodSec=1.0, timeMod=time):
+        self._keyframePeriodSec = keyframePeriodSec
+        self._timeMod = timeMod
+        self._seq = 0
+        self._lastKeyframeTime = None
+        self._keyframeRequested = True
+        self._published = {}
+
+    def requestKeyframe(self):
+        self._keyframeRequested = True
+
+    def _isKeyframeDue(self, now):
+        if self._keyframeRequested or self._lastKeyframeTime is None:
+            return True
+        return now - self._lastKeyframeTime >= self._keyframePeriodSec
+
+    def _hasChanged(self, status):
+        last = self._published.get(status.axisno)
+        return last is None or last != vars(status)
+
+    def encode(self, axisStatus):
+        '''
+        Parameters
+        ----------
+        axisStatus: list of MotorStatus
+            current status of every axis
+
+        Returns
+        -------
+        message: dict or None
+            message to be published, None if there is nothing to send
+        '''
+        now = self._timeMod.time()
+        if self._isKeyframeDue(now):
+            msgType = self.KEYFRAME
+            toSend = axisStatus
+            self._lastKeyframeTime = now
+            self._keyframeRequested = False
+        else:
+            msgType = self.DELTA
+            toSend = [s for s in axisStatus if self._hasChanged(s)]
+            if len(toSend) == 0:
+                return None
+        for status in toSend:
+            self._published[status.axisno] = dict(vars(status))
+        self._seq += 1
+        return {'seq': self._seq,
+                'type': msgType,
+                'timestamp': now,
+                'status': {s.axisno: s for s in toSend}}
+
+
+class DeltaStatusGapException(Exception):
+    pass
+
+
+class DeltaStatusDecoder(object):
+    '''
+    Subscriber-side counterpart of DeltaStatusEncoder.
+
+    Rebuilds the full status list from keyframes and deltas.
+    Raises DeltaStatusGapException when a message is lost: the
+    subscriber must then request a keyframe and keep feeding
+    messages, which are ignored until the keyframe arrives.
+    '''
+
+    def __init__(self):
+        self._lastSeq = None
+        self._status = None
+
+    def apply(self, message):
+        '''
+        Returns
+        -------
+        status: list of MotorStatus or None
+            current status of every axis, None while waiting for a keyframe
+        '''
+        seq = message['seq']
+        if message['type'] == DeltaStatusEncoder.KEYFRAME:
+            self._status = dict(message['status'])
+        elif self._status is None:
+            self._lastSeq = seq
+            return None
+        elif seq != self._lastSeq + 1:
+            errMsg = 'Lost status messages %d-%d' % (self._lastSeq + 1,
+                                                     seq - 1)
+            self._status = None
+            self._lastSeq = seq
+            raise DeltaStatusGapException(errMsg)
+        else:
+            self._status.update(message['status'])
+        self._lastSeq = seq
+        return [self._status[axis] for axis in sorted(self._status)]
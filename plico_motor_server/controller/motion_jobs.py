@@ -0,0 +1,365 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from plico.utils.logger import Logger
+from plico.utils.decorator import synchronized
+
+
+class MotionJob(object):
+    '''
+    A motion command (home, move_to, move_by, ...) tracked by id.
+
+    Jobs on several axes have a list of axes, and target and start
+    positions as {axis: position} dicts.
+
+    A job submitted with <settle> stays running after its command,
+    until the caller reports the end of the motion with finishWait().
+    '''
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    def __init__(self, jobId, axis, command, target=None,
+                 startPosition=None, submitTime=None, settle=False):
+        self.jobId = jobId
+        self.axis = axis
+        self.command = command
+        self.target = target
+        self.startPosition = startPosition
+        self.settle = settle
+        self.state = self.QUEUED
+        self.error = None
+        self.submitTime = submitTime
+        self.startTime = None
+        self.commandEndTime = None
+        self.endTime = None
+
+    def axes(self):
+        if isinstance(self.axis, list):
+            return self.axis
+        return [self.axis]
+
+    def isFinished(self):
+        return self.state in (self.DONE, self.FAILED)
+
+    def isCommandPending(self):
+        '''
+        True if the command is queued or running on the device
+        '''
+        return not self.isFinished() and self.commandEndTime is None
+
+    def progress(self, currentPosition=None, axis=None):
+        '''
+        Parameters
+        ----------
+        currentPosition: float, dict or None
+            position of the axis, or {axis: position} for jobs on
+            several axes
+        axis: int or None
+            for jobs on several axes, report the progress of <axis>
+            only; <currentPosition> is then the position of <axis>
+
+        Returns
+        -------
+        progress: float
+            fraction of the motion completed, between 0 and 1.
+            Intermediate values are available only for jobs with
+            a known start and target position.
+        '''
+        if self.isFinished():
+            return 1.0
+        if self.state == self.QUEUED:
+            return 0.0
+        if not isinstance(self.target, dict):
+            return _fraction(self.startPosition, self.target,
+                             currentPosition)
+        if axis is not None:
+            return _fraction(self.startPosition.get(axis),
+                             self.target.get(axis), currentPosition)
+        if currentPosition is None:
+            return 0.0
+        return min(_fraction(self.startPosition.get(a), self.target[a],
+                             currentPosition.get(a))
+                   for a in self.target)
+
+    def asDict(self, currentPosition=None, axis=None):
+        return {'job_id': self.jobId,
+                'axis': self.axis,
+                'command': self.command,
+                'target': self.target,
+                'state': self.state,
+                'progress': self.progress(currentPosition, axis),
+                'error': self.error,
+                'submit_time': self.submitTime,
+                'start_time': self.startTime,
+                'end_time': self.endTime}
+
+
+def _fraction(startPosition, target, currentPosition):
+    if currentPosition is None or target is None or startPosition is None:
+        return 0.0
+    distance = target - startPosition
+    if distance == 0:
+        return 0.0
+    fraction = (currentPosition - startPosition) / distance
+    return min(max(fraction, 0.0), 1.0)
+
+
+class MotionJobRunner(object):
+    '''
+    Execute motion commands and keep track of their state.
+
+    In blocking mode commands run in the caller thread, and any
+    exception is propagated to the caller after being recorded in the job.
+    In non-blocking mode commands are queued on a worker thread per axis:
+    commands on the same axis run in submission order, while different
+    axes proceed concurrently. A command on several axes waits for the
+    commands submitted before it on all of them, and holds back those
+    submitted after it.
+
+    If <deviceLock> is given, it is held while a command runs.
+    '''
+
+    def __init__(self,
+                 nonBlocking=False,
+                 deviceLock=None,
+                 maxJobHistory=1000,
+                 timeMod=time):
+        self._nonBlocking = nonBlocking
+        self._deviceLock = deviceLock
+        self._maxJobHistory = maxJobHistory
+        self._timeMod = timeMod
+        self._logger = Logger.of('MotionJobRunner')
+        self._jobsLock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._lastJobByAxis = {}
+        self._executors = {}
+        self._submitLock = threading.Lock()
+        self._barriers = set()
+        self._nextJobId = 1
+
+    def isNonBlocking(self):
+        return self._nonBlocking
+
+    @synchronized('_jobsLock')
+    def _newJob(self, axis, command, target, startPosition, settle=False):
+        job = MotionJob(self._nextJobId, axis, command, target,
+                        startPosition, self._timeMod.time(), settle)
+        self._nextJobId += 1
+        self._jobs[job.jobId] = job
+        for jobAxis in job.axes():
+            self._lastJobByAxis[jobAxis] = job
+        while len(self._jobs) > self._maxJobHistory:
+            self._jobs.popitem(last=False)
+        return job
+
+    def _executor(self, axis):
+        if axis not in self._executors:
+            self._executors[axis] = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix='MotionJobAxis%d' % axis)
+        return self._executors[axis]
+
+    def submit(self, axis, command, func, target=None, startPosition=None):
+        '''
+        Run <func> (no arguments) as a motion job on <axis>
+
+        Returns
+        -------
+        job_id: int
+            identifier of the job, to be used with jobStatus()
+        '''
+        job = self._newJob(axis, command, target, startPosition)
+        if self._nonBlocking:
+            with self._submitLock:
+                self._executor(axis).submit(self._run, job, func, False)
+        else:
+            self._run(job, func, True)
+        return job.jobId
+
+    def submitMany(self, axes, command, func, targets=None,
+                   startPositions=None, settle=False):
+        '''
+        Run <func> (no arguments) as a single motion job on <axes>
+
+        Parameters
+        ----------
+        targets, startPositions: dict or None
+            {axis: position}
+        settle: bool
+            if True, the job stays running after <func> until it is
+            completed with finishWait()
+
+        Returns
+        -------
+        job_id: int
+            identifier of the job, to be used with jobStatus()
+        '''
+        axes = list(axes)
+        job = self._newJob(axes, command, targets, startPositions, settle)
+        if not self._nonBlocking:
+            self._run(job, func, True)
+            return job.jobId
+        # The same order on all the axis queues, or two jobs on the
+        # same axes would wait for each other
+        with self._submitLock:
+            barrier = threading.Barrier(len(axes))
+            with self._jobsLock:
+                self._barriers.add(barrier)
+            for i, axis in enumerate(axes):
+                self._executor(axis).submit(
+                    self._runOnAxes, job, func, barrier, i == 0)
+        return job.jobId
+
+    def _runOnAxes(self, job, func, barrier, leader):
+        # Every axis worker waits for the previous jobs of its axis.
+        # Once all are here, the first one runs the job while the
+        # others stay blocked until it is over.
+        try:
+            barrier.wait()
+            if leader:
+                self._run(job, func, False)
+            barrier.wait()
+        except threading.BrokenBarrierError:
+            if leader and not job.isFinished():
+                self._fail(job, 'Aborted')
+        finally:
+            if leader:
+                with self._jobsLock:
+                    self._barriers.discard(barrier)
+
+    def _call(self, func):
+        if self._deviceLock is None:
+            return func()
+        with self._deviceLock:
+            return func()
+
+    def _run(self, job, func, reraise):
+        with self._jobsLock:
+            job.state = MotionJob.RUNNING
+            job.startTime = self._timeMod.time()
+        try:
+            self._call(func)
+        except Exception as e:
+            self._fail(job, str(e))
+            if reraise:
+                raise
+        else:
+            with self._jobsLock:
+                job.commandEndTime = self._timeMod.time()
+                if not job.settle:
+                    job.state = MotionJob.DONE
+                    job.endTime = job.commandEndTime
+            self._logger.notice('Job %d (%s axis %s) %s' % (
+                job.jobId, job.command, str(job.axis),
+                'settling' if job.settle else 'done'))
+
+    def _fail(self, job, error):
+        with self._jobsLock:
+            job.state = MotionJob.FAILED
+            job.error = error
+            job.commandEndTime = job.endTime = self._timeMod.time()
+        self._logger.error('Job %d (%s axis %s) failed: %s' % (
+            job.jobId, job.command, str(job.axis), error))
+
+    @synchronized('_jobsLock')
+    def jobStatus(self, jobId, currentPosition=None):
+        if jobId not in self._jobs:
+            raise KeyError('Unknown motion job %s' % str(jobId))
+        return self._jobs[jobId].asDict(currentPosition)
+
+    @synchronized('_jobsLock')
+    def lastJob(self, axis, currentPosition=None):
+        '''
+        Returns
+        -------
+        job: dict or None
+            status of the last job submitted on <axis>, with the
+            progress of <axis> for jobs on several axes
+        '''
+        job = self._lastJobByAxis.get(axis)
+        if job is None:
+            return None
+        return job.asDict(currentPosition, axis)
+
+    @synchronized('_jobsLock')
+    def newWait(self, axis, command):
+        '''
+        Create a job that is completed by the caller with finishWait(),
+        e.g. to wait for the end of a motion. It is not the last job
+        of its axis, and is never considered active by hasActiveJobs().
+
+        Returns
+        -------
+        job_id: int
+            identifier of the job, to be used with jobStatus()
+        '''
+        now = self._timeMod.time()
+        job = MotionJob(self._nextJobId, axis, command, submitTime=now)
+        job.state = MotionJob.RUNNING
+        job.startTime = now
+        self._nextJobId += 1
+        self._jobs[job.jobId] = job
+        while len(self._jobs) > self._maxJobHistory:
+            self._jobs.popitem(last=False)
+        return job.jobId
+
+    @synchronized('_jobsLock')
+    def finishWait(self, jobId, error=None):
+        '''
+        Complete a job created by newWait(), or submitted with <settle>.
+        A job that already failed is left unchanged.
+        '''
+        job = self._jobs.get(jobId)
+        if job is None or job.isFinished():
+            return
+        job.state = MotionJob.DONE if error is None else MotionJob.FAILED
+        job.error = error
+        job.endTime = self._timeMod.time()
+
+    @synchronized('_jobsLock')
+    def lastEndTime(self, axes):
+        '''
+        Returns
+        -------
+        end_time: float or None
+            latest end time of the last jobs of <axes>
+        '''
+        times = [job.commandEndTime
+                 for axis, job in self._lastJobByAxis.items()
+                 if axis in axes and job.commandEndTime is not None]
+        return max(times) if times else None
+
+    @synchronized('_jobsLock')
+    def isFinished(self, jobId):
+        if jobId not in self._jobs:
+            raise KeyError('Unknown motion job %s' % str(jobId))
+        return self._jobs[jobId].isFinished()
+
+    @synchronized('_jobsLock')
+    def jobAxis(self, jobId):
+        if jobId not in self._jobs:
+            raise KeyError('Unknown motion job %s' % str(jobId))
+        return self._jobs[jobId].axis
+
+    @synchronized('_jobsLock')
+    def hasActiveJobs(self, axes=None):
+        '''
+        True if the last job of any of <axes> (default: all axes)
+        is queued or running on the device. Jobs waiting for the motion
+        to settle after their command are not active.
+        '''
+        return any(job.isCommandPending()
+                   for axis, job in self._lastJobByAxis.items()
+                   if axes is None or axis in axes)
+
+    def shutdown(self):
+        with self._jobsLock:
+            barriers = list(self._barriers)
+        for barrier in barriers:
+            barrier.abort()
+        for executor in self._executors.values():
+            executor.shutdown(wait=False)
+        self._executors = {}
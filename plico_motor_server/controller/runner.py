@@ -1,5 +1,6 @@
 import os
 import time
+import functools
 from plico.utils.base_runner import BaseRunner
 from plico.utils.serial_or_usb_connection import SerialOrUSBConnection
 from plico_motor_server.devices.simulated_motor import \
@@ -8,11 +9,15 @@ from plico_motor_server.devices.KURIOSVB1_thorlabs import TunableFilter
 from plico_motor_server.devices.FW102B_thorlabs import FilterWheel
 from plico_motor_server.devices.PI_motors import PI_E861
 from plico_motor_server.devices.picomotor import Picomotor
+from plico_motor_server.devices.multi_motor import MultiMotor
+from plico_motor_server.devices.async_transport import DeviceIoLoop
+from plico_motor_server.utils.simulated_clock import SimulatedClock
 
 from plico.utils.logger import Logger
-from plico.utils.control_loop import FaultTolerantControlLoop
 from plico.utils.decorator import override
 from plico_motor_server.controller.controller import MotorController
+from plico_motor_server.controller.adaptive_control_loop import \
+    AdaptiveRateControlLoop
 from plico.rpc.zmq_ports import ZmqPorts
 
 
@@ -22,37 +27,89 @@ class Runner(BaseRunner):
 
     def __init__(self):
         BaseRunner.__init__(self)
+        self._ioLoop = None
+        self._timeMod = time
 
-    def _createMotorDevice(self):
-        motorDeviceSection = self.configuration.getValue(
+    def _motorDeviceSections(self):
+        '''
+        The "motor" entry is either a single device section or a list
+        of sections, like "[deviceX, deviceY, deviceZ]"
+        '''
+        value = self.configuration.getValue(
             self.getConfigurationSection(), 'motor')
+        value = value.strip().lstrip('[').rstrip(']')
+        return [x.strip() for x in value.split(',') if x.strip()]
+
+    def _asyncIo(self):
+        try:
+            return self.configuration.getValue(
+                self.getConfigurationSection(), 'async_io',
+                getboolean=True)
+        except KeyError:
+            return False
+
+    def _createMotorDevice(self):
+        if self._asyncIo():
+            self._ioLoop = DeviceIoLoop('%s device I/O' % self.name)
+        sections = self._motorDeviceSections()
+        motors = [self._createOneMotorDevice(section)
+                  for section in sections]
+        if len(motors) == 1:
+            self._motor = motors[0]
+        else:
+            self._motor = MultiMotor(motors, name=self.name,
+                                     ioLoop=self._ioLoop)
+            self._logger.notice('Hosting %d devices with %d axes' % (
+                len(motors), self._motor.naxes()))
+
+    def _createOneMotorDevice(self, motorDeviceSection):
         motorModel = self.configuration.deviceModel(motorDeviceSection)
         if motorModel == 'simulatedMotor':
-            self._createSimulatedMotor(motorDeviceSection)
+            return self._createSimulatedMotor(motorDeviceSection)
+        elif motorModel == 'vectorizedSimulatedMotor':
+            return self._createVectorizedSimulatedMotor(motorDeviceSection)
         elif motorModel == 'picomotor':
-            self._createPicomotor(motorDeviceSection)
+            return self._createPicomotor(motorDeviceSection)
         elif motorModel == 'tunable_filter':
-            self._createTunableFilter(motorDeviceSection)
+            return self._createTunableFilter(motorDeviceSection)
         elif motorModel == 'KURIOS-VB1_thorlabs':
-            self._createFilterDevice(motorDeviceSection)
+            return self._createFilterDevice(motorDeviceSection)
         elif motorModel == 'FW102B_thorlabs':
-            self._createFilterDevice(motorDeviceSection)
+            return self._createFilterDevice(motorDeviceSection)
         elif motorModel == 'PI_E861':
-            self._createPI_E861(motorDeviceSection)
+            return self._createPI_E861(motorDeviceSection)
         elif motorModel in ['8SMC5-USB 8MT30-50', '8SMC5-USB 8MBM24-2-2']:
-            self._createStandaMotor(motorDeviceSection)
+            return self._createStandaMotor(motorDeviceSection)
         elif motorModel == 'LTS150C/M':
-            self._createLTSMotors(motorDeviceSection)
+            return self._createLTSMotors(motorDeviceSection)
         elif motorModel == 'KDC101_KCube':
-            self._createKDCMotors(motorDeviceSection)
+            return self._createKDCMotors(motorDeviceSection)
         elif motorModel == 'MFF_10x':
-            self._createFilterFlipper(motorDeviceSection)
+            return self._createFilterFlipper(motorDeviceSection)
         else:
             raise KeyError('Unsupported motor model %s' % motorModel)
 
     def _createSimulatedMotor(self, motorDeviceSection):
         motorName = self.configuration.deviceName(motorDeviceSection)
-        self._motor = SimulatedMotor(motorName)
+        return SimulatedMotor(motorName)
+
+    def _createVectorizedSimulatedMotor(self, motorDeviceSection):
+        from plico_motor_server.devices.vectorized_simulated_motor import \
+            VectorizedSimulatedMotor
+        name = self.configuration.deviceName(motorDeviceSection)
+        naxis = self.configuration.getValue(
+            motorDeviceSection, 'naxis', getint=True)
+        kwargs = {'name': name}
+        for entry, kwarg in [('velocity', 'velocity'),
+                             ('acceleration', 'acceleration'),
+                             ('io_latency', 'ioLatencySec')]:
+            try:
+                kwargs[kwarg] = self.configuration.getValue(
+                    motorDeviceSection, entry, getfloat=True)
+            except KeyError:
+                pass
+        return VectorizedSimulatedMotor(naxis, timeMod=self._timeMod,
+                                        **kwargs)
 
     def _createPicomotor(self, motorDeviceSection):
         from plico_motor_server.devices.picomotor import Picomotor
@@ -62,13 +119,14 @@ class Runner(BaseRunner):
             motorDeviceSection, 'naxis', getint=True)
         timeout = self.configuration.getValue(
             motorDeviceSection, 'comm_timeout', getfloat=True)
-        kwargs = {'naxis': naxis, 'timeout': timeout, 'name': name}
+        kwargs = {'naxis': naxis, 'timeout': timeout, 'name': name,
+                  'ioLoop': self._ioLoop}
         try:
             port = self.configuration.basePort(motorDeviceSection)
             kwargs['port'] = port
         except KeyError:
             pass
-        self._motor = Picomotor(ipaddr, **kwargs)
+        motor = Picomotor(ipaddr, **kwargs)
         #     self._motor = Picomotor(ipaddr,
         #                             port=port,
         #                             axis=axis,
@@ -79,11 +137,23 @@ class Runner(BaseRunner):
         #                             axis=axis,
         #                             timeout=timeout,
         #                             name=name)
+        return motor
 
     def _createTunableFilter(self, motorDeviceSection):
+        from plico_motor_server.devices.tunable_filter import \
+            TunableFilter as YamlTunableFilter
         name = self.configuration.deviceName(motorDeviceSection)
         yamlfile = self.configuration.getValue(motorDeviceSection, 'yaml_file')
-        self._motor = TunableFilter(yamlfile)
+        return YamlTunableFilter(yamlfile, name=name,
+                                 **self._shadowKwargs(motorDeviceSection))
+
+    def _shadowKwargs(self, motorDeviceSection):
+        try:
+            return {'shadowRevalidationSec': self.configuration.getValue(
+                motorDeviceSection, 'shadow_revalidation_period',
+                getfloat=True)}
+        except KeyError:
+            return {}
 
     def _createFilterDevice(self, motorDeviceSection):
         name = self.configuration.deviceName(motorDeviceSection)
@@ -92,26 +162,47 @@ class Runner(BaseRunner):
                 motorDeviceSection)
         speed = self.configuration.getValue(
             motorDeviceSection, 'speed', getint=True)
+        kwargs = {'ioLoop': self._ioLoop}
+        kwargs.update(self._shadowKwargs(motorDeviceSection))
+        try:
+            kwargs['timeout'] = self.configuration.getValue(
+                motorDeviceSection, 'comm_timeout', getfloat=True)
+        except KeyError:
+            pass
         if name == 'TunableFilter':
-            self._motor = TunableFilter(name, serial_or_usb, speed)
+            return TunableFilter(name, serial_or_usb, speed, **kwargs)
         elif name == 'FilterWheel':
-            self._motor = FilterWheel(name, serial_or_usb, speed)
-
+            return FilterWheel(name, serial_or_usb, speed, **kwargs)
+        else:
+            raise KeyError('Unsupported filter device %s' % name)
 
     def _createPI_E861(self, motorDeviceSection):
         from plico_motor_server.devices.PI_motors import PI_E861
         name = self.configuration.deviceName(motorDeviceSection)
+        try:
+            gcsDevice = self.configuration.getValue(
+                motorDeviceSection, 'gcs_device')
+        except KeyError:
+            gcsDevice = 'pipython'
+        if gcsDevice == 'fake':
+            from plico_motor_server.devices.fake_gcs_device import \
+                FakeGCSDevice
+            return PI_E861(name, None, None, usb_id_string='fake',
+                           gcsDeviceClass=functools.partial(
+                               FakeGCSDevice, timeMod=self._timeMod),
+                           timeMod=self._timeMod)
         try:
             usb_id_string = self.configuration.getValue(
                 motorDeviceSection, 'usb_id_string')
-            self._motor = PI_E861(name, None, None, usb_id_string=usb_id_string)
+            motor = PI_E861(name, None, None, usb_id_string=usb_id_string)
         except KeyError:
             serial_or_usb = SerialOrUSBConnection.fromConfiguration(
                     self.configuration,
                     motorDeviceSection)
             speed = self.configuration.getValue(
                 motorDeviceSection, 'speed', getint=True)
-            self._motor = PI_E861(name, serial_or_usb, speed)
+            motor = PI_E861(name, serial_or_usb, speed)
+        return motor
 
     def _createStandaMotor(self, motorDeviceSection):
         from plico_motor_server.devices.standa_motors import StandaStage
@@ -121,32 +212,36 @@ class Runner(BaseRunner):
         speed = self.configuration.getValue(
             motorDeviceSection, 'speed', getint=True)
         print(name, bytes(usb_port, 'ascii'))
-        self._motor = StandaStage(name, bytes(usb_port, 'ascii'), speed)
+        motor = StandaStage(name, bytes(usb_port, 'ascii'), speed)
         self._logger.notice("Standa device %s created" % name)
-    
+        return motor
+
     def _createLTSMotors(self, motorDeviceSection):
         from plico_motor_server.devices.LTS_thorlabs import LTSThorlabsMotor
         name = self.configuration.deviceName(motorDeviceSection)
         serial_number = self.configuration.getValue(
             motorDeviceSection, 'serial_number')
-        self._motor = LTSThorlabsMotor(name, serial_number)
+        motor = LTSThorlabsMotor(name, serial_number)
         self._logger.notice("LTS150C/M device with sn %s created" % serial_number)
-    
+        return motor
+
     def _createKDCMotors(self, motorDeviceSection):
         from plico_motor_server.devices.KDC101_thorlabs import KDC101ThorlabsMotor
         name = self.configuration.deviceName(motorDeviceSection)
         serial_number = self.configuration.getValue(
             motorDeviceSection, 'serial_number')
-        self._motor = KDC101ThorlabsMotor(name, serial_number)
-        self._logger.notice("KDC101_KCube device with sn %s created" % serial_number) 
+        motor = KDC101ThorlabsMotor(name, serial_number)
+        self._logger.notice("KDC101_KCube device with sn %s created" % serial_number)
+        return motor
 
     def _createFilterFlipper(self, motorDeviceSection):
         from plico_motor_server.devices.MFF10x_thorlabs import MFF10xThorlabsMotor
         name = self.configuration.deviceName(motorDeviceSection)
         serial_number = self.configuration.getValue(
             motorDeviceSection, 'serial_number')
-        self._motor = MFF10xThorlabsMotor(name, serial_number)
-        self._logger.notice("Filter flipper device with sn %s created" % serial_number) 
+        motor = MFF10xThorlabsMotor(name, serial_number)
+        self._logger.notice("Filter flipper device with sn %s created" % serial_number)
+        return motor
 
     def _replyPort(self):
         return self.configuration.replyPort(self.getConfigurationSection())
@@ -154,6 +249,82 @@ class Runner(BaseRunner):
     def _statusPort(self):
         return self.configuration.statusPort(self.getConfigurationSection())
 
+    def _statusCacheTtl(self):
+        try:
+            return self.configuration.getValue(
+                self.getConfigurationSection(), 'status_cache_ttl',
+                getfloat=True)
+        except KeyError:
+            return 1.0
+
+    def _statusPollingPeriod(self):
+        try:
+            return self.configuration.getValue(
+                self.getConfigurationSection(), 'status_polling_period',
+                getfloat=True)
+        except KeyError:
+            return None
+
+    def _statusPublishMode(self):
+        try:
+            return self.configuration.getValue(
+                self.getConfigurationSection(), 'status_publish_mode')
+        except KeyError:
+            return 'full'
+
+    def _statusKeyframePeriod(self):
+        try:
+            return self.configuration.getValue(
+                self.getConfigurationSection(), 'status_keyframe_period',
+                getfloat=True)
+        except KeyError:
+            return 1.0
+
+    def _loopPeriods(self):
+        section = self.getConfigurationSection()
+        periods = {'fastLoopPeriodSec': 'fast_loop_period',
+                   'idleLoopPeriodSec': 'idle_loop_period',
+                   'activityHoldSec': 'activity_hold_time',
+                   'statisticsLogPeriodSec': 'statistics_log_period'}
+        kwargs = {}
+        for kwarg, entry in periods.items():
+            try:
+                kwargs[kwarg] = self.configuration.getValue(
+                    section, entry, getfloat=True)
+            except KeyError:
+                pass
+        return kwargs
+
+    def _positionHistorySamples(self):
+        try:
+            return self.configuration.getValue(
+                self.getConfigurationSection(), 'position_history_samples',
+                getint=True)
+        except KeyError:
+            return 1000
+
+    def _simulatedClock(self):
+        '''
+        With "simulated_time_speedup" set, controller, control loop
+        and simulated devices share a SimulatedClock running that many
+        times faster than real time
+        '''
+        try:
+            speedup = self.configuration.getValue(
+                self.getConfigurationSection(), 'simulated_time_speedup',
+                getfloat=True)
+        except KeyError:
+            return None
+        return SimulatedClock(startTime=time.time(), speedup=speedup)
+
+    def _nonBlockingMotion(self):
+        try:
+            return self.configuration.getValue(
+                self.getConfigurationSection(), 'non_blocking_motion',
+                getboolean=True)
+        except KeyError:
+            return False
+
     def _setUp(self):
         self._logger = Logger.of("Motor Controller runner")
 
@@ -164,6 +335,11 @@ class Runner(BaseRunner):
         self._statusSocket = self.rpc().publisherSocket(
             self._zmqPorts.SERVER_STATUS_PORT, hwm=1)
 
+        clock = self._simulatedClock()
+        if clock is not None:
+            self._timeMod = clock
+            self._logger.notice('Using simulated time')
+
         self._createMotorDevice()
 
         self._controller = MotorController(
@@ -172,17 +348,24 @@ class Runner(BaseRunner):
             self._motor,
             self._replySocket,
             self._statusSocket,
-            self.rpc())
+            self.rpc(),
+            timeMod=self._timeMod,
+            statusCacheTtlSec=self._statusCacheTtl(),
+            statusPollingPeriodSec=self._statusPollingPeriod(),
+            statusPublishMode=self._statusPublishMode(),
+            statusKeyframePeriodSec=self._statusKeyframePeriod(),
+            nonBlockingMotion=self._nonBlockingMotion(),
+            positionHistorySamples=self._positionHistorySamples(),
+            **self._loopPeriods())
         self._configureDiscoveryServer('plico_motor', self._motor.__class__.__name__)
 
     def _runLoop(self):
         self._logRunning()
 
-        FaultTolerantControlLoop(
+        AdaptiveRateControlLoop(
             self._controller,
             Logger.of("Motor Controller control loop"),
-            time,
-            0.02).start()
+            self._timeMod).start()
         self._logger.notice("Terminated")
 
     @override
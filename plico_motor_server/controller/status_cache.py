@@ -0,0 +1,133 @@
+import time
+from plico.utils.logger import Logger
+from plico_motor.types.motor_status import MotorStatus
+
+
+class MotorStatusCache(object):
+    '''
+    Caching layer between MotorController and AbstractMotor.
+
+    Device fields are split in three groups:
+
+    - static fields (name, type, steps_per_SI_unit) are read once
+    - slow fields (was_homed, velocity) are read again only when
+      older than the configured time-to-live
+    - live fields (position, is_moving, last_commanded_position)
+      are read from the device every time
+
+    Any command touching an axis must call invalidate() so that
+    the next status read fetches fresh values for that axis.
+    Per-field hit/miss counters are available to tune the TTLs.
+    If a LoopStatistics object is given, the duration of every device
+    query is recorded in it as 'device.<query>'.
+    '''
+
+    STATIC_FIELDS = ('name', 'type', 'steps_per_SI_unit')
+    SLOW_FIELDS = ('was_homed', 'velocity')
+    LIVE_FIELDS = ('position', 'is_moving', 'last_commanded_position')
+
+    def __init__(self, motor, ttlSec=1.0, timeMod=time, statistics=None):
+        self._motor = motor
+        self._statistics = statistics
+        self._ttlSec = ttlSec
+        self._timeMod = timeMod
+        self._logger = Logger.of('MotorStatusCache')
+        self._entries = {}
+        self._hits = {}
+        self._misses = {}
+        self.resetStatistics()
+
+    def ttl(self):
+        return self._ttlSec
+
+    def setTtl(self, ttlSec):
+        self._ttlSec = ttlSec
+
+    def _isValid(self, field, key):
+        if key not in self._entries:
+            return False
+        if field in self.STATIC_FIELDS:
+            return True
+        if field in self.SLOW_FIELDS:
+            _, timestamp = self._entries[key]
+            return self._timeMod.time() - timestamp < self._ttlSec
+        return False
+
+    def _timed(self, query, func, *args):
+        if self._statistics is None:
+            return func(*args)
+        with self._statistics.timing('device.%s' % query):
+            return func(*args)
+
+    def _read(self, field, axis):
+        if field == 'name':
+            return self._timed(field, self._motor.name)
+        return self._timed(field, getattr(self._motor, field), axis)
+
+    def get(self, field, axis):
+        '''
+        Return the value of <field> for <axis>, reading
+        the device only when the cached entry is not valid.
+        '''
+        key = (field, axis)
+        if self._isValid(field, key):
+            self._hits[field] += 1
+            return self._entries[key][0]
+        self._misses[field] += 1
+        value = self._read(field, axis)
+        if field not in self.LIVE_FIELDS:
+            self._entries[key] = (value, self._timeMod.time())
+        return value
+
+    def invalidate(self, axis):
+        '''
+        Drop all cached non-static entries for <axis>
+        '''
+        for field in self.SLOW_FIELDS:
+            self._entries.pop((field, axis), None)
+
+    def invalidateAll(self):
+        self._entries.clear()
+
+    def _getBulk(self, fields, bulkFunc, axes):
+        for field in fields:
+            self._misses[field] += len(axes)
+        return self._timed(bulkFunc.__name__, bulkFunc, axes)
+
+    def statusAllAxes(self, axes):
+        '''
+        Return the MotorStatus of <axes>, reading positions and
+        motion flags with a single motor bulk query.
+        '''
+        positions, moving = self._getBulk(
+            ('position', 'is_moving'), self._motor.positions_and_moving, axes)
+        return [MotorStatus(
+            self.get('name', axis),
+            positions[i],
+            self.get('velocity', axis),
+            self.get('steps_per_SI_unit', axis),
+            self.get('was_homed', axis),
+            self.get('type', axis),
+            moving[i],
+            self.get('last_commanded_position', axis),
+            axis)
+            for i, axis in enumerate(axes)]
+
+    def motorStatus(self, axis):
+        return self.statusAllAxes([axis])[0]
+
+    def statistics(self):
+        '''
+        Returns
+        -------
+        statistics: dict
+            {field: {'hits': int, 'misses': int}} for every status field
+        '''
+        return {field: {'hits': self._hits[field],
+                        'misses': self._misses[field]}
+                for field in self._hits}
+
+    def resetStatistics(self):
+        for field in self.STATIC_FIELDS + self.SLOW_FIELDS + self.LIVE_FIELDS:
+            self._hits[field] = 0
+            self._misses[field] = 0
@@ -0,0 +1,79 @@
+import threading
+import time
+from plico.utils.logger import Logger
+from plico.utils.decorator import synchronized
+
+
+class StatusPoller(threading.Thread):
+    '''
+    Background thread that keeps a "latest status" snapshot current.
+
+    The device is polled every <pollingPeriodSec> seconds calling
+    <statusFunc> with <deviceLock> held, so that polling never overlaps
+    with commands sent from the control loop thread.
+    The snapshot is protected by its own lock and is read by the control
+    loop without touching the device.
+    '''
+
+    def __init__(self,
+                 statusFunc,
+                 pollingPeriodSec,
+                 deviceLock,
+                 timeMod=time):
+        threading.Thread.__init__(self, name='StatusPoller')
+        self.daemon = True
+        self._statusFunc = statusFunc
+        self._pollingPeriodSec = pollingPeriodSec
+        self._deviceLock = deviceLock
+        self._timeMod = timeMod
+        self._logger = Logger.of('StatusPoller')
+        self._snapshotLock = threading.Lock()
+        self._stopEvent = threading.Event()
+        self._snapshot = None
+        self._snapshotTime = None
+        self._pollCounter = 0
+
+    def run(self):
+        self._logger.notice('Polling status every %g s' %
+                            self._pollingPeriodSec)
+        while not self._stopEvent.is_set():
+            self.pollOnce()
+            self._stopEvent.wait(self._pollingPeriodSec)
+        self._logger.notice('Stopped')
+
+    def pollOnce(self):
+        try:
+            with self._deviceLock:
+                status = self._statusFunc()
+        except Exception as e:
+            self._logger.error('Status polling failed: %s' % str(e))
+            return
+        self._setSnapshot(status)
+
+    @synchronized('_snapshotLock')
+    def _setSnapshot(self, status):
+        self._snapshot = status
+        self._snapshotTime = self._timeMod.time()
+        self._pollCounter += 1
+
+    @synchronized('_snapshotLock')
+    def latestStatus(self):
+        return self._snapshot
+
+    @synchronized('_snapshotLock')
+    def snapshotAge(self):
+        if self._snapshotTime is None:
+            return None
+        return self._timeMod.time() - self._snapshotTime
+
+    @synchronized('_snapshotLock')
+    def getPollCounter(self):
+        return self._pollCounter
+
+    def pollingPeriod(self):
+        return self._pollingPeriodSec
+
+    def stop(self, timeoutSec=5):
+        self._stopEvent.set()
+        if self.is_alive():
+            self.join(timeoutSec)
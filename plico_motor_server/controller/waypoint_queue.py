@@ -0,0 +1,103 @@
+class WaypointQueueException(Exception):
+    pass
+
+
+class WaypointQueue(object):
+    '''
+    Sequence of positions to be visited by one axis.
+
+    The queue is a state machine advanced by the controller at every
+    step: when the motion towards a waypoint is over, the axis dwells
+    for <dwellSec> seconds and then the next waypoint is commanded.
+    The queue does not talk to the device by itself.
+    '''
+
+    LOADED = 'loaded'
+    MOVING = 'moving'
+    DWELLING = 'dwelling'
+    DONE = 'done'
+    ABORTED = 'aborted'
+    FAILED = 'failed'
+
+    def __init__(self, axis, positions, dwellSec=0):
+        if len(positions) == 0:
+            raise WaypointQueueException('Empty waypoint list')
+        if dwellSec < 0:
+            raise WaypointQueueException('Dwell time must be positive')
+        self._axis = axis
+        self._positions = list(positions)
+        self._dwellSec = dwellSec
+        self._state = self.LOADED
+        self._index = 0
+        self._dwellEnd = None
+        self._jobId = None
+        self._error = None
+
+    def state(self):
+        return self._state
+
+    def isActive(self):
+        return self._state in (self.MOVING, self.DWELLING)
+
+    def isMoving(self):
+        return self._state == self.MOVING
+
+    def jobId(self):
+        return self._jobId
+
+    def start(self, now):
+        if self._state != self.LOADED:
+            raise WaypointQueueException(
+                'Queue of axis %d cannot be started in state %s' % (
+                    self._axis, self._state))
+        self._state = self.DWELLING
+        self._dwellEnd = now
+
+    def abort(self):
+        if self._state in (self.LOADED, self.MOVING, self.DWELLING):
+            self._state = self.ABORTED
+
+    def fail(self, error):
+        self._state = self.FAILED
+        self._error = error
+
+    def nextPosition(self, now):
+        '''
+        Returns
+        -------
+        position: number or None
+            next waypoint to be commanded, or None if it is not yet time
+        '''
+        if self._state != self.DWELLING or now < self._dwellEnd:
+            return None
+        return self._positions[self._index]
+
+    def motionStarted(self, jobId):
+        self._state = self.MOVING
+        self._jobId = jobId
+
+    def motionDone(self, now):
+        self._index += 1
+        if self._index == len(self._positions):
+            self._state = self.DONE
+        else:
+            self._state = self.DWELLING
+            self._dwellEnd = now + self._dwellSec
+
+    def progress(self):
+        '''
+        Returns
+        -------
+        progress: dict
+            state, number of waypoints reached, total number of
+            waypoints and current target position
+        '''
+        if self._index < len(self._positions):
+            target = self._positions[self._index]
+        else:
+            target = None
+        return {'state': self._state,
+                'reached': self._index,
+                'total': len(self._positions),
+                'target': target,
+                'error': self._error}
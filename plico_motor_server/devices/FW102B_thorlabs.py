@@ -3,11 +3,17 @@ Authors
   - C. Selmi: written in 2022
 '''
 import time
+import threading
 import serial
 from plico.utils.logger import Logger
 from plico.utils.decorator import override
 from plico.utils.reconnect import Reconnecting, reconnect
 from plico_motor_server.devices.abstract_motor import AbstractMotor
+from plico_motor_server.devices.serial_transport import SerialTransport, \
+    SerialTimeoutException
+from plico_motor_server.devices.async_transport import AsyncSerialTransport, \
+    AsyncTransportException
+from plico_motor_server.utils.shadow_position import ShadowPosition
 from plico_motor.types.motor_status import MotorStatus
 
 
@@ -20,47 +26,46 @@ class FilterWheelException(Exception):
     pass
 
 
-class SerialTimeoutException(Exception):
-    def __init__(self, value=-1):
-        print ("Missing response from serial after %i iterrations" % value)
-
-
 class FilterWheel(AbstractMotor, Reconnecting):
     '''
     Manual: https://www.thorlabs.com/drawings/67124bd78341d22e-A3AF90CF-D9E9-9FC4-63EEF4724CA5DD84/FW102C-Manual.pdf
+
+    With <shadowRevalidationSec> the position is read from the device
+    only every <shadowRevalidationSec> seconds, and is otherwise known
+    from the last accepted move_to() (see ShadowPosition).
     '''
-    def __init__(self, name, serial_or_usb, speed):
+    def __init__(self, name, serial_or_usb, speed, timeout=5, ioLoop=None,
+                 shadowRevalidationSec=None):
         """The constructor """
         self._name = name
         self.serial_or_usb = serial_or_usb
         self.speed = speed
+        self.timeout = timeout
         self.naxis = 1
         self.ser = None
+        self._transport = None
+        self._ioLoop = ioLoop
+        self._shadow = None
+        if shadowRevalidationSec is not None:
+            self._shadow = ShadowPosition(shadowRevalidationSec)
+        # Reentrant: connect() reads the id through a @reconnect method
+        self._connectLock = threading.RLock()
+        if ioLoop is not None:
+            # Queries from several threads are queued on the loop
+            self.THREAD_SAFE = True
         self._logger = Logger.of("FilterWheel")
         self._last_commanded_position = None
         Reconnecting.__init__(self,
             self.connect,
             self.disconnect,
-            [SerialTimeoutException],
+            [SerialTimeoutException, AsyncTransportException],
         )
 
-    def _pollSerial(self):
-        nw = 0
-        nw0 = 0
-        it = 0
-        while True:
-            nw = self.ser.inWaiting()
-            it = it + 1
-            time.sleep(0.01)
-            if (nw >0) and (nw0==nw) or (it==10000):
-                break
-            nw0 = nw
-        if nw == 0:
-            raise SerialTimeoutException(it)
-        else:
-            return nw
-
     def connect(self):
+        with self._connectLock:
+            return self._connect()
+
+    def _connect(self):
         if self.ser is None:
             time.sleep(1) # Slow down reconnect loops
             port = self.serial_or_usb.port_name()
@@ -69,15 +74,26 @@ class FilterWheel(AbstractMotor, Reconnecting):
                                      bytesize=serial.EIGHTBITS,
                                      parity=serial.PARITY_NONE,
                                      stopbits=serial.STOPBITS_ONE)
+            if self._ioLoop is None:
+                self._transport = SerialTransport(
+                    self.ser, b'>', self.timeout)
+            else:
+                self._transport = AsyncSerialTransport(
+                    self._ioLoop, self.ser, b'>', self.timeout)
             out = self.get_id()
             return out
         else:
             print ("Already connected")
 
     def disconnect(self):
-        if self.ser is not None:
-            self.ser.close()
-            self.ser = None
+        with self._connectLock:
+            if self._shadow is not None:
+                self._shadow.invalidate()
+            if self.ser is not None:
+                self._transport.close()
+                self.ser.close()
+                self.ser = None
+                self._transport = None
 
     @reconnect
     def get_id(self):
@@ -87,11 +103,7 @@ class FilterWheel(AbstractMotor, Reconnecting):
         out = string
             motor model type
         '''
-        cmd = bytes(GET_ID, 'utf-8')
-        tmp = self.ser.write(cmd)
-        nw = self._pollSerial()
-        out_b = self.ser.read(self.ser.inWaiting())
-        out_s = out_b.decode('utf-8')
+        out_s = self._transport.query(GET_ID)
         out = out_s.split('\r')[1]
         return out
 
@@ -103,11 +115,7 @@ class FilterWheel(AbstractMotor, Reconnecting):
         out: int
             number of filter wheel position
         '''
-        cmd = bytes(READ_N, 'utf-8')
-        tmp = self.ser.write(cmd)
-        nw = self._pollSerial()
-        out_b = self.ser.read(self.ser.inWaiting())
-        out_s = out_b.decode('utf-8')
+        out_s = self._transport.query(READ_N)
         out = int(out_s.split()[1])
         return out
 
@@ -126,11 +134,7 @@ class FilterWheel(AbstractMotor, Reconnecting):
         '''
         if n < 1 or n > 6:
             raise FilterWheelException('Position %d is out of range (1-6)' % n)
-        cmd = bytes(WRITE_N % n, 'utf-8')
-        tmp = self.ser.write(cmd)
-        nw = self._pollSerial()
-        out_b = self.ser.read(self.ser.inWaiting())
-        out_s = out_b.decode('utf-8')
+        out_s = self._transport.query(WRITE_N % n)
         out = out_s.split()[0]
         return out
 
@@ -156,11 +160,16 @@ class FilterWheel(AbstractMotor, Reconnecting):
         curr_pos: int
             output number position from filter
         '''
-        curr_pos = self._get_pos()
+        curr_pos = self._readPosition()
         self._logger.debug(
             'Current position = %d nm' % curr_pos)
         return curr_pos
 
+    def _readPosition(self):
+        if self._shadow is None:
+            return self._get_pos()
+        return self._shadow.get(self._get_pos)
+
     @override
     def velocity(self, axis):
         '''
@@ -193,6 +202,24 @@ class FilterWheel(AbstractMotor, Reconnecting):
     def is_moving(self, axis):
         return False
 
+    async def async_positions_and_moving(self, axes):
+        '''
+        Coroutine version of positions_and_moving. Must be awaited
+        on the ioLoop.
+        '''
+        position = self._shadow.cached() if self._shadow else None
+        if position is not None:
+            return [position] * len(axes), [False] * len(axes)
+        if not isinstance(self._transport, AsyncSerialTransport):
+            # Not connected yet, or no ioLoop
+            return await AbstractMotor.async_positions_and_moving(
+                self, axes)
+        replies = await self._transport.ask(READ_N.encode('utf-8'))
+        position = int(replies[0].decode('utf-8').split()[1])
+        if self._shadow is not None:
+            self._shadow.set(position)
+        return [position] * len(axes), [False] * len(axes)
+
     @override
     def last_commanded_position(self, axis):
         '''
@@ -219,9 +246,14 @@ class FilterWheel(AbstractMotor, Reconnecting):
     
     @override
     def move_to(self, axis, number_of_filter_position):
-        position = self._set_pos(number_of_filter_position)
-        self._last_commanded_position = position
-        return
+        echo = self._set_pos(number_of_filter_position)
+        self._last_commanded_position = number_of_filter_position
+        if self._shadow is not None:
+            # The wheel echoes the command it has accepted
+            if echo == (WRITE_N % number_of_filter_position).strip():
+                self._shadow.set(number_of_filter_position)
+            else:
+                self._shadow.invalidate()
 
     @override
     def stop(self, axis):
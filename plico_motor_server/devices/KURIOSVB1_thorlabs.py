@@ -4,11 +4,17 @@ Authors
 '''
 import os
 import time
+import threading
 import serial
 from plico.utils.logger import Logger
 from plico.utils.decorator import override
 from plico.utils.reconnect import Reconnecting, reconnect
 from plico_motor_server.devices.abstract_motor import AbstractMotor
+from plico_motor_server.devices.serial_transport import SerialTransport, \
+    SerialTimeoutException
+from plico_motor_server.devices.async_transport import AsyncSerialTransport, \
+    AsyncTransportException
+from plico_motor_server.utils.shadow_position import ShadowPosition
 from plico_motor.types.motor_status import MotorStatus
 
 GET_ID = "*idn?\r"
@@ -22,48 +28,47 @@ class TunableFilterException(Exception):
     pass
 
 
-class SerialTimeoutException(Exception):
-    def __init__(self, value=-1):
-        print ("Missing response from serial after %i iterrations" % value)
-
-
 class TunableFilter(AbstractMotor, Reconnecting):
     '''
     Manual: https://www.thorlabs.com/drawings/67124bd78341d22e-A3AF90CF-D9E9-9FC4-63EEF4724CA5DD84/KURIOS-VB1-Manual.pdf
+
+    With <shadowRevalidationSec> the position is read from the device
+    only every <shadowRevalidationSec> seconds, and is otherwise known
+    from the last accepted move_to() (see ShadowPosition).
     '''
 
-    def __init__(self, name, serial_or_usb, speed):
+    def __init__(self, name, serial_or_usb, speed, timeout=5, ioLoop=None,
+                 shadowRevalidationSec=None):
         """The constructor """
         self._name = name
         self.serial_or_usb = serial_or_usb
         self.speed = speed
+        self.timeout = timeout
         self.naxis = 1
         self.ser = None
+        self._transport = None
+        self._ioLoop = ioLoop
+        self._shadow = None
+        if shadowRevalidationSec is not None:
+            self._shadow = ShadowPosition(shadowRevalidationSec)
+        # Reentrant: connect() reads the id through a @reconnect method
+        self._connectLock = threading.RLock()
+        if ioLoop is not None:
+            # Queries from several threads are queued on the loop
+            self.THREAD_SAFE = True
         self._logger = Logger.of("TunableFilter")
         self._last_commanded_position = None
         Reconnecting.__init__(self,
             self.connect,
             self.disconnect,
-            [SerialTimeoutException],
+            [SerialTimeoutException, AsyncTransportException],
         )
 
-    def _pollSerial(self):
-        nw = 0
-        nw0 = 0
-        it = 0
-        while True:
-            nw = self.ser.inWaiting()
-            it = it + 1
-            time.sleep(0.01)
-            if (nw >0) and (nw0==nw) or (it==10000):
-                break
-            nw0 = nw
-        if nw == 0:
-            raise SerialTimeoutException(it)
-        else:
-            return nw
-
     def connect(self):
+        with self._connectLock:
+            return self._connect()
+
+    def _connect(self):
         if self.ser is None:
             time.sleep(1) # Slow down reconnect loops
             port = self.serial_or_usb.port_name()
@@ -72,15 +77,26 @@ class TunableFilter(AbstractMotor, Reconnecting):
                                      bytesize=serial.EIGHTBITS,
                                      parity=serial.PARITY_NONE,
                                      stopbits=serial.STOPBITS_ONE)
+            if self._ioLoop is None:
+                self._transport = SerialTransport(
+                    self.ser, b'>', self.timeout)
+            else:
+                self._transport = AsyncSerialTransport(
+                    self._ioLoop, self.ser, b'>', self.timeout)
             out = self.get_id()
             return out
         else:
             print ("Already connected")
 
     def disconnect(self):
-        if self.ser is not None:
-            self.ser.close()
-            self.ser = None
+        with self._connectLock:
+            if self._shadow is not None:
+                self._shadow.invalidate()
+            if self.ser is not None:
+                self._transport.close()
+                self.ser.close()
+                self.ser = None
+                self._transport = None
 
     @reconnect
     def get_id(self):
@@ -90,11 +106,7 @@ class TunableFilter(AbstractMotor, Reconnecting):
         out = string
             motor model type
         '''
-        cmd = bytes(GET_ID, 'utf-8')
-        tmp = self.ser.write(cmd)
-        nw = self._pollSerial()
-        out_b = self.ser.read(self.ser.inWaiting())
-        out_s = out_b.decode('utf-8')
+        out_s = self._transport.query(GET_ID)
         out = out_s.split('\r')[0]
         return out
 
@@ -106,11 +118,7 @@ class TunableFilter(AbstractMotor, Reconnecting):
         out: int [nm]
             wavelength output from filter
         '''
-        cmd = bytes(READ_WL, 'utf-8')
-        tmp = self.ser.write(cmd)
-        nw = self._pollSerial()
-        out_b = self.ser.read(self.ser.inWaiting())
-        out_s = out_b.decode('utf-8')
+        out_s = self._transport.query(READ_WL)
         out = out_s.split('\r')[0]
         out_number = float(out.split('=')[1])
         return out_number
@@ -130,11 +138,7 @@ class TunableFilter(AbstractMotor, Reconnecting):
         '''
         if wl < 420 or wl > 730:
             raise TunableFilterException('Wavelength out of range 420-730')
-        cmd = bytes(WRITE_WL % wl, 'utf-8')
-        tmp = self.ser.write(cmd)
-        nw = self._pollSerial()
-        out_b = self.ser.read(self.ser.inWaiting())
-        out_s = out_b.decode('utf-8')
+        out_s = self._transport.query(WRITE_WL % wl)
         #out = out_s.split('\r')[0]
         #out = self._get_wl()
         return out_s
@@ -150,11 +154,7 @@ class TunableFilter(AbstractMotor, Reconnecting):
             1 - warm up
             2 - ready
         '''
-        cmd = bytes(GET_STATUS, 'utf-8')
-        tmp = self.ser.write(cmd)
-        nw = self._pollSerial()
-        out_b = self.ser.read(self.ser.inWaiting())
-        out_s = out_b.decode('utf-8')
+        out_s = self._transport.query(GET_STATUS)
         out = out_s.split()[0]
         return out
     
@@ -166,11 +166,7 @@ class TunableFilter(AbstractMotor, Reconnecting):
         out: byte
             temperature
         '''
-        cmd = bytes(GET_TEMPERATURE, 'utf-8')
-        tmp = self.ser.write(cmd)
-        nw = self._pollSerial()
-        out_b = self.ser.read(self.ser.inWaiting())
-        out_s = out_b.decode('utf-8')
+        out_s = self._transport.query(GET_TEMPERATURE)
         out = out_s.split()[0]
         return out
 
@@ -195,11 +191,16 @@ class TunableFilter(AbstractMotor, Reconnecting):
         curr_pos: string [nm]
             wavelength output from filter
         '''
-        curr_pos = self._get_wl()
+        curr_pos = self._readPosition()
         self._logger.debug(
             'Current position = %s nm' % curr_pos)
         return curr_pos
 
+    def _readPosition(self):
+        if self._shadow is None:
+            return self._get_wl()
+        return self._shadow.get(self._get_wl)
+
     @override
     def velocity(self, axis):
         '''
@@ -232,6 +233,25 @@ class TunableFilter(AbstractMotor, Reconnecting):
     def is_moving(self, axis):
         return False
 
+    async def async_positions_and_moving(self, axes):
+        '''
+        Coroutine version of positions_and_moving. Must be awaited
+        on the ioLoop.
+        '''
+        position = self._shadow.cached() if self._shadow else None
+        if position is not None:
+            return [position] * len(axes), [False] * len(axes)
+        if not isinstance(self._transport, AsyncSerialTransport):
+            # Not connected yet, or no ioLoop
+            return await AbstractMotor.async_positions_and_moving(
+                self, axes)
+        replies = await self._transport.ask(READ_WL.encode('utf-8'))
+        out = replies[0].decode('utf-8').split('\r')[0]
+        position = float(out.split('=')[1])
+        if self._shadow is not None:
+            self._shadow.set(position)
+        return [position] * len(axes), [False] * len(axes)
+
     @override
     def last_commanded_position(self, axis):
         '''
@@ -266,9 +286,17 @@ class TunableFilter(AbstractMotor, Reconnecting):
         position: int [nm]
             desired lambda position in nanometres
         '''
-        absolute_position_in_nm = self._set_wl(absolute_position_in_nm)
+        echo = self._set_wl(absolute_position_in_nm)
         self._last_commanded_position = absolute_position_in_nm
-        return
+        if self._shadow is not None:
+            # An accepted command is acknowledged by the bare prompt,
+            # or by its echo, a rejected one by an error message
+            command = (WRITE_WL % absolute_position_in_nm).strip()
+            if echo.split('\r')[0] in (command, '>'):
+                # Same resolution of the WL? reply
+                self._shadow.set(float(command.split('=')[1]))
+            else:
+                self._shadow.invalidate()
 
     @override
     def stop(self, axis):
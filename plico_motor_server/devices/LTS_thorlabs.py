@@ -259,6 +259,21 @@ class LTSThorlabsMotor(AbstractMotor):
         self._set_position(pos)
         self._last_commanded_position = pos
 
+    @override
+    def move_by(self, axis, delta):
+        '''
+        Parameters
+        ----------
+            delta: float
+               relative displacement in mm
+        '''
+        # The Kinesis device object caches the polled position:
+        # reading it does not cost a round trip to the controller
+        target = self._get_position() + delta
+        self._check_position(target)
+        self._move_by(delta)
+        self._last_commanded_position = target
+
     @override
     def set_velocity(self, axis, velocity):
         '''
@@ -23,22 +23,33 @@ class PIGCS_Motor(AbstractMotor, Reconnecting):
     Makes use of the pipython module: https://github.com/PI-PhysikInstrumente/PIPython
     pipython is imported lazily and does not need to be installed until
     an instance of this class is initialized.
+
+    <gcsDeviceClass> replaces pipython.GCSDevice, e.g. with
+    FakeGCSDevice to run without hardware. <timeMod> is used to wait
+    for the end of homing, and must be the clock of the fake device
+    when this runs on simulated time.
     '''
 
-    def __init__(self, name, serial_or_usb, speed, usb_id_string=None):
-        from pipython import GCSDevice # Not used here, but let's fail now instead of later
+    def __init__(self, name, serial_or_usb, speed, usb_id_string=None,
+                 naxis=1, gcsDeviceClass=None, timeMod=time):
+        if gcsDeviceClass is None:
+            # Not used here, but let's fail now instead of later
+            from pipython import GCSDevice as gcsDeviceClass
+        self._gcsDeviceClass = gcsDeviceClass
+        self._timeMod = timeMod
         self._name = name
         self.serial_or_usb = serial_or_usb
         self.usb_id_string = usb_id_string
         self.speed = speed
-        self.naxis = 1
+        self.naxis = naxis
         self.gcs = None
         self.use_servo = False
         self.referenced = [False] * self.naxis
         self.home_timeout = 10  # seconds
         self.steps_to_PIsteps = 1  # In case we want to use smaller steps than PI ones
         self._logger = Logger.of('GCS')
-        self._last_commanded_position = [0] * self.naxis
+        # None until known: the target of move_by needs the previous one
+        self._last_commanded_position = [None] * self.naxis
         Reconnecting.__init__(self,
             self.connect,
             self.disconnect,
@@ -46,8 +57,7 @@ class PIGCS_Motor(AbstractMotor, Reconnecting):
 
     def connect(self):
         if self.gcs is None:
-            from pipython import GCSDevice
-            self.gcs = GCSDevice()
+            self.gcs = self._gcsDeviceClass()
             if self.usb_id_string:
                 self.gcs.ConnectUSB(self.usb_id_string)
             else:
@@ -78,11 +88,11 @@ class PIGCS_Motor(AbstractMotor, Reconnecting):
     def home(self, axis):
         self.referenced[axis - 1] = False
         self.gcs.FRF(axis)
-        now = time.time()
+        now = self._timeMod.time()
         while True:
-            if time.time() - now > self.home_timeout:
+            if self._timeMod.time() - now > self.home_timeout:
                 raise PIException('Timeout waiting for homing movement')
-            time.sleep(0.1)
+            self._timeMod.sleep(0.1)
             if self.gcs.qFRF(axis)[axis]:
                 break
         if self.use_servo:
@@ -95,10 +105,35 @@ class PIGCS_Motor(AbstractMotor, Reconnecting):
         posdict = self.gcs.qPOS(axis)
         return round(posdict[axis] / self.steps_to_PIsteps)
 
+    @reconnect
+    @override
+    def positions(self, axes):
+        posdict = self.gcs.qPOS()
+        return [round(posdict['%d' % axis] / self.steps_to_PIsteps)
+                for axis in axes]
+
     @reconnect
     @override
     def move_to(self, axis, position_in_steps):
         self.gcs.MOV(axis, position_in_steps * self.steps_to_PIsteps)
+        self._last_commanded_position[axis - 1] = position_in_steps
+
+    @reconnect
+    @override
+    def move_by(self, axis, delta):
+        self.gcs.MVR(axis, delta * self.steps_to_PIsteps)
+        last = self._last_commanded_position[axis - 1]
+        if last is not None:
+            self._last_commanded_position[axis - 1] = last + delta
+
+    @reconnect
+    @override
+    def move_to_many(self, positions):
+        axes = list(positions.keys())
+        values = [positions[axis] * self.steps_to_PIsteps for axis in axes]
+        self.gcs.MOV(axes, values)
+        for axis in axes:
+            self._last_commanded_position[axis - 1] = positions[axis]
 
     @override
     def velocity(self, axis):
@@ -135,10 +170,24 @@ class PIGCS_Motor(AbstractMotor, Reconnecting):
         movingdict = self.gcs.IsMoving(axis)
         return movingdict[axis]
 
+    @reconnect
+    @override
+    def are_moving(self, axes):
+        movingdict = self.gcs.IsMoving()
+        return [movingdict['%d' % axis] for axis in axes]
+
     @override
     def last_commanded_position(self, axis):
+        if self._last_commanded_position[axis - 1] is None:
+            self._last_commanded_position[axis - 1] = self._target(axis)
         return self._last_commanded_position[axis - 1]
 
+    @reconnect
+    def _target(self, axis):
+        # qMOV replies the target of the last motion
+        posdict = self.gcs.qMOV(axis)
+        return round(posdict[axis] / self.steps_to_PIsteps)
+
 
 class PI_E861(PIGCS_Motor):
     '''
@@ -146,8 +195,9 @@ class PI_E861(PIGCS_Motor):
     This class sets the "use_servo" flag to True in order
     to enable the servo loop after initialization.
     '''
-    def __init__(self, name, port, speed, usb_id_string=None):
-        super().__init__(name, port, speed, usb_id_string=usb_id_string)
+    def __init__(self, name, port, speed, usb_id_string=None, **kwargs):
+        super().__init__(name, port, speed, usb_id_string=usb_id_string,
+                         **kwargs)
         self.use_servo = True
         self.steps_to_PIsteps = 1e-6  # PI E-861 uses mm as its unit
 
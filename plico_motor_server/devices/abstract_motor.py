@@ -1,9 +1,16 @@
 import abc
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from six import with_metaclass
+from plico_motor.types.motor_status import MotorStatus
 
 
 class AbstractMotor(with_metaclass(abc.ABCMeta, object)):
 
+    # True if commands can be executed in a worker thread while
+    # other threads are querying the device
+    THREAD_SAFE = False
+
     # -------------
     # Queries
 
@@ -73,6 +80,85 @@ class AbstractMotor(with_metaclass(abc.ABCMeta, object)):
         '''
         assert False
 
+    # -------------
+    # Bulk queries
+    #
+    # Generic implementations looping over the per-axis queries.
+    # Drivers that can read several axes with a single device
+    # round trip should override them.
+
+    def positions(self, axes):
+        '''
+        Parameters
+        ----------
+        axes: sequence of int
+            axes to be queried
+
+        Returns
+        ------
+        positions: list
+            axes positions in steps, in the same order of <axes>
+        '''
+        return [self.position(axis) for axis in axes]
+
+    def are_moving(self, axes):
+        '''
+        Parameters
+        ----------
+        axes: sequence of int
+            axes to be queried
+
+        Returns
+        ------
+        are_moving: list of bool
+            motion flags, in the same order of <axes>
+        '''
+        return [self.is_moving(axis) for axis in axes]
+
+    def positions_and_moving(self, axes):
+        '''
+        Read positions and motion flags of <axes> together. Drivers
+        that can read both with a single device round trip should
+        override it.
+
+        Returns
+        ------
+        positions, are_moving: tuple of lists
+            same as positions(axes) and are_moving(axes)
+        '''
+        return self.positions(axes), self.are_moving(axes)
+
+    async def async_positions_and_moving(self, axes):
+        '''
+        Coroutine version of positions_and_moving, to be awaited on a
+        DeviceIoLoop. The generic implementation runs the blocking
+        query in the loop executor; drivers with an asyncio transport
+        override it.
+        '''
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, self.positions_and_moving, axes)
+
+    def status_all_axes(self):
+        '''
+        Returns
+        ------
+        status: list of MotorStatus
+            status of every axis, built with the bulk queries
+        '''
+        axes = [i + 1 for i in range(self.naxes())]
+        positions, moving = self.positions_and_moving(axes)
+        return [MotorStatus(self.name(),
+                            positions[i],
+                            self.velocity(axis),
+                            self.steps_per_SI_unit(axis),
+                            self.was_homed(axis),
+                            self.type(axis),
+                            moving[i],
+                            self.last_commanded_position(axis),
+                            axis)
+                for i, axis in enumerate(axes)]
+
     # --------------
     # Commands
 
@@ -95,6 +181,21 @@ class AbstractMotor(with_metaclass(abc.ABCMeta, object)):
         '''
         assert False
 
+    def move_by(self, axis, delta):
+        '''
+        Move by a relative amount
+
+        The generic implementation reads the current position and
+        calls move_to. Drivers with a native relative move should
+        override it to save the position query.
+
+        Parameters
+        ----------
+        delta: int
+            desired displacement in steps
+        '''
+        self.move_to(axis, self.position(axis) + delta)
+
     @abc.abstractmethod
     def set_velocity(self, axis=1):
         '''
@@ -116,3 +217,29 @@ class AbstractMotor(with_metaclass(abc.ABCMeta, object)):
     def deinitialize(self, axis=1):
         assert False
 
+    # --------------
+    # Bulk commands
+
+    def move_to_many(self, positions):
+        '''
+        Move several axes to absolute positions
+
+        The generic implementation commands the axes one after the
+        other, or concurrently from worker threads if the driver is
+        THREAD_SAFE. Drivers that can command several axes with a
+        single device round trip should override it.
+
+        Parameters
+        ----------
+        positions: dict
+            {axis: desired position in steps}
+        '''
+        if not self.THREAD_SAFE or len(positions) < 2:
+            for axis, position in positions.items():
+                self.move_to(axis, position)
+            return
+        with ThreadPoolExecutor(max_workers=len(positions)) as executor:
+            futures = [executor.submit(self.move_to, axis, position)
+                       for axis, position in positions.items()]
+        for future in futures:
+            future.result()
@@ -0,0 +1,280 @@
+'''
+asyncio based device I/O.
+
+A DeviceIoLoop runs an asyncio event loop in a background thread,
+shared by all the device transports of a server. Transports offer
+awaitable ask()/send(), to be gathered on the loop so that several
+devices are read concurrently, and a blocking bridge (askSync, query)
+for the synchronous driver API called from the controller threads.
+'''
+import asyncio
+import collections
+import threading
+from plico.utils.logger import Logger
+from plico_motor_server.utils.line_reader import LineReader
+
+
+class AsyncTransportException(ConnectionError):
+    pass
+
+
+class DeviceIoLoop(object):
+    '''
+    asyncio event loop running in a daemon thread
+    '''
+
+    def __init__(self, name='DeviceIoLoop'):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name=name, daemon=True)
+        self._thread.start()
+
+    def loop(self):
+        return self._loop
+
+    def inLoopThread(self):
+        return threading.current_thread() is self._thread
+
+    def submit(self, coro):
+        '''
+        Schedule <coro> on the loop
+
+        Returns
+        -------
+        future: concurrent.futures.Future
+        '''
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def call(self, coro):
+        '''
+        Run <coro> on the loop and wait for its result. Must not be
+        called from the loop thread itself, which would deadlock.
+        '''
+        if self.inLoopThread():
+            coro.close()
+            raise RuntimeError('Blocking call from the device I/O loop')
+        return self.submit(coro).result()
+
+    def stop(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+class _PendingRequest(object):
+
+    def __init__(self, nreplies, future):
+        self.nreplies = nreplies
+        self.replies = []
+        self.future = future
+
+
+class AsyncLineTransport(object):
+    '''
+    Request/reply demultiplexer shared by the asyncio transports.
+
+    Every device has its own FIFO of pending requests. Replies are split
+    on <terminator> and assigned in order to the pending requests, each
+    one expecting a known number of reply lines. Complete lines arriving
+    when no request is pending are discarded.
+
+    With <pipelined> a request is written as soon as it is submitted,
+    without waiting for the replies to the previous ones; otherwise
+    requests are written one at a time, for devices that cannot buffer
+    commands. A timeout or a connection error fails all the pending
+    requests and drops the connection, which is opened again by the
+    next request.
+    '''
+
+    def __init__(self, ioLoop, terminator, timeoutSec, pipelined):
+        self._ioLoop = ioLoop
+        self._terminator = terminator
+        self._timeoutSec = timeoutSec
+        self._pipelined = pipelined
+        self._reader = LineReader(terminator=terminator)
+        self._pending = collections.deque()
+        self._connected = False
+        self._connectLock = None
+        self._turnLock = None
+        self._logger = Logger.of(self.__class__.__name__)
+
+    async def _open(self):
+        raise NotImplementedError()
+
+    def _close(self):
+        raise NotImplementedError()
+
+    def _write(self, data):
+        raise NotImplementedError()
+
+    async def _ensureConnected(self):
+        if self._connectLock is None:
+            self._connectLock = asyncio.Lock()
+            self._turnLock = asyncio.Lock()
+        async with self._connectLock:
+            if not self._connected:
+                self._reader.reset()
+                await self._open()
+                self._connected = True
+
+    def _feed(self, data):
+        self._reader.feed(data)
+        while True:
+            line = self._reader.popLine()
+            if line is None:
+                return
+            if len(self._pending) == 0:
+                self._logger.warn('Unexpected reply %r' % line)
+                continue
+            request = self._pending[0]
+            request.replies.append(line)
+            if len(request.replies) == request.nreplies:
+                self._pending.popleft()
+                if not request.future.done():
+                    request.future.set_result(request.replies)
+
+    def _fail(self, exc):
+        while self._pending:
+            request = self._pending.popleft()
+            if not request.future.done():
+                request.future.set_exception(exc)
+        if self._connected:
+            self._connected = False
+            self._close()
+
+    async def _request(self, data, nreplies):
+        await self._ensureConnected()
+        if nreplies == 0:
+            self._write(data)
+            return []
+        future = self._ioLoop.loop().create_future()
+        self._pending.append(_PendingRequest(nreplies, future))
+        self._write(data)
+        try:
+            return await asyncio.wait_for(future, self._timeoutSec)
+        except asyncio.TimeoutError:
+            # The stream is out of sync: start again on a new connection
+            exc = AsyncTransportException(
+                'No reply to %r within %g s' % (data, self._timeoutSec))
+            self._fail(exc)
+            raise exc
+
+    async def ask(self, data, nreplies=1):
+        '''
+        Write <data> and wait for <nreplies> reply lines
+
+        Returns
+        -------
+        replies: list of bytes
+            reply lines, without terminator
+        '''
+        if self._pipelined:
+            return await self._request(data, nreplies)
+        await self._ensureConnected()
+        async with self._turnLock:
+            return await self._request(data, nreplies)
+
+    async def send(self, data):
+        '''
+        Write <data> without waiting for any reply
+        '''
+        return await self.ask(data, 0)
+
+    def askSync(self, data, nreplies=1):
+        return self._ioLoop.call(self.ask(data, nreplies))
+
+    def sendSync(self, data):
+        return self._ioLoop.call(self.send(data))
+
+    def close(self):
+        self._ioLoop.call(self._closeAsync())
+
+    async def _closeAsync(self):
+        self._fail(AsyncTransportException('Transport closed'))
+
+
+class _TcpProtocol(asyncio.Protocol):
+
+    def __init__(self, transport):
+        self._owner = transport
+
+    def data_received(self, data):
+        self._owner._feed(data)
+
+    def connection_lost(self, exc):
+        self._owner._fail(AsyncTransportException(
+            'Connection lost: %s' % str(exc)))
+
+
+class AsyncTcpTransport(AsyncLineTransport):
+    '''
+    Pipelined TCP transport, like the one of the newfocus8742
+    '''
+
+    def __init__(self, ioLoop, host, port, terminator=b'\r\n',
+                 timeoutSec=2.0, pipelined=True):
+        AsyncLineTransport.__init__(
+            self, ioLoop, terminator, timeoutSec, pipelined)
+        self._host = host
+        self._port = port
+        self._transport = None
+
+    async def _open(self):
+        try:
+            self._transport, _ = await asyncio.wait_for(
+                self._ioLoop.loop().create_connection(
+                    lambda: _TcpProtocol(self), self._host, self._port),
+                self._timeoutSec)
+        except (OSError, asyncio.TimeoutError) as e:
+            raise AsyncTransportException(
+                'Cannot connect to %s:%d: %s' % (self._host, self._port,
+                                                 str(e)))
+
+    def _close(self):
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+    def _write(self, data):
+        self._transport.write(data)
+
+
+class AsyncSerialTransport(AsyncLineTransport):
+    '''
+    Serial transport on an open serial.Serial, read from the event loop
+    when the port is readable (POSIX only).
+
+    query() has the same interface of SerialTransport.query, so that
+    it can replace it in the drivers.
+    '''
+
+    def __init__(self, ioLoop, ser, terminator=b'>', timeoutSec=2.0):
+        AsyncLineTransport.__init__(
+            self, ioLoop, terminator, timeoutSec, pipelined=False)
+        self._ser = ser
+
+    async def _open(self):
+        self._ser.timeout = 0
+        self._ser.reset_input_buffer()
+        self._ioLoop.loop().add_reader(self._ser.fileno(), self._onReadable)
+
+    def _onReadable(self):
+        try:
+            data = self._ser.read(max(1, self._ser.in_waiting))
+        except Exception as e:
+            self._fail(AsyncTransportException(str(e)))
+            return
+        if data:
+            self._feed(data)
+
+    def _close(self):
+        self._ioLoop.loop().remove_reader(self._ser.fileno())
+
+    def _write(self, data):
+        self._ser.write(data)
+
+    def query(self, cmd):
+        '''
+        Blocking query, returning the decoded reply with its terminator
+        '''
+        reply = self.askSync(cmd.encode('utf-8'))[0]
+        return (reply + self._terminator).decode('utf-8')
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+import sys
+import time
+import argparse
+import logging
+from plico.utils.logger import Logger
+from plico_motor_server.devices.fake_serial_device import PtySerialDevice
+
+
+class FakeFW102B(PtySerialDevice):
+    '''
+    Fake Thorlabs FW102C filter wheel on a pseudo terminal.
+
+    Every command is echoed, followed by its reply, if any, and by the
+    '>' prompt. A pos=N command returns the prompt when the wheel has
+    stopped, after <slotTimeSec> for every slot crossed along the
+    shortest direction.
+    '''
+
+    RUNNING_MESSAGE = "fakefw102b_is_running."
+    IDN = 'THORLABS FW102C/FW212C Filter Wheel version 1.07 (fake)'
+
+    def __init__(self, slotTimeSec=0.3, npositions=6, **kwargs):
+        PtySerialDevice.__init__(self, **kwargs)
+        self._slotTimeSec = slotTimeSec
+        self._npositions = npositions
+        self.position = 1
+
+    def _rotationTime(self, target):
+        slots = abs(target - self.position)
+        return min(slots, self._npositions - slots) * self._slotTimeSec
+
+    def reply(self, cmd):
+        out = cmd + '\r'
+        if cmd == '*idn?':
+            out += self.IDN + '\r'
+        elif cmd == 'pos?':
+            out += '%d\r' % self.position
+        elif cmd == 'pcount?':
+            out += '%d\r' % self._npositions
+        elif cmd.startswith('pos='):
+            try:
+                target = int(cmd[len('pos='):])
+            except ValueError:
+                target = 0
+            if 1 <= target <= self._npositions:
+                self._timeMod.sleep(self._rotationTime(target))
+                self.position = target
+            else:
+                out += 'Command error CMD_ARG_INVALID\r'
+        else:
+            out += 'Command error CMD_NOT_DEFINED\r'
+        return (out + '>').encode()
+
+
+def main(link=None, slotTimeSec=0.3, replyDelaySec=0.001):
+    log_format = '%(asctime)s %(levelname)s %(message)s'
+    logging.basicConfig(level=logging.DEBUG, format=log_format)
+    logger = Logger.of('FakeFW102B')
+
+    device = FakeFW102B(slotTimeSec=slotTimeSec, replyDelaySec=replyDelaySec,
+                        link=link)
+    device.start()
+    logger.notice('Serial port: %s' % device.portName())
+
+    # DONT REMOVE - USED TO DETECT THE STARTUP
+    logger.notice(FakeFW102B.RUNNING_MESSAGE)
+    sys.stdout.flush()
+    try:
+        while device.is_alive():
+            time.sleep(1)
+    finally:
+        device.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Fake FW102B filter wheel')
+    parser.add_argument('--link', default='/tmp/plico_motor_fake_fw102b',
+                        help='symbolic link to the serial port')
+    parser.add_argument('--slot-time', type=float, default=0.3,
+                        help='rotation time per slot in seconds')
+    parser.add_argument('--reply-delay', type=float, default=0.001,
+                        help='command processing time in seconds')
+    # The starter scripts pass configuration file and section: ignore them
+    args, _ = parser.parse_known_args()
+    main(args.link, args.slot_time, args.reply_delay)
@@ -0,0 +1,172 @@
+import time
+from collections import OrderedDict
+
+
+class FakeGCSError(Exception):
+    pass
+
+
+class FakeGCSDevice(object):
+    '''
+    Stand-in for pipython.GCSDevice, with the subset of GCS commands
+    used by PIGCS_Motor and a motion model.
+
+    Axes are named '1' ... '<naxes>'. Moves run at <velocity> (in
+    controller units per second) towards their target, and a reference
+    move (FRF) brings the axis to 0 in <referenceTimeSec>. Every call
+    costs <callDelaySec>, to model the round trip on the serial line.
+
+    As with pipython, queries return an OrderedDict keyed by the axes
+    given as argument, or by the axis names if called without axes.
+    '''
+
+    def __init__(self, naxes=1, velocity=1.0, referenceTimeSec=1.0,
+                 callDelaySec=0.0, timeMod=time):
+        self._axes = ['%d' % (i + 1) for i in range(naxes)]
+        self._velocity = velocity
+        self._referenceTimeSec = referenceTimeSec
+        self._callDelaySec = callDelaySec
+        self._timeMod = timeMod
+        self._connected = False
+        self._position = {axis: 0.0 for axis in self._axes}
+        self._servo = {axis: False for axis in self._axes}
+        self._referenced = {axis: False for axis in self._axes}
+        self._motion = {}
+        self.ncalls = 0
+
+    # --------------
+    # Connection
+
+    def ConnectRS232(self, comport, baudrate):
+        self._call()
+        self._connected = True
+
+    def ConnectUSB(self, serialnum):
+        self._call()
+        self._connected = True
+
+    def IsConnected(self):
+        return self._connected
+
+    def close(self):
+        self._connected = False
+
+    def qIDN(self):
+        self._call()
+        return 'Physik Instrumente, FAKE-GCS, 0, 0.0.0\n'
+
+    # --------------
+    # Motion model
+
+    def _call(self):
+        self.ncalls += 1
+        if self._callDelaySec > 0:
+            self._timeMod.sleep(self._callDelaySec)
+
+    def _axisName(self, axis):
+        name = '%s' % axis
+        if name not in self._position:
+            raise FakeGCSError('Unknown axis %r' % axis)
+        return name
+
+    def _update(self, name):
+        motion = self._motion.get(name)
+        if motion is None:
+            return
+        start, target, t0, duration, referencing = motion
+        elapsed = self._timeMod.time() - t0
+        if elapsed >= duration:
+            del self._motion[name]
+            self._position[name] = target
+            if referencing:
+                self._referenced[name] = True
+        else:
+            self._position[name] = \
+                start + (target - start) * elapsed / duration
+
+    def _startMotion(self, name, target, duration=None, referencing=False):
+        self._update(name)
+        start = self._position[name]
+        if duration is None:
+            duration = abs(target - start) / self._velocity
+        if duration <= 0:
+            self._motion.pop(name, None)
+            self._position[name] = target
+            self._referenced[name] |= referencing
+            return
+        self._motion[name] = (start, target, self._timeMod.time(),
+                              duration, referencing)
+
+    def _query(self, axes, func):
+        self._call()
+        if axes is None:
+            keys = list(self._axes)
+        elif isinstance(axes, (list, tuple)):
+            keys = list(axes)
+        else:
+            keys = [axes]
+        result = OrderedDict()
+        for key in keys:
+            name = self._axisName(key)
+            self._update(name)
+            result[key] = func(name)
+        return result
+
+    def _command(self, axes, values, func):
+        self._call()
+        if isinstance(axes, dict):
+            axes, values = list(axes.keys()), list(axes.values())
+        elif not isinstance(axes, (list, tuple)):
+            axes, values = [axes], [values]
+        elif values is None:
+            values = [None] * len(axes)
+        for axis, value in zip(axes, values):
+            func(self._axisName(axis), value)
+
+    # --------------
+    # GCS commands
+
+    def qPOS(self, axes=None):
+        return self._query(axes, lambda name: self._position[name])
+
+    def MOV(self, axes, values=None):
+        self._command(axes, values,
+                      lambda name, value: self._startMotion(name, value))
+
+    def qMOV(self, axes=None):
+        return self._query(axes, self._target)
+
+    def MVR(self, axes, values=None):
+        def moveRelative(name, value):
+            self._startMotion(name, self._target(name) + value)
+        self._command(axes, values, moveRelative)
+
+    def _target(self, name):
+        motion = self._motion.get(name)
+        return motion[1] if motion else self._position[name]
+
+    def FRF(self, axes=None):
+        if axes is None:
+            axes = list(self._axes)
+        self._command(axes, None, lambda name, _: self._reference(name))
+
+    def _reference(self, name):
+        self._referenced[name] = False
+        self._startMotion(name, 0.0, self._referenceTimeSec, referencing=True)
+
+    def qFRF(self, axes=None):
+        return self._query(axes, lambda name: self._referenced[name])
+
+    def SVO(self, axes, values=None):
+        def setServo(name, value):
+            self._servo[name] = bool(value)
+        self._command(axes, values, setServo)
+
+    def qSVO(self, axes=None):
+        return self._query(axes, lambda name: self._servo[name])
+
+    def IsMoving(self, axes=None):
+        return self._query(axes, lambda name: name in self._motion)
+
+    def qONT(self, axes=None):
+        return self._query(axes, lambda name: name not in self._motion)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+import sys
+import time
+import argparse
+import logging
+from plico.utils.logger import Logger
+from plico_motor_server.devices.fake_serial_device import PtySerialDevice
+
+
+class FakeKuriosVB1(PtySerialDevice):
+    '''
+    Fake Thorlabs KURIOS-VB1 tunable filter on a pseudo terminal.
+
+    Queries are answered with their value and the '>' prompt, set
+    commands with the prompt alone, or with an error message. A WL=
+    command returns the prompt when the filter is tuned, after
+    <tuneTimeSec>. ST? reports 1 (warm up) for the first <warmUpSec>
+    seconds and then 2 (ready).
+    '''
+
+    RUNNING_MESSAGE = "fakekuriosvb1_is_running."
+    IDN = '000000000 KURIOS-VB1 V1.0 (fake)'
+    WL_MIN = 420
+    WL_MAX = 730
+
+    def __init__(self, tuneTimeSec=0.05, warmUpSec=0, **kwargs):
+        PtySerialDevice.__init__(self, **kwargs)
+        self._tuneTimeSec = tuneTimeSec
+        self._readyTime = self._timeMod.time() + warmUpSec
+        self.wavelength = 550.0
+        self.temperature = 25.0
+
+    def _status(self):
+        return 2 if self._timeMod.time() >= self._readyTime else 1
+
+    def reply(self, cmd):
+        if cmd == '*idn?':
+            out = self.IDN + '\r'
+        elif cmd == 'WL?':
+            out = 'WL=%.3f\r' % self.wavelength
+        elif cmd == 'ST?':
+            out = '%d\r' % self._status()
+        elif cmd == 'TP?':
+            out = '%.3f\r' % self.temperature
+        elif cmd.startswith('WL='):
+            try:
+                wl = float(cmd[len('WL='):])
+            except ValueError:
+                wl = 0
+            if self.WL_MIN <= wl <= self.WL_MAX:
+                self._timeMod.sleep(self._tuneTimeSec)
+                self.wavelength = wl
+                out = ''
+            else:
+                out = 'CMD_ARG_INVALID\r'
+        else:
+            out = 'CMD_NOT_DEFINED\r'
+        return (out + '>').encode()
+
+
+def main(link=None, tuneTimeSec=0.05, replyDelaySec=0.001):
+    log_format = '%(asctime)s %(levelname)s %(message)s'
+    logging.basicConfig(level=logging.DEBUG, format=log_format)
+    logger = Logger.of('FakeKuriosVB1')
+
+    device = FakeKuriosVB1(tuneTimeSec=tuneTimeSec,
+                           replyDelaySec=replyDelaySec, link=link)
+    device.start()
+    logger.notice('Serial port: %s' % device.portName())
+
+    # DONT REMOVE - USED TO DETECT THE STARTUP
+    logger.notice(FakeKuriosVB1.RUNNING_MESSAGE)
+    sys.stdout.flush()
+    try:
+        while device.is_alive():
+            time.sleep(1)
+    finally:
+        device.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Fake KURIOS-VB1 filter')
+    parser.add_argument('--link', default='/tmp/plico_motor_fake_kuriosvb1',
+                        help='symbolic link to the serial port')
+    parser.add_argument('--tune-time', type=float, default=0.05,
+                        help='wavelength switching time in seconds')
+    parser.add_argument('--reply-delay', type=float, default=0.001,
+                        help='command processing time in seconds')
+    # The starter scripts pass configuration file and section: ignore them
+    args, _ = parser.parse_known_args()
+    main(args.link, args.tune_time, args.reply_delay)
@@ -1,70 +1,369 @@
 #!/usr/bin/env python
 import sys
+import math
+import time
+import random
+import argparse
 import asyncio
 from plico.utils.logger import Logger
+from plico_motor_server.utils.simulated_clock import SimulatedClock
 import logging
 
 
-class NewFocus8742ServerProtocol(asyncio.Protocol):
+IDN_REPLY = 'New_Focus 8742 v2.2 08/01/13 13991 (fake)'
 
-    eol_read = b"\r"
-    eol_write = b"\r\n"
-    RUNNING_MESSAGE = "fakenewfocus8742_is_running."
 
-    def __init__(self):
-        self._logger = Logger.of('NewFocus8742ServerProtocol')
-        self._logger.debug(self.RUNNING_MESSAGE)
+class _Motion(object):
+    '''
+    Trapezoidal motion profile from <start> to <target>, starting from
+    rest at <t0>. Without <acceleration> the speed is constant.
+    '''
+
+    def __init__(self, start, target, t0, velocity, acceleration):
+        self.start = start
+        self.target = target
+        self.t0 = t0
+        self._distance = abs(target - start)
+        self._sign = 1 if target >= start else -1
+        self._acceleration = acceleration
+        if acceleration is None:
+            self._tAcc = 0.0
+            self._vPeak = velocity
+        else:
+            self._tAcc = velocity / acceleration
+            if acceleration * self._tAcc ** 2 >= self._distance:
+                # Triangular profile, top speed never reached
+                self._tAcc = math.sqrt(self._distance / acceleration)
+            self._vPeak = acceleration * self._tAcc
+        self._dAcc = 0.5 * self._vPeak * self._tAcc
+        self.duration = 2 * self._tAcc + \
+            (self._distance - 2 * self._dAcc) / self._vPeak
+
+    def done(self, t):
+        return t >= self.t0 + self.duration
+
+    def position(self, t):
+        dt = t - self.t0
+        if dt >= self.duration:
+            return self.target
+        if dt < self._tAcc:
+            s = 0.5 * self._acceleration * dt ** 2
+        elif dt <= self.duration - self._tAcc:
+            s = self._dAcc + self._vPeak * (dt - self._tAcc)
+        else:
+            s = self._distance - \
+                0.5 * self._acceleration * (self.duration - dt) ** 2
+        return self.start + self._sign * int(s)
+
+
+class NewFocus8742Model(object):
+    '''
+    State of a fake newfocus 8742 controller, shared by all the
+    connected clients.
+
+    Motion: with <stepRate> (steps/s) set, moves take a finite time.
+    With <acceleration> (steps/s^2) also set, they follow a trapezoidal
+    profile, otherwise the speed is constant. With the default
+    stepRate=None moves are instantaneous. Both can be changed per axis
+    with VA and AC. A move commanded during a motion starts a new
+    profile from the current position.
+
+    Communication: the reply to every query is delayed by <latencySec>
+    plus a random jitter up to <jitterSec>, keeping the reply order.
+    On a SimulatedClock <timeMod> the delay is simulated time: replies
+    are sent when the threads driving the clock move it past them.
+    Faults are injected with probability <dropRate> (a reply is lost)
+    and <disconnectRate> (the connection is closed on a command line).
+    <seed> makes jitter and faults reproducible.
+
+    Supported commands: PR, PA, PA?, TP?, MD?, ST, VA, VA?, AC, AC?
+    and *IDN?. Several commands on a line are separated by ';'.
+    '''
+
+    def __init__(self, stepRate=None, acceleration=None, latencySec=0.0,
+                 jitterSec=0.0, dropRate=0.0, disconnectRate=0.0,
+                 seed=None, timeMod=time):
+        self._stepRate = stepRate
+        self._acceleration = acceleration
+        self._latencySec = latencySec
+        self._jitterSec = jitterSec
+        self._dropRate = dropRate
+        self._disconnectRate = disconnectRate
+        self._random = random.Random(seed)
+        self._timeMod = timeMod
         self._position = {}
+        self._velocity = {}
+        self._accel = {}
+        self._motion = {}
+
+    # --------------
+    # Motion
 
     def _create_axis_if_needed(self, axis):
-        if axis not in self._position.keys():
+        if axis not in self._position:
             self._position[axis] = 0
+            self._velocity[axis] = self._stepRate
+            self._accel[axis] = self._acceleration
 
-    def _set_position(self, axis, value):
+    def position(self, axis):
         self._create_axis_if_needed(axis)
-        self._position[axis] = value
+        self._update_motion(axis)
+        if axis in self._motion:
+            return self._motion[axis].position(self._timeMod.time())
+        return self._position[axis]
 
-    def _get_position(self, axis):
+    def _update_motion(self, axis):
+        motion = self._motion.get(axis)
+        if motion is not None and motion.done(self._timeMod.time()):
+            del self._motion[axis]
+            self._position[axis] = motion.target
+
+    def is_moving(self, axis):
+        self._update_motion(axis)
+        return axis in self._motion
+
+    def target(self, axis):
         self._create_axis_if_needed(axis)
+        if axis in self._motion:
+            return self._motion[axis].target
         return self._position[axis]
 
+    def move_relative(self, axis, steps):
+        self.move_absolute(axis, self.target(axis) + steps)
+
+    def move_absolute(self, axis, target):
+        start = self.position(axis)
+        self._motion.pop(axis, None)
+        if self._velocity[axis] is None or target == start:
+            self._position[axis] = target
+            return
+        self._motion[axis] = _Motion(start, target, self._timeMod.time(),
+                                     self._velocity[axis], self._accel[axis])
+
+    def stop(self, axis):
+        # The deceleration ramp is not simulated
+        self._position[axis] = self.position(axis)
+        self._motion.pop(axis, None)
+
+    # --------------
+    # Communication
+
+    def clock(self):
+        return self._timeMod
+
+    def replyDelay(self):
+        if self._jitterSec == 0:
+            return self._latencySec
+        return self._latencySec + self._random.uniform(0, self._jitterSec)
+
+    def dropReply(self):
+        return self._dropRate > 0 and self._random.random() < self._dropRate
+
+    def dropConnection(self):
+        return self._disconnectRate > 0 and \
+            self._random.random() < self._disconnectRate
+
+    def handle(self, message):
+        '''
+        Execute one command
+
+        Returns
+        -------
+        reply: str or None
+            reply to send back, None for commands without reply
+        '''
+        if message == '*IDN?':
+            return IDN_REPLY
+        axis = int(message[0:1])
+        cmd = message[1:3]
+        query = message[3:] == '?'
+        arg = message[3:]
+        self._create_axis_if_needed(axis)
+        if cmd == 'TP' and query:
+            return str(self.position(axis))
+        elif cmd == 'PA' and query:
+            # Like the real controller, PA? is the target, TP? the
+            # actual position
+            return str(self.target(axis))
+        elif cmd == 'MD' and query:
+            return '0' if self.is_moving(axis) else '1'
+        elif cmd == 'VA' and query:
+            return str(int(self._velocity[axis] or 0))
+        elif cmd == 'AC' and query:
+            return str(int(self._accel[axis] or 0))
+        elif cmd == 'PR':
+            self.move_relative(axis, int(arg))
+        elif cmd == 'PA':
+            self.move_absolute(axis, int(arg))
+        elif cmd == 'ST':
+            self.stop(axis)
+        elif cmd == 'VA':
+            self._velocity[axis] = self._positive(message, arg)
+        elif cmd == 'AC':
+            self._accel[axis] = self._positive(message, arg)
+        else:
+            raise ValueError('Unknown command %r' % message)
+        return None
+
+    def _positive(self, message, arg):
+        value = int(arg)
+        if value <= 0:
+            raise ValueError('Non-positive argument in %r' % message)
+        return value
+
+
+class NewFocus8742ServerProtocol(asyncio.Protocol):
+    '''
+    Fake newfocus 8742 controller connection.
+
+    Clients connected to the same server share a NewFocus8742Model,
+    given as <model>. Without it the connection has a private one
+    built with <stepRate> and <timeMod>.
+    '''
+
+    eol_read = b"\r"
+    eol_write = b"\r\n"
+    RUNNING_MESSAGE = "fakenewfocus8742_is_running."
+
+    def __init__(self, verbose=True, stepRate=None, timeMod=time,
+                 model=None):
+        # Logging is expensive (it inspects the stack at every call):
+        # set verbose=False to skip per-command messages when timing
+        self._verbose = verbose
+        if model is None:
+            model = NewFocus8742Model(stepRate=stepRate, timeMod=timeMod)
+        self._model = model
+        self._logger = Logger.of('NewFocus8742ServerProtocol')
+        self._logger.debug(self.RUNNING_MESSAGE)
+        self._rxbuf = bytearray()
+        self._lastReplyTime = 0
+
     def connection_made(self, transport):
         peername = transport.get_extra_info('peername')
         self._logger.notice('Connection from {}'.format(peername))
         self.transport = transport
 
     def data_received(self, data):
-        message = data.decode()[:-1]
-        for msg in message.split('\n'):
-            self._handle_message(msg)
+        # Commands may be split across several segments or coalesced
+        # in one: only complete lines are handled, the rest is kept.
+        # Several commands on the same line are separated by ';'
+        self._rxbuf += data
+        while True:
+            idx = self._rxbuf.find(b'\n')
+            if idx < 0:
+                break
+            line = self._rxbuf[:idx].decode().strip()
+            del self._rxbuf[:idx + 1]
+            if self._model.dropConnection():
+                self._logger.notice('Injected fault: closing connection')
+                self.transport.close()
+                return
+            for msg in line.split(';'):
+                if msg.strip():
+                    self._handle_message(msg.strip())
 
     def _handle_message(self, message):
-        self._logger.notice('Data received: {!r}'.format(message))
-        axl = 1
-        axis = int(message[0:axl])
-        if message[axl:] == 'TP?' or message[axl:] == 'PA?':
-            ret_message = str(self._get_position(axis))
-            self._logger.notice('Position - send: {!r}'.format(ret_message))
-            self.transport.write(ret_message.encode() + self.eol_write)
-        elif message[axl: axl + 2] == 'PR':
-            arg = int(message[axl + 2:])
-            self._set_position(axis, self._get_position(axis) + arg)
-            self._logger.notice('set relative - got: {!r}'.format(arg))
-        else:
-            ret_message = message
-            self._logger.warn('unknown - send: {!r}'.format(ret_message))
-            self.transport.write(ret_message.encode() + self.eol_write)
+        if self._verbose:
+            self._logger.notice('Data received: {!r}'.format(message))
+        try:
+            reply = self._model.handle(message)
+        except ValueError:
+            reply = message
+            self._logger.warn('unknown - send: {!r}'.format(reply))
+        if reply is None:
+            return
+        if self._verbose:
+            self._logger.notice('Reply: {!r}'.format(reply))
+        if self._model.dropReply():
+            return
+        self._write(reply.encode() + self.eol_write)
+
+    def _write(self, data):
+        delay = self._model.replyDelay()
+        if delay <= 0:
+            self.transport.write(data)
+            return
+        loop = asyncio.get_running_loop()
+        clock = self._model.clock()
+        if isinstance(clock, SimulatedClock):
+            # Never sleep on, nor advance, the shared clock from the
+            # event loop: the reply is written back on the loop by the
+            # thread that moves the clock past its time
+            when = max(clock.time() + delay, self._lastReplyTime)
+            self._lastReplyTime = when
+            clock.callAt(when, lambda: self._writeFromClock(loop, data))
+            return
+        # Replies never overtake each other, whatever the jitter
+        when = max(loop.time() + delay, self._lastReplyTime)
+        self._lastReplyTime = when
+        loop.call_at(when, self._writeLater, data)
+
+    def _writeFromClock(self, loop, data):
+        try:
+            loop.call_soon_threadsafe(self._writeLater, data)
+        except RuntimeError:
+            # The server has been closed in the meantime
+            pass
+
+    def _writeLater(self, data):
+        if not self.transport.is_closing():
+            self.transport.write(data)
+
+
+class FakeNewFocus8742Server(object):
+    '''
+    Fake newfocus 8742 served from a background thread, on a free port
+    by default, to be used in-process by tests and benchmarks.
+
+    Additional keyword arguments are passed to NewFocus8742Model.
+    '''
+
+    def __init__(self, host='127.0.0.1', port=0, verbose=False,
+                 **modelKwargs):
+        from plico_motor_server.devices.async_transport import DeviceIoLoop
+        self.host = host
+        self.model = NewFocus8742Model(**modelKwargs)
+        self._verbose = verbose
+        self._ioLoop = DeviceIoLoop('FakeNewFocus8742')
+        self._server = self._ioLoop.call(self._start(port))
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def _start(self, port):
+        return await asyncio.get_running_loop().create_server(
+            lambda: NewFocus8742ServerProtocol(self._verbose,
+                                               model=self.model),
+            self.host, port)
+
+    def close(self):
+        if self._server is None:
+            return
+        self._ioLoop.call(self._stop())
+        self._ioLoop.stop()
+        self._server = None
+
+    async def _stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
 
 
-async def main(ipaddr='localhost', port=30023):
+async def main(ipaddr='localhost', port=30023, stepRate=None, verbose=True,
+               **modelKwargs):
     log_format = '%(asctime)s %(levelname)s %(message)s'
     logging.basicConfig(level=logging.DEBUG, format=log_format)
     logger = Logger.of('FakeNewFocus8742')
 
     loop = asyncio.get_running_loop()
+    model = NewFocus8742Model(stepRate=stepRate, **modelKwargs)
 
     server = await loop.create_server(
-        lambda: NewFocus8742ServerProtocol(), ipaddr, port)
+        lambda: NewFocus8742ServerProtocol(verbose, model=model),
+        ipaddr, port)
 
     # DONT REMOVE - USED IN INTEGRATION TEST
     logger.notice(NewFocus8742ServerProtocol.RUNNING_MESSAGE)
@@ -75,4 +374,26 @@ async def main(ipaddr='localhost', port=30023):
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description='Fake newfocus 8742')
+    parser.add_argument('--step-rate', type=float, default=None,
+                        help='motion speed in steps/s (default: instant)')
+    parser.add_argument('--acceleration', type=float, default=None,
+                        help='acceleration in steps/s^2 (default: none)')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='reply latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help='maximum random additional latency in seconds')
+    parser.add_argument('--drop-rate', type=float, default=0.0,
+                        help='probability of losing a reply')
+    parser.add_argument('--disconnect-rate', type=float, default=0.0,
+                        help='probability of closing the connection')
+    parser.add_argument('--seed', type=int, default=None)
+    # The starter scripts pass configuration file and section: ignore them
+    args, _ = parser.parse_known_args()
+    asyncio.run(main(stepRate=args.step_rate,
+                     acceleration=args.acceleration,
+                     latencySec=args.latency,
+                     jitterSec=args.jitter,
+                     dropRate=args.drop_rate,
+                     disconnectRate=args.disconnect_rate,
+                     seed=args.seed))
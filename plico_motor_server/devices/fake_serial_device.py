@@ -0,0 +1,77 @@
+import os
+import select
+import threading
+import time
+
+
+class PtySerialDevice(threading.Thread):
+    '''
+    Fake serial device on the master side of a pseudo terminal.
+
+    Clients open portName() as a serial port. Commands terminated by
+    <terminator> are handled one at a time, as the real controllers
+    do: after <replyDelaySec> of processing time the bytes returned by
+    reply() are written back. reply() can take longer, e.g. sleeping
+    for the duration of a motion.
+
+    With <link> a symbolic link to the port is created, so that a
+    configuration file can refer to a fixed path.
+
+    Pseudo terminals are not available on Windows.
+    '''
+
+    def __init__(self, terminator=b'\r', replyDelaySec=0.0, link=None,
+                 timeMod=time):
+        # tty needs termios, missing on Windows: import it only here
+        import tty
+        threading.Thread.__init__(self, daemon=True)
+        self._terminator = terminator
+        self._replyDelaySec = replyDelaySec
+        self._timeMod = timeMod
+        self._master, self._slave = os.openpty()
+        # No echo or line editing before a client configures the port
+        tty.setraw(self._slave)
+        self._portName = os.ttyname(self._slave)
+        self._link = link
+        if link is not None:
+            if os.path.lexists(link):
+                os.remove(link)
+            os.symlink(self._portName, link)
+        self._stopped = threading.Event()
+
+    def portName(self):
+        return self._link or self._portName
+
+    def reply(self, cmd):
+        '''
+        Returns
+        -------
+        reply: bytes
+            whole reply to <cmd>, prompt included
+        '''
+        raise NotImplementedError()
+
+    def run(self):
+        buf = b''
+        while not self._stopped.is_set():
+            ready, _, _ = select.select([self._master], [], [], 0.1)
+            if not ready:
+                continue
+            try:
+                buf += os.read(self._master, 1024)
+            except OSError:
+                return
+            while self._terminator in buf:
+                cmd, buf = buf.split(self._terminator, 1)
+                if self._replyDelaySec > 0:
+                    self._timeMod.sleep(self._replyDelaySec)
+                os.write(self._master, self.reply(cmd.decode()))
+
+    def stop(self):
+        self._stopped.set()
+        if self.is_alive():
+            self.join()
+        os.close(self._master)
+        os.close(self._slave)
+        if self._link is not None and os.path.islink(self._link):
+            os.remove(self._link)
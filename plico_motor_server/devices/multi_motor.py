@@ -0,0 +1,221 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from plico.utils.logger import Logger
+from plico.utils.decorator import override
+from plico_motor_server.devices.abstract_motor import AbstractMotor
+
+
+class MultiMotor(AbstractMotor):
+    '''
+    Several motor devices exposed as a single multi-axis motor.
+
+    Axes are numbered consecutively following the order of <motors>:
+    with a 1-axis device followed by a 4-axis device, axis 1 is the
+    first device and axes 2-5 are axes 1-4 of the second one.
+
+    Bulk queries and move_to_many are split by device and executed
+    concurrently, one worker thread per device. Accesses to devices
+    that are not THREAD_SAFE are serialized by a per-device lock, so
+    that a slow device never blocks the others.
+
+    With an <ioLoop> (DeviceIoLoop) positions_and_moving gathers the
+    async_positions_and_moving coroutines of all the devices on the
+    loop, so that a status read takes the time of the slowest device.
+    '''
+
+    THREAD_SAFE = True
+
+    def __init__(self, motors, name='MultiMotor', ioLoop=None):
+        if len(motors) == 0:
+            raise ValueError('MultiMotor needs at least one motor')
+        self._name = name
+        self._ioLoop = ioLoop
+        self._motors = list(motors)
+        self._logger = Logger.of('MultiMotor')
+        self._locks = [threading.RLock() for _ in self._motors]
+        self._axisMap = []
+        for deviceIdx, motor in enumerate(self._motors):
+            for i in range(motor.naxes()):
+                self._axisMap.append((deviceIdx, i + 1))
+        self._executor = ThreadPoolExecutor(
+            max_workers=len(self._motors),
+            thread_name_prefix='MultiMotor')
+
+    def motors(self):
+        return self._motors
+
+    def device_axis(self, axis):
+        '''
+        Returns
+        -------
+        device, axis: tuple
+            device and local axis number corresponding to <axis>
+        '''
+        deviceIdx, localAxis = self._axisMap[axis - 1]
+        return self._motors[deviceIdx], localAxis
+
+    def _callDevice(self, deviceIdx, func, *args):
+        motor = self._motors[deviceIdx]
+        if motor.THREAD_SAFE:
+            return func(*args)
+        with self._locks[deviceIdx]:
+            return func(*args)
+
+    def _call(self, method, axis, *args):
+        deviceIdx, localAxis = self._axisMap[axis - 1]
+        func = getattr(self._motors[deviceIdx], method)
+        return self._callDevice(deviceIdx, func, localAxis, *args)
+
+    def _groupByDevice(self, axes):
+        groups = {}
+        for axis in axes:
+            deviceIdx, localAxis = self._axisMap[axis - 1]
+            groups.setdefault(deviceIdx, []).append((axis, localAxis))
+        return groups
+
+    def _runConcurrently(self, calls):
+        '''
+        Execute {deviceIdx: (func, args)} in parallel, one call per device
+
+        Returns
+        -------
+        results: dict
+            {deviceIdx: result}
+        '''
+        if len(calls) == 1:
+            deviceIdx, (func, args) = list(calls.items())[0]
+            return {deviceIdx: self._callDevice(deviceIdx, func, *args)}
+        futures = {deviceIdx: self._executor.submit(
+                       self._callDevice, deviceIdx, func, *args)
+                   for deviceIdx, (func, args) in calls.items()}
+        return {deviceIdx: f.result() for deviceIdx, f in futures.items()}
+
+    def _bulkQuery(self, method, axes, nresults=None):
+        '''
+        Call the bulk query <method> of every device involved and
+        merge the results in the order of <axes>. Methods returning
+        a tuple of <nresults> lists are merged list by list.
+        '''
+        groups = self._groupByDevice(axes)
+        calls = {deviceIdx: (getattr(self._motors[deviceIdx], method),
+                             ([local for _, local in group],))
+                 for deviceIdx, group in groups.items()}
+        results = self._runConcurrently(calls)
+        return self._mergeResults(groups, results, axes, nresults)
+
+    def _mergeResults(self, groups, results, axes, nresults):
+        byAxis = {}
+        for deviceIdx, group in groups.items():
+            values = results[deviceIdx]
+            if nresults is not None:
+                values = list(zip(*values))
+            for (axis, _), value in zip(group, values):
+                byAxis[axis] = value
+        if nresults is None:
+            return [byAxis[axis] for axis in axes]
+        return tuple([byAxis[axis][i] for axis in axes]
+                     for i in range(nresults))
+
+    @override
+    def name(self):
+        return self._name
+
+    @override
+    def naxes(self):
+        return len(self._axisMap)
+
+    @override
+    def position(self, axis):
+        return self._call('position', axis)
+
+    @override
+    def velocity(self, axis):
+        return self._call('velocity', axis)
+
+    @override
+    def steps_per_SI_unit(self, axis):
+        return self._call('steps_per_SI_unit', axis)
+
+    @override
+    def was_homed(self, axis):
+        return self._call('was_homed', axis)
+
+    @override
+    def type(self, axis):
+        return self._call('type', axis)
+
+    @override
+    def is_moving(self, axis):
+        return self._call('is_moving', axis)
+
+    @override
+    def last_commanded_position(self, axis):
+        return self._call('last_commanded_position', axis)
+
+    @override
+    def positions(self, axes):
+        return self._bulkQuery('positions', axes)
+
+    @override
+    def are_moving(self, axes):
+        return self._bulkQuery('are_moving', axes)
+
+    @override
+    def positions_and_moving(self, axes):
+        if self._ioLoop is None:
+            return self._bulkQuery('positions_and_moving', axes, nresults=2)
+        return self._ioLoop.call(self.async_positions_and_moving(axes))
+
+    async def async_positions_and_moving(self, axes):
+        groups = self._groupByDevice(axes)
+        deviceIdxs = list(groups.keys())
+        replies = await asyncio.gather(*[
+            self._asyncDeviceStatus(deviceIdx,
+                                    [local for _, local in groups[deviceIdx]])
+            for deviceIdx in deviceIdxs])
+        results = dict(zip(deviceIdxs, replies))
+        return self._mergeResults(groups, results, axes, nresults=2)
+
+    async def _asyncDeviceStatus(self, deviceIdx, axes):
+        motor = self._motors[deviceIdx]
+        if motor.THREAD_SAFE:
+            return await motor.async_positions_and_moving(axes)
+        # Blocking drivers take their lock in a worker thread
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, self._callDevice, deviceIdx,
+            motor.positions_and_moving, axes)
+
+    @override
+    def home(self, axis):
+        return self._call('home', axis)
+
+    @override
+    def move_to(self, axis, position_in_steps):
+        return self._call('move_to', axis, position_in_steps)
+
+    @override
+    def move_by(self, axis, delta):
+        return self._call('move_by', axis, delta)
+
+    @override
+    def set_velocity(self, axis, velocity):
+        return self._call('set_velocity', axis, velocity)
+
+    @override
+    def stop(self, axis):
+        return self._call('stop', axis)
+
+    @override
+    def deinitialize(self, axis):
+        return self._call('deinitialize', axis)
+
+    @override
+    def move_to_many(self, positions):
+        groups = self._groupByDevice(positions.keys())
+        calls = {deviceIdx: (self._motors[deviceIdx].move_to_many,
+                             ({local: positions[axis]
+                               for axis, local in group},))
+                 for deviceIdx, group in groups.items()}
+        self._runConcurrently(calls)
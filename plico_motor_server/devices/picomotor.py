@@ -4,6 +4,8 @@ from plico.utils.logger import Logger
 from plico.utils.decorator import override
 from plico.utils.reconnect import Reconnecting, reconnect
 from plico_motor_server.devices.abstract_motor import AbstractMotor
+from plico_motor_server.devices.async_transport import AsyncTcpTransport
+from plico_motor_server.utils.line_reader import LineReader
 from plico_motor.types.motor_status import MotorStatus
 
 
@@ -36,6 +38,11 @@ class MyTcpSocket(socket.socket):
 
 class Picomotor(AbstractMotor, Reconnecting):
     '''Picomotor class.
+
+    With an <ioLoop> (DeviceIoLoop) all the I/O goes through a pipelined
+    AsyncTcpTransport running on that loop, the driver becomes
+    THREAD_SAFE and async_positions_and_moving reads the status
+    without blocking the loop.
     '''
 
     def __init__(self,
@@ -45,6 +52,7 @@ class Picomotor(AbstractMotor, Reconnecting):
                  timeout=2,
                  name='Picomotor',
                  verbose=False,
+                 ioLoop=None,
                  **_):
         self._name = name
         self.ipaddr = ipaddr
@@ -57,46 +65,88 @@ class Picomotor(AbstractMotor, Reconnecting):
 
         self._actual_position_in_steps = [0] * naxis
         self._has_been_homed = [False] * naxis
-        self._last_commanded_position = [0] * naxis
+        # None until known: the target of move_by needs the previous one
+        self._last_commanded_position = [None] * naxis
         self._sock = None
+        self._reader = LineReader(self._recv)
+        self._asyncTransport = None
+        if ioLoop is not None:
+            self._asyncTransport = AsyncTcpTransport(
+                ioLoop, ipaddr, port, timeoutSec=timeout)
+            # Requests from several threads are queued on the loop
+            self.THREAD_SAFE = True
         Reconnecting.__init__(self,
             self.connect,
             self.disconnect,
-            [socket.timeout],
+            [socket.timeout, ConnectionError],
         )
 
     def connect(self):
+        if self._asyncTransport is not None:
+            # The asyncio transport connects by itself when needed
+            return
         self._logger.notice('Connecting to picomotor at %s' % self.ipaddr)
         self._sock = MyTcpSocket(self.verbose)
+        self._reader.reset()
         self._sock.settimeout(self.timeout)
         self._sock.connect((self.ipaddr, self.port))
 
     def disconnect(self):
+        if self._asyncTransport is not None:
+            self._asyncTransport.close()
+            return
         self._sock.close()
 
     @override
     def naxes(self):
         return self.naxis
 
+    def _send(self, cmds):
+        '''
+        Send several (axis, cmd, args) commands with a single write
+
+        Commands are separated by ';' as allowed by the newfocus8742
+        protocol, and the line is terminated by a single newline.
+        '''
+        data = self._commandLine(cmds)
+        if self._asyncTransport is not None:
+            self._asyncTransport.sendSync(data)
+        else:
+            self._sock.send(data)
+
+    @staticmethod
+    def _commandLine(cmds):
+        cmds = [(c[0], c[1], c[2] if len(c) > 2 else ()) for c in cmds]
+        return (';'.join('%d%s%s' % (axis, cmd, ','.join(map(str, args)))
+                         for axis, cmd, args in cmds) + '\n').encode()
+
+    def _recv(self, bufsize):
+        return self._sock.recv(bufsize)
+
+    def _readline(self):
+        return self._reader.readline().strip()
+
     def _cmd(self, axis, cmd, *args):
         '''
         Send a command to the motor
         '''
-        cmdstr = '%d%s' % (axis, cmd)
-        cmdstr += ','.join(map(str, args)) + '\n'
-        self._sock.send(cmdstr.encode())
-        self._logger.debug('Sent command %r' % (cmdstr))
+        self._send([(axis, cmd, args)])
 
     def _ask(self, axis, cmd, *args):
-        self._cmd(axis, cmd, *args)
-        ans = self._sock.recv(128)
+        return self._ask_many([(axis, cmd, args)])[0]
 
-        # There are some garbage bytes when reconnecting, skip them
-        if ans[0] == 255:
-            ans = self._sock.recv(128)
-        # According to newfocus8742 the reply must end with \r\n
-        assert ans[-2:] == b'\r\n'
-        return ans.strip()
+    def _ask_many(self, cmds):
+        '''
+        Send several (axis, cmd) or (axis, cmd, args) queries with a
+        single write and return their replies, in the same order.
+        '''
+        if self._asyncTransport is not None:
+            replies = self._asyncTransport.askSync(
+                self._commandLine(cmds), len(cmds))
+            return [ans.strip() for ans in replies]
+        self._send(cmds)
+        # According to newfocus8742 each reply ends with \r\n
+        return [self._readline() for _ in cmds]
 
     @reconnect
     def _moveby(self, axis, steps):
@@ -114,10 +164,13 @@ class Picomotor(AbstractMotor, Reconnecting):
     @reconnect
     @override
     def position(self, axis):
-        curr_pos = int(self._ask(axis, 'PA?'))
-        self._logger.debug(
-            'Current position axis %d = %d steps' % (axis, curr_pos))
-        return curr_pos
+        return int(self._ask(axis, 'PA?'))
+
+    @reconnect
+    @override
+    def positions(self, axes):
+        replies = self._ask_many([(axis, 'PA?') for axis in axes])
+        return [int(ans) for ans in replies]
 
     @override
     def move_to(self, axis, position_in_steps):
@@ -125,6 +178,26 @@ class Picomotor(AbstractMotor, Reconnecting):
         self._last_commanded_position[axis - 1] = position_in_steps
         return self._moveby(axis, delta)
 
+    @override
+    def move_by(self, axis, delta):
+        last = self._last_commanded_position[axis - 1]
+        if last is not None:
+            self._last_commanded_position[axis - 1] = last + delta
+        return self._moveby(axis, delta)
+
+    @reconnect
+    @override
+    def move_to_many(self, positions):
+        axes = list(positions.keys())
+        current = self.positions(axes)
+        cmds = []
+        for axis, curpos in zip(axes, current):
+            delta = positions[axis] - curpos
+            self._last_commanded_position[axis - 1] = positions[axis]
+            self._logger.notice('Moving axis %d by %d steps' % (axis, delta))
+            cmds.append((axis, 'PR', (delta,)))
+        self._send(cmds)
+
     @override
     def velocity(self, axis):
         return 0
@@ -153,10 +226,50 @@ class Picomotor(AbstractMotor, Reconnecting):
     def type(self, axis):
         return MotorStatus.TYPE_LINEAR
 
+    @reconnect
     @override
     def is_moving(self, axis):
-        return False  # TBD
+        # MD? replies 0 while a motion is in progress, 1 when done
+        return self._ask(axis, 'MD?') == b'0'
+
+    @reconnect
+    @override
+    def are_moving(self, axes):
+        replies = self._ask_many([(axis, 'MD?') for axis in axes])
+        return [ans == b'0' for ans in replies]
+
+    @reconnect
+    @override
+    def positions_and_moving(self, axes):
+        replies = self._ask_many(self._statusQueries(axes))
+        return self._parseStatusReplies(axes, replies)
+
+    async def async_positions_and_moving(self, axes):
+        '''
+        Coroutine version of positions_and_moving. Must be awaited
+        on the ioLoop.
+        '''
+        if self._asyncTransport is None:
+            return await AbstractMotor.async_positions_and_moving(
+                self, axes)
+        cmds = self._statusQueries(axes)
+        replies = await self._asyncTransport.ask(
+            self._commandLine(cmds), len(cmds))
+        return self._parseStatusReplies(
+            axes, [ans.strip() for ans in replies])
+
+    def _statusQueries(self, axes):
+        return [(axis, 'PA?') for axis in axes] + \
+               [(axis, 'MD?') for axis in axes]
+
+    def _parseStatusReplies(self, axes, replies):
+        n = len(axes)
+        return ([int(ans) for ans in replies[:n]],
+                [ans == b'0' for ans in replies[n:]])
 
     @override
     def last_commanded_position(self, axis):
+        if self._last_commanded_position[axis - 1] is None:
+            # PA? replies the target of the last motion
+            self._last_commanded_position[axis - 1] = self.position(axis)
         return self._last_commanded_position[axis - 1]
@@ -0,0 +1,87 @@
+class SerialTimeoutException(Exception):
+    pass
+
+
+class SerialTransport(object):
+    '''
+    Command/reply transport over a serial line.
+
+    Every reply is read until the protocol <terminator> (e.g. the '>'
+    prompt of the Thorlabs controllers), blocking in the serial driver
+    for at most <timeoutSec>, instead of polling inWaiting() until the
+    byte count stops changing.
+
+    Parameters
+    ----------
+    ser: serial.Serial
+        open serial port
+    terminator: bytes
+        end of reply marker
+    timeoutSec: float
+        maximum time to wait for a complete reply
+    '''
+
+    def __init__(self, ser, terminator=b'>', timeoutSec=2.0):
+        self._ser = ser
+        self._terminator = terminator
+        self._timeoutSec = timeoutSec
+        self._ser.timeout = timeoutSec
+
+    def query(self, cmd, nterminators=1):
+        '''
+        Send <cmd> and return the complete reply, terminator included
+
+        Parameters
+        ----------
+        cmd: str
+            command, including its line terminator
+        nterminators: int
+            number of terminators in the reply, e.g. 2 for a device
+            that echoes the command line before its answer
+
+        Returns
+        -------
+        reply: str
+            decoded reply
+
+        Raises
+        ------
+        SerialTimeoutException
+            if the terminator is not received within the timeout
+        '''
+        # Discard leftovers of a previous, timed out reply
+        self._ser.reset_input_buffer()
+        self._ser.write(cmd.encode('utf-8'))
+        reply = b''
+        for _ in range(nterminators):
+            # read_until() returns at the terminator or when the
+            # serial timeout expires, whichever comes first
+            chunk = self._ser.read_until(self._terminator)
+            reply += chunk
+            if not chunk.endswith(self._terminator):
+                raise SerialTimeoutException(
+                    'Missing terminator %r after %g s, got %r' % (
+                        self._terminator, self._timeoutSec, reply))
+        return reply.decode('utf-8')
+
+    def queryBytes(self, cmd, nbytes):
+        '''
+        Send <cmd> and return its reply of exactly <nbytes> bytes, for
+        commands answered without a terminator
+
+        Raises
+        ------
+        SerialTimeoutException
+            if the reply is not complete within the timeout
+        '''
+        self._ser.reset_input_buffer()
+        self._ser.write(cmd.encode('utf-8'))
+        reply = self._ser.read(nbytes)
+        if len(reply) < nbytes:
+            raise SerialTimeoutException(
+                'Expected %d bytes after %g s, got %r' % (
+                    nbytes, self._timeoutSec, reply))
+        return reply.decode('utf-8')
+
+    def close(self):
+        pass
@@ -8,6 +8,9 @@ class SimulatedMotor(AbstractMotor):
     STEP_PER_M = 123456789
     MAX_VALUE = 65000
 
+    # In-memory state only, without any device I/O to serialize
+    THREAD_SAFE = True
+
     def __init__(self, name='Simulated Motor'):
         self._name = name
         self._logger = Logger.of('SimulatedMotor')
@@ -88,7 +88,7 @@ class StandaStage(AbstractMotor):
         n_ustep = x_pos.uPosition
         return n_step, n_ustep
 
-    def move_by(self, delta_step, delta_ustep):
+    def move_by_steps(self, delta_step, delta_ustep):
         '''
         Parameters
         ----------
@@ -287,6 +287,19 @@ class StandaStage(AbstractMotor):
         print("Position: {0} steps, {1} microsteps".format(n_step, n_ustep))
         self._last_commanded_position = upos
 
+    @override
+    def move_by(self, axis, delta):
+        '''
+        Parameters
+        ----------
+            delta: int
+                relative displacement in microsteps
+        '''
+        step, ustep = divmod(delta, self.microstep_mode_frac)
+        self.move_by_steps(step, ustep)
+        if self._last_commanded_position is not None:
+            self._last_commanded_position += delta
+
     @override
     def set_velocity(self, axis, velocity):
         '''
@@ -5,17 +5,18 @@ Authors
 '''
 import yaml
 import serial
-import time
 
 from plico.utils.logger import Logger
 from plico.utils.decorator import override
 from plico_motor_server.devices.abstract_motor import AbstractMotor
+from plico_motor_server.devices.serial_transport import SerialTransport, \
+    SerialTimeoutException
+from plico_motor_server.utils.shadow_position import ShadowPosition
 from plico_motor.types.motor_status import MotorStatus
 
 
-class SerialTimeoutException(Exception):
-    def __init__(self, value=-1):
-        print ("Missing response from serial after %i iterrations" % value)
+class TunableFilterException(Exception):
+    pass
 
 
 def _reconnect(f):
@@ -34,51 +35,55 @@ def _reconnect(f):
             return f(self, *args, **kwargs)
         except SerialTimeoutException:
             self.ser = None
+            self._transport = None
+            if self._shadow is not None:
+                self._shadow.invalidate()
             raise
 
     return func
 
 
 class TunableFilter(AbstractMotor):
+    '''
+    Tunable filter with the serial protocol described in <yamlFile>.
+
+    With <shadowRevalidationSec> the wavelength is read from the device
+    only every <shadowRevalidationSec> seconds, and is otherwise known
+    from the last set_wl() echoed by the filter (see ShadowPosition).
+    '''
 
     def __init__(self,
                  yamlFile,
                  name='TunableFilter',
                  verbose=False,
+                 shadowRevalidationSec=None,
                  ):
         self._name = name
         self.currfilt = CurrentFilterReader(yamlFile)
         self.naxis = 1
         self.verbose = verbose
         self._logger = Logger.of("TunableFilter")
+        self.ser = None
+        self._transport = None
+        self._shadow = None
+        if shadowRevalidationSec is not None:
+            self._shadow = ShadowPosition(shadowRevalidationSec)
 
         self._actual_position_in_steps = 0
         self._has_been_homed = True  # Tunable filter position is absolute
         self._last_commanded_position = 0
 
-    def _pollSerial(self):
-        nw = 0
-        nw0 = 0
-        it = 0
-        while True:
-            nw = self.ser.inWaiting()
-            it = it + 1
-            time.sleep(0.01)
-            if (nw >0) and (nw0==nw) or (it==10000):
-                break
-            nw0 = nw
-        if nw == 0:
-            raise SerialTimeoutException(it)
-        else:
-            return nw
-
     def connect(self):
 
         if self.ser is None:
-            self.ser = serial.Serial(self.currfilt.port, self.currfilt.speed,
+            self.ser = serial.Serial(self.currfilt.port,
+                                     self.currfilt.baud_rate,
                                      bytesize=self.currfilt.data_bits,
                                      parity=self.currfilt.parity,
                                      stopbits=self.currfilt.stop_bits)
+            self._transport = SerialTransport(self.ser,
+                                              self.currfilt.terminator,
+                                              self.currfilt.timeout)
             out = self.get_status()
             return out
 
@@ -98,14 +103,33 @@ class TunableFilter(AbstractMotor):
     @override
     def position(self, axis):
         assert axis == 1
-        pos = self.get_wl().split()[2]
-        self._logger.debug('Current tunable filter position = %d nm' % pos)
+        if self._shadow is None:
+            pos = self._read_wl()
+        else:
+            pos = self._shadow.get(self._read_wl)
+        self._logger.debug('Current tunable filter position = %g nm' % pos)
         return pos
 
+    def _read_wl(self):
+        # Reply: the echoed command, then 'W <wavelength>'
+        reply = self.get_wl()
+        try:
+            return float(reply.split()[2])
+        except (IndexError, ValueError):
+            raise TunableFilterException(
+                'Malformed wavelength reply %r' % reply)
+
     @override
     def move_to(self, axis, position_in_steps):
         assert axis == 1
-        self.set_wl(position_in_steps)
+        reply = self.set_wl(position_in_steps)
+        self._last_commanded_position = position_in_steps
+        if self._shadow is not None:
+            # Trust the new value only if the filter echoes the command
+            if (self.currfilt.write_wl % position_in_steps).strip() in reply:
+                self._shadow.set(float(position_in_steps))
+            else:
+                self._shadow.invalidate()
 
     @override
     def stop(self, axis):
@@ -117,6 +141,20 @@ class TunableFilter(AbstractMotor):
         '''Tunable filter is absolute, no need for homing'''
         pass
 
+    @override
+    def velocity(self, axis):
+        '''
+        Returns
+        -------
+        velocity: float
+            Motor velocity. Always zero.
+        '''
+        return 0
+
+    @override
+    def set_velocity(self, axis, velocity):
+        raise TunableFilterException('Set velocity command is not supported.')
+
     @override
     def steps_per_SI_unit(self, axis):
         return 1e9  # 1 step = 1nm
@@ -140,55 +178,48 @@ class TunableFilter(AbstractMotor):
         return self._last_commanded_position
 
 
+    def _query(self, cmd):
+        '''
+        Commands ending with the line terminator are answered with
+        terminated lines: QUERY_REPLY_LINES for queries ('?'),
+        COMMAND_REPLY_LINES for the others. The remaining commands are
+        single characters handled immediately by the filter, answered
+        with IMMEDIATE_REPLY_BYTES bytes without terminator.
+        '''
+        if cmd.endswith(self.currfilt.terminator.decode('utf-8')):
+            if '?' in cmd:
+                nlines = self.currfilt.query_reply_lines
+            else:
+                nlines = self.currfilt.command_reply_lines
+            return self._transport.query(cmd, nlines)
+        return self._transport.queryBytes(
+            cmd, self.currfilt.immediate_reply_bytes)
+
     @_reconnect
     def get_wl(self):
-        cmd = bytes(self.currfilt.read_wl, 'utf-8')
-        tmp = self.ser.write(cmd)
-        nw = self._pollSerial()
-        out = self.ser.read(self.ser.inWaiting()) 
-        return out
+        return self._query(self.currfilt.read_wl)
 
     @_reconnect
     def set_wl(self, wl):
         if wl < 420 or wl > 730:
             raise BaseException()
-        cmd = bytes(self.currfilt.write_wl % wl, 'utf-8')
-        tmp = self.ser.write(cmd)
-        nw = self._pollSerial()
-        out = self.ser.read(self.ser.inWaiting()) 
-        return out
+        return self._query(self.currfilt.write_wl % wl)
 
     @_reconnect
     def reset(self):
-        cmd = bytes(self.currfilt.reset, 'utf-8')
-        tmp = self.ser.write(cmd)
-        nw = self._pollSerial()
-        out = self.ser.read(self.ser.inWaiting()) 
-        return out
+        return self._query(self.currfilt.reset)
 
     @_reconnect
     def get_status(self):
-        cmd = bytes(self.currfilt.read_status, 'utf-8')
-        tmp = self.ser.write(cmd)
-        nw = self._pollSerial()
-        out = self.ser.read(self.ser.inWaiting()) 
-        return out
+        return self._query(self.currfilt.read_status)
 
     @_reconnect
     def isbusy(self):
-        cmd = bytes(self.currfilt.busy_check, 'utf-8')
-        tmp = self.ser.write(cmd)
-        nw = self._pollSerial()
-        out = self.ser.read(self.ser.inWaiting()) 
-        return out
+        return self._query(self.currfilt.busy_check)
 
     @_reconnect
     def cancel(self):
-        cmd = bytes(self.currfilt.escape, 'utf-8')
-        tmp = self.ser.write(cmd)
-        nw = self._pollSerial()
-        out = self.ser.read(self.ser.inWaiting()) 
-        return out
+        return self._query(self.currfilt.escape)
 
 
 class CurrentFilterReader():
@@ -247,4 +278,24 @@ class CurrentFilterReader():
     def flow_controll(self):
         return self._currFilt['FLOWCONTROLL']
 
+    @property
+    def terminator(self):
+        return self._currFilt.get('TERMINATOR', '\r').encode('utf-8')
+
+    @property
+    def timeout(self):
+        return self._currFilt.get('TIMEOUT', 2.0)
+
+    @property
+    def query_reply_lines(self):
+        return self._currFilt.get('QUERY_REPLY_LINES', 1)
+
+    @property
+    def command_reply_lines(self):
+        return self._currFilt.get('COMMAND_REPLY_LINES', 1)
+
+    @property
+    def immediate_reply_bytes(self):
+        return self._currFilt.get('IMMEDIATE_REPLY_BYTES', 1)
+
 
@@ -0,0 +1,298 @@
+import threading
+import time
+import numpy as np
+from plico.utils.decorator import override
+from plico_motor_server.devices.abstract_motor import AbstractMotor
+from plico_motor.types.motor_status import MotorStatus
+
+
+class VectorizedSimulatedMotor(AbstractMotor):
+    '''
+    Simulated motor with <naxes> axes and kinematic motion profiles.
+
+    The state of all axes is kept in NumPy arrays. Every move follows
+    a trapezoidal profile: acceleration up to the axis velocity, cruise
+    and deceleration down to rest on the target. The profile of every
+    moving axis is computed in closed form, so that a query advances
+    all of them with a single vectorized update to the current time.
+
+    A move commanded while the axis is already moving towards the new
+    target keeps the current speed; otherwise the axis restarts from
+    rest. stop() decelerates the axis to rest.
+
+    Every call costs <ioLatencySec>, to model the device round trip.
+    Bulk queries and move_to_many cost one round trip for all axes.
+
+    velocity() returns the instantaneous velocity in steps/s; the
+    maximum one is set with set_velocity().
+    '''
+
+    # The state of all axes is only accessed with self._lock held
+    THREAD_SAFE = True
+
+    def __init__(self, naxes, velocity=1000.0, acceleration=10000.0,
+                 ioLatencySec=0.0, name='Vectorized Simulated Motor',
+                 timeMod=time):
+        if velocity <= 0 or acceleration <= 0:
+            raise ValueError('Velocity and acceleration must be positive')
+        self._name = name
+        self._naxes = naxes
+        self._ioLatencySec = ioLatencySec
+        self._timeMod = timeMod
+        self._lock = threading.Lock()
+        self._maxVelocity = np.full(naxes, float(velocity))
+        self._acceleration = np.full(naxes, float(acceleration))
+        self._position = np.zeros(naxes)
+        self._velocity = np.zeros(naxes)
+        self._target = np.zeros(naxes)
+        self._lastCommanded = np.zeros(naxes, dtype=np.int64)
+        self._homed = np.zeros(naxes, dtype=bool)
+        self._moving = np.zeros(naxes, dtype=bool)
+        # Motion profiles: start time, start position, direction,
+        # initial and peak speed, and the end of the three phases
+        self._t0 = np.zeros(naxes)
+        self._p0 = np.zeros(naxes)
+        self._direction = np.zeros(naxes)
+        self._v0 = np.zeros(naxes)
+        self._vPeak = np.zeros(naxes)
+        self._tAccel = np.zeros(naxes)
+        self._tCruise = np.zeros(naxes)
+        self._tEnd = np.zeros(naxes)
+
+    def _io(self):
+        if self._ioLatencySec > 0:
+            self._timeMod.sleep(self._ioLatencySec)
+
+    def _index(self, axis):
+        if not 1 <= axis <= self._naxes:
+            raise ValueError('Axis %d out of range 1-%d' % (
+                axis, self._naxes))
+        return axis - 1
+
+    def _indices(self, axes):
+        return np.array([self._index(axis) for axis in axes], dtype=int)
+
+    # --------------
+    # Motion model
+
+    def _advance(self):
+        '''
+        Bring positions and velocities of all moving axes to the
+        current time
+        '''
+        now = self._timeMod.time()
+        idx = np.flatnonzero(self._moving)
+        if idx.size == 0:
+            return
+        a = self._acceleration[idx]
+        v0 = self._v0[idx]
+        vp = self._vPeak[idx]
+        tA = self._tAccel[idx]
+        tC = self._tCruise[idx]
+        t = np.minimum(now - self._t0[idx], self._tEnd[idx])
+        dA = (vp + v0) * 0.5 * tA
+        dC = vp * (tC - tA)
+        u = np.clip(t - tC, 0, None)
+        distance = np.where(
+            t < tA, v0 * t + 0.5 * a * t * t,
+            np.where(t < tC, dA + vp * (t - tA),
+                     dA + dC + vp * u - 0.5 * a * u * u))
+        speed = np.where(t < tA, v0 + a * t,
+                         np.where(t < tC, vp, vp - a * u))
+        done = t >= self._tEnd[idx]
+        direction = self._direction[idx]
+        self._position[idx] = np.where(
+            done, self._target[idx], self._p0[idx] + direction * distance)
+        self._velocity[idx] = np.where(done, 0.0, direction * speed)
+        self._moving[idx] = ~done
+
+    def _startProfiles(self, idx, targets):
+        '''
+        Plan the trapezoidal profiles of axes <idx> from their current
+        state to <targets>
+        '''
+        now = self._timeMod.time()
+        self._advance()
+        start = self._position[idx]
+        delta = targets - start
+        direction = np.sign(delta)
+        distance = np.abs(delta)
+        a = self._acceleration[idx]
+        vMax = self._maxVelocity[idx]
+        # Keep the current speed only if already moving the right way,
+        # but never more than what can be stopped within <distance>
+        v0 = np.clip(self._velocity[idx] * direction, 0, None)
+        v0 = np.minimum(np.minimum(v0, vMax), np.sqrt(2 * a * distance))
+        # Peak speed of a triangular profile, capped to the velocity
+        vp = np.minimum(np.sqrt((2 * a * distance + v0 * v0) / 2), vMax)
+        vp = np.maximum(vp, v0)
+        tA = (vp - v0) / a
+        dA = (vp + v0) * 0.5 * tA
+        dD = vp * vp / (2 * a)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tCruise = np.where(vp > 0, (distance - dA - dD) / vp, 0.0)
+        tC = tA + np.clip(tCruise, 0, None)
+        self._t0[idx] = now
+        self._p0[idx] = start
+        self._target[idx] = targets
+        self._direction[idx] = direction
+        self._v0[idx] = v0
+        self._vPeak[idx] = vp
+        self._tAccel[idx] = tA
+        self._tCruise[idx] = tC
+        self._tEnd[idx] = tC + vp / a
+        self._moving[idx] = distance > 0
+        arrived = distance == 0
+        self._velocity[idx[arrived]] = 0.0
+
+    def _moveTo(self, idx, targets):
+        with self._lock:
+            self._lastCommanded[idx] = targets
+            self._startProfiles(idx, np.asarray(targets, dtype=float))
+
+    # -------------
+    # Queries
+
+    @override
+    def name(self):
+        return self._name
+
+    @override
+    def naxes(self):
+        return self._naxes
+
+    @override
+    def position(self, axis):
+        return self.positions([axis])[0]
+
+    @override
+    def velocity(self, axis):
+        i = self._index(axis)
+        self._io()
+        with self._lock:
+            self._advance()
+            return float(self._velocity[i])
+
+    @override
+    def steps_per_SI_unit(self, axis):
+        self._index(axis)
+        return 1
+
+    @override
+    def was_homed(self, axis):
+        i = self._index(axis)
+        return bool(self._homed[i])
+
+    @override
+    def type(self, axis):
+        self._index(axis)
+        return MotorStatus.TYPE_LINEAR
+
+    @override
+    def is_moving(self, axis):
+        return self.are_moving([axis])[0]
+
+    @override
+    def last_commanded_position(self, axis):
+        i = self._index(axis)
+        return int(self._lastCommanded[i])
+
+    # -------------
+    # Bulk queries
+
+    @override
+    def positions(self, axes):
+        return self.positions_and_moving(axes)[0]
+
+    @override
+    def are_moving(self, axes):
+        return self.positions_and_moving(axes)[1]
+
+    @override
+    def positions_and_moving(self, axes):
+        idx = self._indices(axes)
+        self._io()
+        with self._lock:
+            self._advance()
+            positions = np.rint(self._position[idx]).astype(int)
+            return positions.tolist(), self._moving[idx].tolist()
+
+    @override
+    def status_all_axes(self):
+        self._io()
+        with self._lock:
+            self._advance()
+            positions = np.rint(self._position).astype(int).tolist()
+            velocities = self._velocity.tolist()
+            moving = self._moving.tolist()
+            homed = self._homed.tolist()
+            commanded = self._lastCommanded.tolist()
+        return [MotorStatus(self._name, positions[i], velocities[i], 1,
+                            homed[i], MotorStatus.TYPE_LINEAR, moving[i],
+                            commanded[i], i + 1)
+                for i in range(self._naxes)]
+
+    # --------------
+    # Commands
+
+    @override
+    def home(self, axis):
+        i = self._index(axis)
+        self._io()
+        self._moveTo(np.array([i]), [0])
+        self._homed[i] = True
+
+    @override
+    def move_to(self, axis, position_in_steps):
+        i = self._index(axis)
+        self._io()
+        self._moveTo(np.array([i]), [position_in_steps])
+
+    @override
+    def move_by(self, axis, delta):
+        i = self._index(axis)
+        self._io()
+        with self._lock:
+            self._advance()
+            target = int(np.rint(self._position[i])) + delta
+        self._moveTo(np.array([i]), [target])
+
+    @override
+    def move_to_many(self, positions):
+        idx = self._indices(positions.keys())
+        self._io()
+        self._moveTo(idx, list(positions.values()))
+
+    @override
+    def set_velocity(self, axis, velocity):
+        i = self._index(axis)
+        if velocity <= 0:
+            raise ValueError('Velocity must be positive')
+        self._io()
+        with self._lock:
+            self._maxVelocity[i] = velocity
+
+    def set_acceleration(self, axis, acceleration):
+        i = self._index(axis)
+        if acceleration <= 0:
+            raise ValueError('Acceleration must be positive')
+        self._io()
+        with self._lock:
+            self._acceleration[i] = acceleration
+
+    @override
+    def stop(self, axis):
+        i = self._index(axis)
+        self._io()
+        with self._lock:
+            self._advance()
+            if not self._moving[i]:
+                return
+            v = self._velocity[i]
+            brake = v * v / (2 * self._acceleration[i])
+            self._startProfiles(np.array([i]),
+                                self._position[[i]] + np.sign(v) * brake)
+
+    @override
+    def deinitialize(self, axis):
+        self._index(axis)
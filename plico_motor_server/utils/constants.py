@@ -14,3 +14,5 @@ class Constants:
     KILL_ALL_PROCESS_NAME = 'plico_motor_kill_all'
     SERVER_PROCESS_NAME = 'plico_motor_server'
     FAKE_NEWFOCUS8742_PROCESS_NAME = 'plico_motor_fake_newfocus8742'
+    FAKE_FW102B_PROCESS_NAME = 'plico_motor_fake_fw102b'
+    FAKE_KURIOSVB1_PROCESS_NAME = 'plico_motor_fake_kuriosvb1'
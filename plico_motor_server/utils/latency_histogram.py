@@ -0,0 +1,127 @@
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from plico.utils.decorator import synchronized
+
+
+class LatencyHistogram(object):
+    '''
+    Fixed-bucket latency histogram.
+
+    Buckets are logarithmically spaced between <minSec> and <maxSec>,
+    with <bucketsPerDecade> buckets per decade, plus one underflow and
+    one overflow bucket. Percentiles are estimated with the upper edge
+    of the bucket where they fall, so they are accurate within one
+    bucket width (about 26% with the default 10 buckets per decade).
+    '''
+
+    def __init__(self, minSec=1e-6, maxSec=10.0, bucketsPerDecade=10):
+        ndecades = math.log10(maxSec / minSec)
+        nedges = int(round(ndecades * bucketsPerDecade)) + 1
+        self._edges = [minSec * 10 ** (i / bucketsPerDecade)
+                       for i in range(nedges)]
+        self.reset()
+
+    def reset(self):
+        self._counts = [0] * (len(self._edges) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+
+    def record(self, durationSec):
+        self._counts[bisect.bisect_left(self._edges, durationSec)] += 1
+        self._count += 1
+        self._sum += durationSec
+        self._max = max(self._max, durationSec)
+
+    def count(self):
+        return self._count
+
+    def max(self):
+        return self._max
+
+    def mean(self):
+        if self._count == 0:
+            return 0.0
+        return self._sum / self._count
+
+    def percentile(self, p):
+        '''
+        Parameters
+        ----------
+        p: float
+            percentile between 0 and 100
+
+        Returns
+        -------
+        latency: float
+            upper edge of the bucket holding the p-th percentile, in seconds
+        '''
+        if self._count == 0:
+            return 0.0
+        threshold = self._count * p / 100.0
+        cumulative = 0
+        for i, n in enumerate(self._counts):
+            cumulative += n
+            if cumulative >= threshold and n > 0:
+                if i == len(self._edges):
+                    return self._max
+                return min(self._edges[i], self._max)
+        return self._max
+
+    def summary(self):
+        return {'count': self._count,
+                'mean': self.mean(),
+                'p50': self.percentile(50),
+                'p99': self.percentile(99),
+                'max': self._max}
+
+
+class LoopStatistics(object):
+    '''
+    Thread-safe collection of named latency histograms
+    '''
+
+    def __init__(self, **histogramKwargs):
+        self._histogramKwargs = histogramKwargs
+        self._histograms = {}
+        self._mutex = threading.Lock()
+
+    @synchronized('_mutex')
+    def record(self, phase, durationSec):
+        if phase not in self._histograms:
+            self._histograms[phase] = LatencyHistogram(
+                **self._histogramKwargs)
+        self._histograms[phase].record(durationSec)
+
+    @contextmanager
+    def timing(self, phase):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, time.perf_counter() - t0)
+
+    @synchronized('_mutex')
+    def summary(self):
+        '''
+        Returns
+        -------
+        summary: dict
+            {phase: {'count', 'mean', 'p50', 'p99', 'max'}}, times in seconds
+        '''
+        return {phase: h.summary() for phase, h in self._histograms.items()}
+
+    @synchronized('_mutex')
+    def reset(self):
+        self._histograms = {}
+
+    def format(self):
+        lines = []
+        for phase, s in sorted(self.summary().items()):
+            lines.append('%s: n=%d p50=%.3fms p99=%.3fms max=%.3fms' % (
+                phase, s['count'], s['p50'] * 1e3, s['p99'] * 1e3,
+                s['max'] * 1e3))
+        return '; '.join(lines)
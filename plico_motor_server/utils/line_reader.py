@@ -0,0 +1,127 @@
+IAC = 255
+SB = 250
+SE = 240
+WILL = 251
+DONT = 254
+
+
+class LineReader(object):
+    '''
+    Line framing on top of a byte stream.
+
+    Bytes returned by <recvFunc> are accumulated in an internal buffer
+    and split on <terminator>, so that replies split across several
+    reads or coalesced in a single one are both returned as complete
+    lines. Bytes following a line are kept for the next readline().
+
+    Telnet negotiation sequences (IAC ...), like the ones sent by the
+    newfocus8742 controller when a connection is opened, are removed
+    from the stream, even when split across reads.
+
+    Without <recvFunc> the reader is push-only: bytes are given with
+    feed() and complete lines taken with popLine().
+    '''
+
+    def __init__(self, recvFunc=None, terminator=b'\r\n', chunkSize=1024):
+        self._recv = recvFunc
+        self._terminator = terminator
+        self._chunkSize = chunkSize
+        self.reset()
+
+    def reset(self):
+        '''
+        Discard all buffered bytes, e.g. after a reconnection
+        '''
+        self._buffer = bytearray()
+        self._partial = b''
+        self._searchFrom = 0
+
+    def pending(self):
+        '''
+        Returns
+        -------
+        pending: bytes
+            bytes received but not yet returned as a line
+        '''
+        return bytes(self._buffer)
+
+    def feed(self, data):
+        self._buffer += self._stripTelnet(data)
+
+    def popLine(self):
+        '''
+        Returns
+        -------
+        line: bytes or None
+            next complete line already buffered, without terminator,
+            or None. Never reads from the stream.
+        '''
+        idx = self._buffer.find(self._terminator, self._searchFrom)
+        if idx < 0:
+            # The terminator may start in the last bytes already searched
+            self._searchFrom = max(
+                0, len(self._buffer) - len(self._terminator) + 1)
+            return None
+        line = bytes(self._buffer[:idx])
+        del self._buffer[:idx + len(self._terminator)]
+        self._searchFrom = 0
+        return line
+
+    def readline(self):
+        '''
+        Returns
+        -------
+        line: bytes
+            next complete line, without terminator
+
+        Raises
+        ------
+        ConnectionResetError
+            if the peer closed the connection
+        '''
+        while True:
+            line = self.popLine()
+            if line is not None:
+                return line
+            data = self._recv(self._chunkSize)
+            if len(data) == 0:
+                raise ConnectionResetError('Connection closed by peer')
+            self.feed(data)
+
+    def _stripTelnet(self, data):
+        if self._partial:
+            data = self._partial + data
+            self._partial = b''
+        if IAC not in data:
+            return data
+        out = bytearray()
+        i = 0
+        n = len(data)
+        while i < n:
+            j = data.find(IAC, i)
+            if j < 0:
+                out += data[i:]
+                break
+            out += data[i:j]
+            if j + 1 >= n:
+                self._partial = bytes(data[j:])
+                break
+            cmd = data[j + 1]
+            if cmd == IAC:
+                # Escaped 0xff data byte
+                out.append(IAC)
+                i = j + 2
+            elif WILL <= cmd <= DONT:
+                if j + 2 >= n:
+                    self._partial = bytes(data[j:])
+                    break
+                i = j + 3
+            elif cmd == SB:
+                end = data.find(bytes([IAC, SE]), j + 2)
+                if end < 0:
+                    self._partial = bytes(data[j:])
+                    break
+                i = end + 2
+            else:
+                i = j + 2
+        return out
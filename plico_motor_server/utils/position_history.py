@@ -0,0 +1,70 @@
+import threading
+import numpy as np
+from plico.utils.decorator import synchronized
+
+
+class PositionHistory(object):
+    '''
+    Ring buffer of the last <capacity> status samples of one axis.
+
+    Samples are (timestamp, position, is_moving) records, stored in a
+    preallocated NumPy structured array: once full, the oldest sample
+    is overwritten at every append. Timestamps are expected to be
+    appended in increasing order.
+    '''
+
+    DTYPE = np.dtype([('timestamp', 'f8'),
+                      ('position', 'f8'),
+                      ('is_moving', '?')])
+
+    def __init__(self, capacity):
+        if capacity <= 0:
+            raise ValueError('Capacity must be positive')
+        self._samples = np.zeros(capacity, dtype=self.DTYPE)
+        self._next = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    @synchronized('_lock')
+    def append(self, timestamp, position, isMoving):
+        self._samples[self._next] = (timestamp, position, isMoving)
+        self._next = (self._next + 1) % len(self._samples)
+        self._count = min(self._count + 1, len(self._samples))
+
+    @synchronized('_lock')
+    def __len__(self):
+        return self._count
+
+    def capacity(self):
+        return len(self._samples)
+
+    @synchronized('_lock')
+    def samples(self, since=None, maxSamples=None):
+        '''
+        Parameters
+        ----------
+        since: float or None
+            return only the samples with timestamp greater than <since>
+        maxSamples: int or None
+            return at most the <maxSamples> oldest of them. To page
+            through the history, call again with <since> set to the
+            last returned timestamp.
+
+        Returns
+        -------
+        samples: numpy structured array
+            fields 'timestamp', 'position' and 'is_moving', oldest first
+        '''
+        if self._count < len(self._samples):
+            ordered = self._samples[:self._count]
+        else:
+            ordered = np.concatenate((self._samples[self._next:],
+                                      self._samples[:self._next]))
+        start = 0
+        if since is not None:
+            start = np.searchsorted(ordered['timestamp'], since,
+                                    side='right')
+        stop = len(ordered)
+        if maxSamples is not None:
+            stop = min(stop, start + maxSamples)
+        return ordered[start:stop].copy()
@@ -30,3 +30,13 @@ class ProcessStartUpHelper(object):
         return os.path.join(self._moduleRoot,
                             'devices',
                             'fake_newfocus8742.py')
+
+    def fakeFW102BScriptPath(self):
+        return os.path.join(self._moduleRoot,
+                            'devices',
+                            'fake_fw102b.py')
+
+    def fakeKuriosVB1ScriptPath(self):
+        return os.path.join(self._moduleRoot,
+                            'devices',
+                            'fake_kuriosvb1.py')
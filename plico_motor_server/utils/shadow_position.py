@@ -0,0 +1,62 @@
+import time
+
+
+class ShadowPosition(object):
+    '''
+    Last known position of a device that moves only when commanded.
+
+    The position is read from the device once and then served from
+    memory, updated by the commands whose reply confirms the new value.
+    It is read again when older than <revalidationPeriodSec>, to catch
+    changes made from the device front panel, and after invalidate(),
+    e.g. on reconnection or when a command reply is not the expected
+    one.
+    '''
+
+    def __init__(self, revalidationPeriodSec, timeMod=time):
+        self._periodSec = revalidationPeriodSec
+        self._timeMod = timeMod
+        self._reads = 0
+        self.invalidate()
+
+    def invalidate(self):
+        self._value = None
+        self._timestamp = None
+
+    def set(self, value):
+        self._value = value
+        self._timestamp = self._timeMod.time()
+
+    def cached(self):
+        '''
+        Returns
+        -------
+        value: object or None
+            known position, or None if it must be read from the device
+        '''
+        if self._timestamp is None:
+            return None
+        if self._timeMod.time() - self._timestamp >= self._periodSec:
+            return None
+        return self._value
+
+    def get(self, readFunc):
+        '''
+        Known position, calling <readFunc> to read it from the device
+        only if needed
+        '''
+        value = self.cached()
+        if value is None:
+            value = readFunc()
+            self._reads += 1
+            self.set(value)
+        return value
+
+    def reads(self):
+        '''
+        Returns
+        -------
+        reads: int
+            number of device reads done by get()
+        '''
+        return self._reads
@@ -0,0 +1,79 @@
+import heapq
+import threading
+import time
+
+
+class SimulatedClock(object):
+    '''
+    Simulated time, to be used in place of the time module.
+
+    A single clock is shared by the controller, the control loop and
+    the simulated devices, passed as their timeMod. sleep() advances
+    the clock instead of waiting, so that long scenarios run as fast
+    as the code allows and, when driven by a single thread, always in
+    the same way.
+
+    With <speedup> sleep() also waits for the given duration divided
+    by <speedup> in real time, to leave time to the other threads,
+    e.g. clients of a running server.
+
+    Actions can be scheduled at a given simulated time with callAt():
+    they are called, in time order, by the thread that moves the clock
+    past it.
+    '''
+
+    def __init__(self, startTime=0.0, speedup=None, realTimeMod=time):
+        self._now = float(startTime)
+        self._speedup = speedup
+        self._realTimeMod = realTimeMod
+        self._lock = threading.Lock()
+        self._timers = []
+        self._timerCounter = 0
+
+    def time(self):
+        with self._lock:
+            return self._now
+
+    monotonic = time
+    perf_counter = time
+
+    def sleep(self, durationSec):
+        if self._speedup:
+            self._realTimeMod.sleep(durationSec / self._speedup)
+        self.advance(durationSec)
+
+    def advance(self, durationSec):
+        '''
+        Move the clock forward by <durationSec>, calling the actions
+        that become due on the way
+        '''
+        if durationSec < 0:
+            raise ValueError('Time cannot go backwards')
+        self.advanceTo(self.time() + durationSec)
+
+    def advanceTo(self, when):
+        while True:
+            # Actions are called without the lock, since they may wait
+            # for other threads that read the clock
+            with self._lock:
+                if not self._timers or self._timers[0][0] > when:
+                    self._now = max(self._now, when)
+                    return
+                due, _, func = heapq.heappop(self._timers)
+                self._now = max(self._now, due)
+            func()
+
+    def callAt(self, when, func):
+        '''
+        Call <func> (no arguments) when the clock reaches <when>
+        '''
+        with self._lock:
+            heapq.heappush(self._timers, (when, self._timerCounter, func))
+            self._timerCounter += 1
+
+    def callLater(self, delaySec, func):
+        self.callAt(self.time() + delaySec, func)
+
+    def pendingTimers(self):
+        with self._lock:
+            return len(self._timers)
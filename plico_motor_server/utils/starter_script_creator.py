@@ -37,3 +37,13 @@ class StarterScriptCreator(StarterScriptCreatorBase):
             psh.fakeNewFocus8742ScriptPath(),
             'not used'
         )
+        self._createAStarterScript(
+            os.path.join(self._binDir, Constants.FAKE_FW102B_PROCESS_NAME),
+            psh.fakeFW102BScriptPath(),
+            'not used'
+        )
+        self._createAStarterScript(
+            os.path.join(self._binDir, Constants.FAKE_KURIOSVB1_PROCESS_NAME),
+            psh.fakeKuriosVB1ScriptPath(),
+            'not used'
+        )
@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+'''
+Benchmark of the MotorController hot path.
+
+The controller runs against SimulatedMotor (1 axis) or an N-axis
+in-memory motor, so that only the controller cost is measured.
+With --motor vectorized it runs against VectorizedSimulatedMotor,
+whose axes follow kinematic motion profiles:
+
+- steps/s of MotorController.step, and the mean duration of
+  _getMotorStatus and _publishStatus
+- size of the pickled status payload, full and delta
+- net allocated blocks and bytes per step (tracemalloc)
+- RPC round trip over real ZMQ sockets, with the controller stepping
+  in a separate process
+
+Results are printed and, with --output, written as JSON together with
+the current git commit, so that two commits can be compared.
+
+Run with:
+    python -m test.benchmark.controller_benchmark --naxes 1 4 16
+    python -m test.benchmark.controller_benchmark --motor vectorized \
+        --naxes 16 256 4096
+'''
+import argparse
+import json
+import multiprocessing
+import pickle
+import platform
+import socket
+import subprocess
+import time
+import tracemalloc
+from plico.rpc.zmq_remote_procedure_call import ZmqRemoteProcedureCall
+from plico.utils.constants import Constants as PlicoConstants
+from plico.utils.decorator import override
+from plico_motor.types.motor_status import MotorStatus
+from plico_motor_server.controller.controller import MotorController
+from plico_motor_server.devices.abstract_motor import AbstractMotor
+from plico_motor_server.devices.simulated_motor import SimulatedMotor
+from plico_motor_server.devices.vectorized_simulated_motor import \
+    VectorizedSimulatedMotor
+
+
+class NAxisSimulatedMotor(AbstractMotor):
+    '''
+    In-memory motor with <naxes> axes and instantaneous moves
+    '''
+
+    THREAD_SAFE = True
+
+    def __init__(self, naxes):
+        self._naxes = naxes
+        self._position = [0] * naxes
+
+    @override
+    def name(self):
+        return 'NAxisSimulatedMotor'
+
+    @override
+    def naxes(self):
+        return self._naxes
+
+    @override
+    def home(self, axis):
+        self._position[axis - 1] = 0
+
+    @override
+    def position(self, axis):
+        return self._position[axis - 1]
+
+    @override
+    def move_to(self, axis, position_in_steps):
+        self._position[axis - 1] = position_in_steps
+
+    @override
+    def velocity(self, axis):
+        return 0
+
+    @override
+    def set_velocity(self, axis, velocity):
+        pass
+
+    @override
+    def stop(self, axis):
+        pass
+
+    @override
+    def deinitialize(self, axis):
+        pass
+
+    @override
+    def steps_per_SI_unit(self, axis):
+        return 1
+
+    @override
+    def was_homed(self, axis):
+        return True
+
+    @override
+    def type(self, axis):
+        return MotorStatus.TYPE_LINEAR
+
+    @override
+    def is_moving(self, axis):
+        return False
+
+    @override
+    def last_commanded_position(self, axis):
+        return self._position[axis - 1]
+
+
+class PicklingRpcHandler():
+    '''
+    In-process RPC handler: no requests, and the status is pickled as
+    ZmqRemoteProcedureCall.publishPickable does, to record its size
+    '''
+
+    def __init__(self):
+        self.lastPayloadSize = None
+
+    def handleRequest(self, obj, socket, multi):
+        pass
+
+    def publishPickable(self, socket, anObject):
+        self.lastPayloadSize = len(
+            pickle.dumps(anObject, PlicoConstants.PICKLE_PROTOCOL))
+
+
+def createMotor(naxes, kind='memory'):
+    if kind == 'vectorized':
+        return VectorizedSimulatedMotor(naxes)
+    if naxes == 1:
+        return SimulatedMotor()
+    return NAxisSimulatedMotor(naxes)
+
+
+def createController(motor, rpcHandler, replySocket=None,
+                     statusSocket=None, **kwargs):
+    return MotorController('bench', None, motor, replySocket, statusSocket,
+                           rpcHandler, **kwargs)
+
+
+def meanDuration(func, iterations):
+    t0 = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - t0) / iterations
+
+
+def allocationsPerStep(ctrl, iterations):
+    # Warm up caches and lazily created objects first
+    for _ in range(10):
+        ctrl.step()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for _ in range(iterations):
+        ctrl.step()
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stats = after.compare_to(before, 'lineno')
+    return {'blocks': sum(s.count_diff for s in stats) / iterations,
+            'bytes': sum(s.size_diff for s in stats) / iterations,
+            'peak_bytes': peak}
+
+
+def benchmarkInProcess(naxes, iterations, kind='memory'):
+    results = {}
+    rpcHandler = PicklingRpcHandler()
+    ctrl = createController(createMotor(naxes, kind), rpcHandler)
+    ctrl.step()
+    results['steps_per_s'] = 1 / meanDuration(ctrl.step, iterations)
+    results['get_motor_status_s'] = meanDuration(
+        ctrl._getMotorStatus, iterations)
+    results['publish_status_s'] = meanDuration(
+        ctrl._publishStatus, iterations)
+    results['allocations_per_step'] = allocationsPerStep(ctrl, iterations)
+    # Payloads are compared after the same move of one axis
+    ctrl.move_to(1, 10)
+    ctrl.step()
+    results['payload_bytes_full'] = rpcHandler.lastPayloadSize
+    ctrl.terminate()
+
+    rpcHandler = PicklingRpcHandler()
+    ctrl = createController(createMotor(naxes, kind), rpcHandler,
+                            statusPublishMode='delta')
+    ctrl.step()
+    # A delta with the change of one axis, after the keyframe
+    ctrl.move_to(1, 10)
+    ctrl.step()
+    results['payload_bytes_delta'] = rpcHandler.lastPayloadSize
+    ctrl.terminate()
+    return results
+
+
+def freePort():
+    sock = socket.socket()
+    sock.bind(('localhost', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def _serve(naxes, port, kind):
+    rpc = ZmqRemoteProcedureCall()
+    replySocket = rpc.replySocket(port)
+    statusSocket = rpc.publisherSocket(freePort(), hwm=1)
+    ctrl = createController(createMotor(naxes, kind), rpc, replySocket,
+                            statusSocket)
+    while not ctrl.isTerminated():
+        ctrl.step()
+
+
+def benchmarkRpc(naxes, iterations, kind='memory'):
+    '''
+    Round trip of getStepCounter and move_to, with the controller
+    stepping as fast as it can in a separate process, so that client
+    and server do not compete for the GIL
+    '''
+    port = freePort()
+    process = multiprocessing.Process(target=_serve, args=(naxes, port, kind),
+                                      daemon=True)
+    process.start()
+    rpc = ZmqRemoteProcedureCall()
+    sock = rpc.requestSocket('localhost', port)
+    rpc.sendRequest(sock, 'getStepCounter', timeout=10)
+    results = {}
+    for name, cmd, args in [('rpc_get_step_counter_s', 'getStepCounter', ()),
+                            ('rpc_move_to_s', 'move_to', (1, 10))]:
+        latencies = []
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            rpc.sendRequest(sock, cmd, args)
+            latencies.append(time.perf_counter() - t0)
+        latencies.sort()
+        results[name] = {'p50': latencies[len(latencies) // 2],
+                         'max': latencies[-1]}
+    rpc.sendRequest(sock, 'terminate')
+    process.join(5)
+    process.terminate()
+    return results
+
+
+def gitCommit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--naxes', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--motor', choices=['memory', 'vectorized'],
+                        default='memory',
+                        help='in-memory motor or VectorizedSimulatedMotor')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--rpc-iterations', type=int, default=200)
+    parser.add_argument('--no-rpc', action='store_true',
+                        help='skip the ZMQ round trip measurement')
+    parser.add_argument('--output', help='JSON file for the results')
+    args = parser.parse_args()
+
+    report = {'commit': gitCommit(),
+              'python': platform.python_version(),
+              'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'iterations': args.iterations,
+              'motor': args.motor,
+              'results': {}}
+    print('%6s %10s %12s %12s %8s %8s %10s %10s' % (
+        'naxes', 'steps/s', 'status[ms]', 'publish[ms]', 'full[B]',
+        'delta[B]', 'blocks/st', 'rpc[ms]'))
+    for naxes in args.naxes:
+        results = benchmarkInProcess(naxes, args.iterations, args.motor)
+        if not args.no_rpc:
+            results.update(benchmarkRpc(naxes, args.rpc_iterations,
+                                        args.motor))
+        report['results'][str(naxes)] = results
+        rpcMs = results['rpc_get_step_counter_s']['p50'] * 1e3 \
+            if not args.no_rpc else float('nan')
+        print('%6d %10.0f %12.3f %12.3f %8d %8d %10.1f %10.3f' % (
+            naxes, results['steps_per_s'],
+            results['get_motor_status_s'] * 1e3,
+            results['publish_status_s'] * 1e3,
+            results['payload_bytes_full'], results['payload_bytes_delta'],
+            results['allocations_per_step']['blocks'], rpcMs))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
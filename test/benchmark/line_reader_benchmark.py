@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+'''
+Benchmark of the Picomotor line framing against the fake newfocus8742.
+
+The fake server splits each reply in random fragments written with a
+small delay between them, so that the client sees replies split and
+coalesced as it happens on a loaded network. The same query sequence
+is read with one recv() per reply, as the old Picomotor._ask did, and
+with LineReader. Timings include the artificial fragment delay: use
+--fragment-delay 0 and a large --max-fragment to measure the framing
+overhead alone.
+
+Run with:
+    python -m test.benchmark.line_reader_benchmark
+'''
+import argparse
+import asyncio
+import collections
+import multiprocessing
+import random
+import socket
+import time
+from plico_motor_server.devices.fake_newfocus8742 import \
+    NewFocus8742ServerProtocol
+from plico_motor_server.utils.line_reader import LineReader
+
+
+class FragmentingTransport():
+
+    def __init__(self, transport, loop, maxFragment, fragmentDelaySec):
+        self._transport = transport
+        self._loop = loop
+        self._maxFragment = maxFragment
+        self._fragmentDelaySec = fragmentDelaySec
+        self._nextWrite = 0
+        self._fragments = collections.deque()
+
+    def get_extra_info(self, name, default=None):
+        return self._transport.get_extra_info(name, default)
+
+    def write(self, data):
+        now = self._loop.time()
+        when = max(now, self._nextWrite)
+        i = 0
+        while i < len(data):
+            size = random.randint(1, self._maxFragment)
+            self._fragments.append(data[i:i + size])
+            self._loop.call_at(when, self._writeFragment)
+            when += self._fragmentDelaySec
+            i += size
+        self._nextWrite = when
+
+    def _writeFragment(self):
+        # Timers with the same deadline may fire in any order:
+        # fragments are taken from a FIFO to preserve the stream order
+        data = self._fragments.popleft()
+        # The client may have reconnected in the meantime
+        if not self._transport.is_closing():
+            self._transport.write(data)
+
+
+class FragmentingProtocol(NewFocus8742ServerProtocol):
+
+    maxFragment = 3
+    fragmentDelaySec = 0.0002
+
+    def __init__(self):
+        super().__init__(verbose=False)
+
+    def connection_made(self, transport):
+        super().connection_made(FragmentingTransport(
+            transport, asyncio.get_running_loop(),
+            self.maxFragment, self.fragmentDelaySec))
+
+
+def _serve(conn, maxFragment, fragmentDelaySec):
+    FragmentingProtocol.maxFragment = maxFragment
+    FragmentingProtocol.fragmentDelaySec = fragmentDelaySec
+
+    async def serve():
+        loop = asyncio.get_running_loop()
+        server = await loop.create_server(FragmentingProtocol, 'localhost', 0)
+        conn.send(server.sockets[0].getsockname()[1])
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+def startServer(maxFragment, fragmentDelaySec):
+    '''
+    Start the fake server in a separate process, so that client and
+    server do not compete for the GIL, and return its port
+    '''
+    parentConn, childConn = multiprocessing.Pipe()
+    process = multiprocessing.Process(
+        target=_serve, args=(childConn, maxFragment, fragmentDelaySec),
+        daemon=True)
+    process.start()
+    return process, parentConn.recv()
+
+
+def connect(port, timeout):
+    sock = socket.create_connection(('localhost', port), timeout=timeout)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sock
+
+
+def benchmarkRecvPerReply(port, iterations, naxes, timeout):
+    '''
+    One recv(128) per reply: counts the replies that are not exactly
+    one complete line. The connection is reopened after each error,
+    as the Picomotor reconnection does.
+    '''
+    query = ';'.join('%dPA?' % axis for axis in range(1, naxes + 1))
+    sock = connect(port, timeout)
+    errors = 0
+    t0 = time.perf_counter()
+    for _ in range(iterations):
+        sock.sendall(query.encode() + b'\n')
+        try:
+            for _ in range(naxes):
+                ans = sock.recv(128)
+                if ans.count(b'\r\n') != 1 or not ans.endswith(b'\r\n'):
+                    raise ValueError(ans)
+        except (ValueError, socket.timeout):
+            errors += 1
+            sock.close()
+            sock = connect(port, timeout)
+    elapsed = time.perf_counter() - t0
+    sock.close()
+    return elapsed, errors
+
+
+def benchmarkLineReader(port, iterations, naxes, timeout):
+    query = ';'.join('%dPA?' % axis for axis in range(1, naxes + 1))
+    sock = connect(port, timeout)
+    reader = LineReader(sock.recv)
+    errors = 0
+    t0 = time.perf_counter()
+    for _ in range(iterations):
+        sock.sendall(query.encode() + b'\n')
+        for _ in range(naxes):
+            if not reader.readline().strip().lstrip(b'-').isdigit():
+                errors += 1
+    elapsed = time.perf_counter() - t0
+    sock.close()
+    return elapsed, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--naxes', type=int, default=4)
+    parser.add_argument('--max-fragment', type=int, default=3)
+    parser.add_argument('--fragment-delay', type=float, default=0.0002)
+    parser.add_argument('--timeout', type=float, default=0.05)
+    args = parser.parse_args()
+
+    process, port = startServer(args.max_fragment, args.fragment_delay)
+
+    for name, func in (('recv per reply', benchmarkRecvPerReply),
+                       ('LineReader', benchmarkLineReader)):
+        elapsed, errors = func(port, args.iterations, args.naxes,
+                               args.timeout)
+        print('%-15s %6d queries of %d axes in %7.3fs: '
+              '%8.1f us/query, %d framing errors' % (
+                  name, args.iterations, args.naxes, elapsed,
+                  elapsed / args.iterations * 1e6, errors))
+    process.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+'''
+Benchmark of the Picomotor motion-done detection.
+
+A fake newfocus8742 with a finite step rate runs in a separate process.
+Relative moves of increasing size are commanded through MotorController
+and their end is detected either with a fixed pessimistic sleep, sized
+for the largest move as our scripts used to do, or with the
+wait_motion_done RPC, resolved by the control loop from the status
+and polled with job_status.
+
+Run with:
+    python -m test.benchmark.motion_done_benchmark
+'''
+import argparse
+import asyncio
+import multiprocessing
+import socket
+import time
+from plico_motor_server.controller.controller import MotorController
+from plico_motor_server.devices import fake_newfocus8742
+from plico_motor_server.devices.picomotor import Picomotor
+
+
+class InProcessRpcHandler():
+    '''
+    No requests, since the benchmark calls the controller directly,
+    and the status is discarded
+    '''
+
+    def handleRequest(self, obj, socket, multi):
+        pass
+
+    def publishPickable(self, socket, anObject):
+        pass
+
+
+def freePort():
+    sock = socket.socket()
+    sock.bind(('localhost', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def startServer(stepRate):
+    port = freePort()
+    process = multiprocessing.Process(
+        target=asyncio.run,
+        args=(fake_newfocus8742.main('localhost', port, stepRate, False),),
+        daemon=True)
+    process.start()
+    deadline = time.time() + 5
+    while True:
+        try:
+            socket.create_connection(('localhost', port)).close()
+            return process, port
+        except ConnectionRefusedError:
+            if time.time() > deadline:
+                raise
+            time.sleep(0.01)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--step-rate', type=float, default=2000)
+    parser.add_argument('--moves', type=int, nargs='+',
+                        default=[10, 100, 500, 2000])
+    args = parser.parse_args()
+
+    process, port = startServer(args.step_rate)
+    motor = Picomotor('localhost', port=port, naxis=1, timeout=2)
+    ctrl = MotorController('bench', None, motor, None, None,
+                           InProcessRpcHandler())
+    fixedSleep = 1.5 * max(args.moves) / args.step_rate
+
+    print('%8s %10s %12s %14s' % (
+        'steps', 'motion[ms]', 'sleep[ms]', 'wait_done[ms]'))
+    for steps in args.moves:
+        t0 = time.perf_counter()
+        ctrl.move_by(1, steps)
+        time.sleep(fixedSleep)
+        tSleep = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        ctrl.move_by(1, -steps)
+        jobId = ctrl.wait_motion_done(1, timeout_in_sec=10)
+        while True:
+            ctrl.step()
+            state = ctrl.job_status(jobId)['state']
+            if state != 'running':
+                break
+            time.sleep(ctrl.loopPeriod())
+        tWait = time.perf_counter() - t0
+        assert state == 'done'
+        print('%8d %10.1f %12.1f %14.1f' % (
+            steps, steps / args.step_rate * 1e3, tSleep * 1e3, tWait * 1e3))
+    ctrl.terminate()
+    process.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+'''
+Benchmark of PIGCS_Motor against the fake GCS device.
+
+Every GCS call costs --call-delay, like a round trip on the serial
+line. Three costs are measured:
+
+- homing: duration of home() against the reference move time
+- status: per-axis position()/is_moving() reads against the bulk
+  positions()/are_moving() ones
+- moves: one move_to() per axis against a single move_to_many()
+
+Run with:
+    python -m test.benchmark.pi_gcs_benchmark
+'''
+import argparse
+import functools
+import time
+from plico_motor_server.devices.fake_gcs_device import FakeGCSDevice
+from plico_motor_server.devices.PI_motors import PI_E861
+
+
+def timed(func, iterations):
+    '''
+    Returns
+    -------
+    duration: float
+        mean duration of func() in seconds
+    '''
+    t0 = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - t0) / iterations
+
+
+def calls(motor, func, iterations):
+    motor.gcs.ncalls = 0
+    duration = timed(func, iterations)
+    return duration, motor.gcs.ncalls / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--naxes', type=int, default=4)
+    parser.add_argument('--call-delay', type=float, default=0.002,
+                        help='duration of a GCS call in seconds')
+    parser.add_argument('--reference-time', type=float, default=0.25,
+                        help='duration of the reference move in seconds')
+    parser.add_argument('--iterations', type=int, default=50)
+    args = parser.parse_args()
+
+    gcsDeviceClass = functools.partial(
+        FakeGCSDevice, naxes=args.naxes, velocity=10.0,
+        referenceTimeSec=args.reference_time, callDelaySec=args.call_delay)
+    motor = PI_E861('bench', None, None, usb_id_string='fake',
+                    naxis=args.naxes, gcsDeviceClass=gcsDeviceClass)
+    axes = list(range(1, args.naxes + 1))
+
+    t0 = time.perf_counter()
+    motor.home(1)
+    tHome = time.perf_counter() - t0
+    print('homing: %.1f ms for a %.1f ms reference move' % (
+        tHome * 1e3, args.reference_time * 1e3))
+
+    def perAxisStatus():
+        for axis in axes:
+            motor.position(axis)
+            motor.is_moving(axis)
+
+    def bulkStatus():
+        motor.positions(axes)
+        motor.are_moving(axes)
+
+    def perAxisMoves():
+        for axis in axes:
+            motor.move_to(axis, 1000)
+
+    def bulkMoves():
+        motor.move_to_many({axis: 1000 for axis in axes})
+
+    print('%-22s %10s %10s' % ('%d axes' % args.naxes, 'time[ms]', 'GCS calls'))
+    for name, func in [('per-axis status', perAxisStatus),
+                       ('bulk status', bulkStatus),
+                       ('per-axis move_to', perAxisMoves),
+                       ('move_to_many', bulkMoves)]:
+        duration, ncalls = calls(motor, func, args.iterations)
+        print('%-22s %10.2f %10.1f' % (name, duration * 1e3, ncalls))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+'''
+Multi-client RPC load test of a motor server.
+
+N client processes issue a weighted random mix of move_to, move_by,
+set_velocity and status reads for a fixed time. A status read waits
+for the next frame on a conflating subscriber, as MotorClient does.
+A separate non-conflating subscriber counts the published frames that
+are lost. The report gives throughput, latency percentiles and errors
+per operation, plus the dropped status frames.
+
+By default a server is started in a separate process, with the real
+control loop and either SimulatedMotor or a Picomotor on the fake
+newfocus8742. --connect targets a server that is already running.
+
+Run with:
+    python -m test.benchmark.rpc_load_benchmark --clients 8
+    python -m test.benchmark.rpc_load_benchmark --connect host:7100:7101
+'''
+import argparse
+import json
+import multiprocessing
+import random
+import socket
+import time
+import zmq
+from plico.rpc.zmq_remote_procedure_call import ZmqRemoteProcedureCall
+from plico.utils.logger import Logger
+
+OPERATIONS = ('move_to', 'move_by', 'set_velocity', 'status')
+
+
+def freePort():
+    sock = socket.socket()
+    sock.bind(('localhost', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def _serve(motorKind, stepRate, replyPort, statusPort, publishMode):
+    from plico_motor_server.controller.adaptive_control_loop import \
+        AdaptiveRateControlLoop
+    from plico_motor_server.controller.controller import MotorController
+    rpc = ZmqRemoteProcedureCall()
+    if motorKind == 'newfocus':
+        from plico_motor_server.devices.fake_newfocus8742 import \
+            FakeNewFocus8742Server
+        from plico_motor_server.devices.picomotor import Picomotor
+        server = FakeNewFocus8742Server(stepRate=stepRate)
+        motor = Picomotor('127.0.0.1', port=server.port, naxis=4, timeout=2)
+    else:
+        from plico_motor_server.devices.simulated_motor import SimulatedMotor
+        motor = SimulatedMotor()
+    ctrl = MotorController('load', None, motor,
+                           rpc.replySocket(replyPort),
+                           rpc.publisherSocket(statusPort, hwm=1),
+                           rpc, statusPublishMode=publishMode)
+    AdaptiveRateControlLoop(ctrl, Logger.of('load test loop'), time).start()
+
+
+def startServer(motorKind, stepRate, publishMode):
+    replyPort, statusPort = freePort(), freePort()
+    process = multiprocessing.Process(
+        target=_serve,
+        args=(motorKind, stepRate, replyPort, statusPort, publishMode),
+        daemon=True)
+    process.start()
+    return process, 'localhost', replyPort, statusPort
+
+
+def _axes(frame):
+    if isinstance(frame, dict):
+        frame = frame['status']
+    return len(frame)
+
+
+def _client(clientId, host, replyPort, statusPort, weights, naxes,
+            durationSec, ratePerSec, startAt, queue):
+    rng = random.Random(clientId)
+    rpc = ZmqRemoteProcedureCall()
+    request = rpc.requestSocket(host, replyPort)
+    status = rpc.subscriberSocket(host, statusPort, conflate=True)
+    latencies = {op: [] for op in OPERATIONS}
+    errors = {op: 0 for op in OPERATIONS}
+    ops = [op for op in OPERATIONS if weights[op] > 0]
+    opWeights = [weights[op] for op in ops]
+    while time.time() < startAt:
+        time.sleep(0.001)
+    end = startAt + durationSec
+    nextAt = startAt
+    while time.time() < end:
+        op = rng.choices(ops, opWeights)[0]
+        axis = rng.randint(1, naxes)
+        t0 = time.perf_counter()
+        try:
+            if op == 'status':
+                rpc.receivePickable(status, 5)
+            elif op == 'move_to':
+                rpc.sendRequest(request, 'move_to',
+                                [axis, rng.randint(-1000, 1000)], timeout=5)
+            elif op == 'move_by':
+                rpc.sendRequest(request, 'move_by',
+                                [axis, rng.randint(-100, 100)], timeout=5)
+            else:
+                rpc.sendRequest(request, 'set_velocity',
+                                [axis, rng.randint(100, 1000)], timeout=5)
+            latencies[op].append(time.perf_counter() - t0)
+        except Exception:
+            errors[op] += 1
+            if op != 'status':
+                # A REQ socket is unusable after a missing reply
+                request.close(linger=0)
+                request = rpc.requestSocket(host, replyPort)
+        if ratePerSec > 0:
+            nextAt += 1.0 / ratePerSec
+            time.sleep(max(0, nextAt - time.time()))
+    queue.put((latencies, errors))
+
+
+def _percentile(values, fraction):
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def monitorStatus(rpc, statusSocket, durationSec):
+    '''
+    Count the status frames received, and the ones lost, during
+    <durationSec>. Delta frames carry a sequence number; full frames
+    are compared with the number of controller steps, since the
+    controller publishes one at every step.
+    '''
+    received = 0
+    lost = 0
+    lastSeq = None
+    end = time.time() + durationSec
+    while time.time() < end:
+        if not statusSocket.poll(100):
+            continue
+        frame = rpc.receivePickable(statusSocket, 1)
+        received += 1
+        if isinstance(frame, dict):
+            if lastSeq is not None:
+                lost += frame['seq'] - lastSeq - 1
+            lastSeq = frame['seq']
+    return received, (lost if lastSeq is not None else None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10,
+                        help='test duration in seconds')
+    parser.add_argument('--rate', type=float, default=0,
+                        help='operations/s per client (default: max)')
+    parser.add_argument('--mix', default='move_to=1,move_by=1,'
+                        'set_velocity=1,status=4',
+                        help='weights of the operations')
+    parser.add_argument('--motor', choices=['simulated', 'newfocus'],
+                        default='simulated')
+    parser.add_argument('--step-rate', type=float, default=2000,
+                        help='fake newfocus8742 speed in steps/s')
+    parser.add_argument('--publish-mode', choices=['full', 'delta'],
+                        default='full')
+    parser.add_argument('--connect',
+                        help='host:replyPort:statusPort of a running server')
+    parser.add_argument('--output', help='JSON file for the results')
+    args = parser.parse_args()
+
+    weights = {op: 0.0 for op in OPERATIONS}
+    for item in args.mix.split(','):
+        op, weight = item.split('=')
+        if op not in weights:
+            parser.error('Unknown operation %s' % op)
+        weights[op] = float(weight)
+
+    process = None
+    if args.connect:
+        host, replyPort, statusPort = args.connect.split(':')
+        replyPort, statusPort = int(replyPort), int(statusPort)
+    else:
+        process, host, replyPort, statusPort = startServer(
+            args.motor, args.step_rate, args.publish_mode)
+
+    rpc = ZmqRemoteProcedureCall()
+    request = rpc.requestSocket(host, replyPort)
+    monitor = rpc.subscriberSocket(host, statusPort)
+    naxes = _axes(rpc.receivePickable(monitor, 10))
+    steps0 = rpc.sendRequest(request, 'getStepCounter')
+
+    queue = multiprocessing.Queue()
+    startAt = time.time() + 1
+    clients = [multiprocessing.Process(
+        target=_client,
+        args=(i, host, replyPort, statusPort, weights, naxes,
+              args.duration, args.rate, startAt, queue))
+        for i in range(args.clients)]
+    for client in clients:
+        client.start()
+    # Discard what was queued before the start
+    while monitor.poll(0):
+        monitor.recv(zmq.NOBLOCK)
+    time.sleep(max(0, startAt - time.time()))
+    received, lostDelta = monitorStatus(rpc, monitor, args.duration)
+    steps = rpc.sendRequest(request, 'getStepCounter') - steps0
+    results = [queue.get() for _ in clients]
+    for client in clients:
+        client.join()
+    if process is not None:
+        rpc.sendRequest(request, 'terminate')
+        process.join(5)
+        process.terminate()
+
+    report = {'clients': args.clients, 'duration': args.duration,
+              'motor': args.motor if not args.connect else args.connect,
+              'mix': weights, 'operations': {}}
+    total = 0
+    print('%-13s %8s %8s %9s %9s %9s %7s' % (
+        'operation', 'count', 'ops/s', 'p50[ms]', 'p99[ms]', 'max[ms]',
+        'errors'))
+    for op in OPERATIONS:
+        values = sorted(v for latencies, _ in results for v in latencies[op])
+        nerrors = sum(errors[op] for _, errors in results)
+        total += len(values)
+        if not values and not nerrors:
+            continue
+        nan = float('nan')
+        entry = {'count': len(values),
+                 'ops_per_s': len(values) / args.duration,
+                 'p50': _percentile(values, 0.5) if values else nan,
+                 'p99': _percentile(values, 0.99) if values else nan,
+                 'max': values[-1] if values else nan,
+                 'errors': nerrors}
+        report['operations'][op] = entry
+        print('%-13s %8d %8.1f %9.2f %9.2f %9.2f %7d' % (
+            op, entry['count'], entry['ops_per_s'], entry['p50'] * 1e3,
+            entry['p99'] * 1e3, entry['max'] * 1e3, nerrors))
+    dropped = lostDelta if lostDelta is not None else max(0, steps - received)
+    report.update({'throughput': total / args.duration,
+                   'status_frames_received': received,
+                   'status_frames_dropped': dropped,
+                   'controller_steps': steps})
+    print('throughput %.1f ops/s, status frames %d received, %d dropped, '
+          '%d controller steps' % (report['throughput'], received, dropped,
+                                   steps))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
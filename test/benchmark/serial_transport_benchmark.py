@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+'''
+Per-command latency of the serial filter drivers against a pty fake.
+
+The fake FW102B filter wheel answers on a pseudo terminal. The same
+sequence of pos? queries is read with the inWaiting() polling loop
+that the drivers used before SerialTransport, and with SerialTransport.
+
+Run with:
+    python -m test.benchmark.serial_transport_benchmark
+'''
+import argparse
+import sys
+import time
+import serial
+from plico_motor_server.devices.fake_fw102b import FakeFW102B
+from plico_motor_server.devices.serial_transport import SerialTransport
+
+
+def pollSerialQuery(ser, cmd):
+    '''
+    Query as done by the drivers before SerialTransport
+    '''
+    ser.write(cmd.encode('utf-8'))
+    nw = 0
+    nw0 = 0
+    it = 0
+    while True:
+        nw = ser.inWaiting()
+        it = it + 1
+        time.sleep(0.01)
+        if (nw > 0) and (nw0 == nw) or (it == 10000):
+            break
+        nw0 = nw
+    return ser.read(ser.inWaiting()).decode('utf-8')
+
+
+def measure(query, iterations):
+    latencies = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        reply = query('pos?\r')
+        latencies.append(time.perf_counter() - t0)
+        assert reply.split()[1] == '1', reply
+    latencies.sort()
+    return latencies[len(latencies) // 2], latencies[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--reply-delay', type=float, default=0.001,
+                        help='device processing time in seconds')
+    args = parser.parse_args()
+    if sys.platform == 'win32':
+        parser.error('the fake FW102B needs a pty, not available on Windows')
+
+    device = FakeFW102B(replyDelaySec=args.reply_delay)
+    device.start()
+    ser = serial.Serial(device.portName(), 115200)
+    transport = SerialTransport(ser, b'>', timeoutSec=1)
+
+    t0 = time.process_time()
+    median, worst = measure(lambda cmd: pollSerialQuery(ser, cmd),
+                            args.iterations)
+    cpu = time.process_time() - t0
+    print('inWaiting polling: median %6.2f ms, max %6.2f ms, cpu %5.2f s' % (
+        median * 1e3, worst * 1e3, cpu))
+
+    t0 = time.process_time()
+    median, worst = measure(transport.query, args.iterations)
+    cpu = time.process_time() - t0
+    print('SerialTransport:   median %6.2f ms, max %6.2f ms, cpu %5.2f s' % (
+        median * 1e3, worst * 1e3, cpu))
+    ser.close()
+    device.stop()
+
+
+if __name__ == "__main__":
+    main()
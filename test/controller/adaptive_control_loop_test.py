@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+import unittest
+from test.fake_time_mod import FakeTimeMod
+from plico_motor_server.controller.adaptive_control_loop import \
+    LoopRateScheduler, AdaptiveRateControlLoop
+
+
+class LoopRateSchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self._timeMod = FakeTimeMod(timeInvocationDurationSec=0)
+        self._scheduler = LoopRateScheduler(fastPeriodSec=0.02,
+                                            idlePeriodSec=0.2,
+                                            activityHoldSec=1.0,
+                                            decayFactor=2,
+                                            timeMod=self._timeMod)
+
+    def _decayToIdle(self):
+        for _ in range(10):
+            self._scheduler.update(False)
+
+    def test_decays_to_idle_rate(self):
+        self.assertAlmostEqual(0.04, self._scheduler.update(False))
+        self._decayToIdle()
+        self.assertAlmostEqual(0.2, self._scheduler.period())
+        self.assertAlmostEqual(5, self._scheduler.rate())
+
+    def test_moving_axis_selects_fast_rate(self):
+        self._decayToIdle()
+        self.assertAlmostEqual(0.02, self._scheduler.update(True))
+
+    def test_recent_command_holds_fast_rate(self):
+        self._decayToIdle()
+        self._scheduler.notifyCommand()
+        self._timeMod.sleep(0.9)
+        self.assertAlmostEqual(0.02, self._scheduler.update(False))
+        self._timeMod.sleep(0.2)
+        self.assertAlmostEqual(0.04, self._scheduler.update(False))
+
+
+class StepCountingSteppable():
+
+    def __init__(self, maxSteps):
+        self._maxSteps = maxSteps
+        self.steps = 0
+
+    def step(self):
+        self.steps += 1
+
+    def isTerminated(self):
+        return self.steps >= self._maxSteps
+
+    def loopPeriod(self):
+        return 0.1 * self.steps
+
+
+class AdaptiveRateControlLoopTest(unittest.TestCase):
+
+    def test_sleeps_the_period_chosen_by_the_steppable(self):
+        timeMod = FakeTimeMod()
+        AdaptiveRateControlLoop(StepCountingSteppable(3), None,
+                                timeMod).start()
+        self.assertAlmostEqual(0.3, timeMod.getLastSleepDurationSec())
+
+
+if __name__ == "__main__":
+    unittest.main()
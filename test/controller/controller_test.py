@@ -1,5 +1,8 @@
 #!/usr/bin/env python
+import threading
 import unittest
+from test.test_helper import Poller, ExecutionProbe
+from test.fake_time_mod import FakeTimeMod
 from plico_motor_server.controller.controller import MotorController
 from plico_motor_server.devices.simulated_motor import SimulatedMotor
 
@@ -91,10 +94,284 @@ class MotorControllerTest(unittest.TestCase):
         self._ctrl.move_by(1, -10)
         self.assertEqual(113, self._motor.position(1))
 
+    def test_wait_motion_done(self):
+        self._motor.is_moving = lambda axis: True
+        jobId = self._ctrl.wait_motion_done(1, timeout_in_sec=0.05)
+        self._ctrl.step()
+        self.assertEqual('running', self._ctrl.job_status(jobId)['state'])
+        Poller(3).check(ExecutionProbe(
+            lambda: self.assertEqual('failed', self._stepAndGetState(jobId))))
+        del self._motor.is_moving
+        jobId = self._ctrl.wait_motion_done(1, timeout_in_sec=0.05)
+        self.assertEqual('running', self._ctrl.job_status(jobId)['state'])
+        self._ctrl.step()
+        self.assertEqual('done', self._ctrl.job_status(jobId)['state'])
+
+    def _stepAndGetState(self, jobId):
+        self._ctrl.step()
+        return self._ctrl.job_status(jobId)['state']
+
+    def test_wait_does_not_change_the_axis_motion_job(self):
+        moveId = self._ctrl.move_to(1, 5)
+        self._ctrl.wait_motion_done(1)
+        self._ctrl.step()
+        status = self._rpcHandler.getLastPublished(self._statusSocket)
+        self.assertEqual(moveId, status[0].motion_job['job_id'])
+
+    def test_wait_on_invalid_axis(self):
+        self.assertRaises(ValueError, self._ctrl.wait_motion_done, 2)
+
+    def test_move_by_uses_the_native_relative_move(self):
+        moves = []
+        self._motor.move_by = lambda axis, delta: moves.append((axis, delta))
+        self._ctrl.move_by(1, 7)
+        self.assertEqual([(1, 7)], moves)
+
     def test_set_velocity(self):
         self._ctrl.set_velocity(1, 345.6)
         self.assertEqual(345.6, self._motor.velocity(1))
 
+    def test_commands_invalidate_cached_status(self):
+        self._ctrl.step()
+        self._ctrl.home(1)
+        self._ctrl.step()
+        status = self._rpcHandler.getLastPublished(self._statusSocket)
+        self.assertTrue(status[0].was_homed)
+
+    def test_status_cache_statistics(self):
+        self._ctrl.step()
+        self._ctrl.step()
+        stats = self._ctrl.getStatusCacheStatistics()
+        self.assertEqual(1, stats['type']['misses'])
+        self.assertEqual(1, stats['type']['hits'])
+        self.assertEqual(2, stats['position']['misses'])
+
+    def test_motion_commands_return_job_ids(self):
+        jobId = self._ctrl.move_to(1, 12)
+        job = self._ctrl.job_status(jobId)
+        self.assertEqual('done', job['state'])
+        self.assertEqual('move_to', job['command'])
+        self._ctrl.step()
+        status = self._rpcHandler.getLastPublished(self._statusSocket)
+        self.assertEqual(jobId, status[0].motion_job['job_id'])
+
+    def test_move_to_many(self):
+        jobId = self._ctrl.move_to_many({1: 77})
+        self.assertEqual(77, self._motor.position(1))
+        job = self._ctrl.job_status(jobId)
+        self.assertEqual('move_to_many', job['command'])
+        self.assertEqual([1], job['axis'])
+        self.assertEqual('done', job['state'])
+        self._ctrl.step()
+        status = self._rpcHandler.getLastPublished(self._statusSocket)
+        self.assertEqual(jobId, status[0].motion_job['job_id'])
+
+    def test_move_to_many_wait_settled(self):
+        jobId = self._ctrl.move_to_many({1: 78}, wait_settled=True)
+        self.assertEqual('move_to_many',
+                         self._ctrl.job_status(jobId)['command'])
+        self.assertEqual('running', self._ctrl.job_status(jobId)['state'])
+        self._ctrl.step()
+        self.assertEqual('done', self._ctrl.job_status(jobId)['state'])
+
+    def test_move_to_many_checks_the_axes_first(self):
+        self.assertRaises(ValueError, self._ctrl.move_to_many,
+                          {1: 79, 2: 80})
+        self.assertEqual(0, self._motor.position(1))
+
+    def test_waypoint_queue(self):
+        self._ctrl.queue_waypoints(1, [5, 6, 7], dwell_s=0)
+        self._ctrl.start_queue(1)
+        positions = []
+        for _ in range(5):
+            self._ctrl.step()
+            positions.append(self._motor.position(1))
+        self.assertEqual([5, 6, 7, 7, 7], positions)
+        self.assertEqual('done', self._ctrl.queue_status(1)['state'])
+        status = self._rpcHandler.getLastPublished(self._statusSocket)
+        self.assertEqual(3, status[0].waypoint_queue['reached'])
+
+    def test_waypoint_queue_uses_the_published_status(self):
+        queries = []
+        areMoving = self._motor.are_moving
+        self._motor.are_moving = lambda axes: queries.append(axes) or \
+            areMoving(axes)
+        self._ctrl.queue_waypoints(1, [5, 6, 7], dwell_s=0)
+        self._ctrl.start_queue(1)
+        for _ in range(4):
+            self._ctrl.step()
+        self.assertEqual('done', self._ctrl.queue_status(1)['state'])
+        # One motion query per step, to build the status
+        self.assertEqual(4, len(queries))
+
+    def test_abort_waypoint_queue(self):
+        self._ctrl.queue_waypoints(1, [5, 6, 7])
+        self._ctrl.start_queue()
+        self._ctrl.step()
+        self._ctrl.abort_queue()
+        self._ctrl.step()
+        self.assertEqual(5, self._motor.position(1))
+        self.assertEqual('aborted', self._ctrl.queue_status(1)['state'])
+
+    def test_loop_statistics(self):
+        self._ctrl.step()
+        self._ctrl.step()
+        stats = self._ctrl.getLoopStatistics()
+        for phase in ['step', 'rpc', 'status', 'publish',
+                      'device.positions_and_moving', 'device.type']:
+            self.assertIn(phase, stats)
+        self.assertEqual(2, stats['step']['count'])
+        self.assertEqual(1, stats['device.type']['count'])
+
+    def test_stop(self):
+        self._ctrl.stop(1)
+        self.assertFalse(self._motor.is_moving(1))
+
+    def test_command_selects_fast_loop_rate(self):
+        for _ in range(20):
+            self._ctrl.step()
+        self.assertAlmostEqual(0.1, self._ctrl.loopPeriod())
+        self._ctrl.move_to(1, 3)
+        self._ctrl.step()
+        self.assertAlmostEqual(0.02, self._ctrl.loopPeriod())
+
+    def test_delta_publish_mode(self):
+        ctrl = MotorController(
+            self._serverName, self._ports, self._motor,
+            self._replySocket, self._statusSocket, self._rpcHandler,
+            statusPublishMode='delta')
+        ctrl.step()
+        msg = self._rpcHandler.getLastPublished(self._statusSocket)
+        self.assertEqual('keyframe', msg['type'])
+        ctrl.move_to(1, 5)
+        ctrl.step()
+        msg = self._rpcHandler.getLastPublished(self._statusSocket)
+        self.assertEqual('delta', msg['type'])
+        self.assertEqual(5, msg['status'][1].position)
+
+    def test_position_history(self):
+        timeMod = FakeTimeMod(timeInvocationDurationSec=0)
+        ctrl = MotorController(
+            self._serverName, self._ports, self._motor,
+            self._replySocket, self._statusSocket, self._rpcHandler,
+            timeMod=timeMod, statusCacheTtlSec=0, positionHistorySamples=3)
+        for position in [1, 2, 3, 4]:
+            ctrl.move_to(1, position)
+            ctrl.step()
+            timeMod.sleep(1)
+        history = ctrl.get_position_history(1)
+        self.assertEqual([2, 3, 4], list(history['position']))
+        self.assertEqual([1, 2, 3], list(history['timestamp']))
+        self.assertFalse(any(history['is_moving']))
+        history = ctrl.get_position_history(1, since=1, max_samples=1)
+        self.assertEqual([3], list(history['position']))
+        self.assertRaises(ValueError, ctrl.get_position_history, 2)
+
+
+class MotorControllerWithStatusPollerTest(unittest.TestCase):
+
+    def setUp(self):
+        self._motor = SimulatedMotor()
+        self._rpcHandler = MyRpcHandler()
+        self._statusSocket = MyStatusSocket()
+        self._ctrl = MotorController(
+            'pippo',
+            'foo',
+            self._motor,
+            MyReplySocket(),
+            self._statusSocket,
+            self._rpcHandler,
+            statusPollingPeriodSec=0.01)
+
+    def tearDown(self):
+        self._ctrl.terminate()
+
+    def _publishedPosition(self):
+        self._ctrl.step()
+        return self._rpcHandler.getLastPublished(
+            self._statusSocket)[0].position
+
+    def test_publishes_snapshot_from_poller(self):
+        self._ctrl.move_to(1, 42)
+        Poller(3).check(ExecutionProbe(
+            lambda: self.assertEqual(42, self._publishedPosition())))
+
+    def test_terminate_stops_poller(self):
+        self._ctrl.terminate()
+        self.assertFalse(self._ctrl._statusPoller.is_alive())
+
+
+class SlowMotor(SimulatedMotor):
+
+    def __init__(self):
+        SimulatedMotor.__init__(self)
+        self.release = threading.Event()
+
+    def move_to(self, axis, position_in_steps):
+        self.release.wait(5)
+        SimulatedMotor.move_to(self, axis, position_in_steps)
+
+
+class MotorControllerNonBlockingMotionTest(unittest.TestCase):
+
+    def setUp(self):
+        self._motor = SlowMotor()
+        self._rpcHandler = MyRpcHandler()
+        self._statusSocket = MyStatusSocket()
+        self._ctrl = MotorController(
+            'pippo',
+            'foo',
+            self._motor,
+            MyReplySocket(),
+            self._statusSocket,
+            self._rpcHandler,
+            nonBlockingMotion=True)
+
+    def tearDown(self):
+        self._motor.release.set()
+        self._ctrl.terminate()
+
+    def test_status_is_published_during_motion(self):
+        jobId = self._ctrl.move_to(1, 42)
+        self._ctrl.step()
+        status = self._rpcHandler.getLastPublished(self._statusSocket)
+        self.assertEqual(0, status[0].position)
+        self.assertNotEqual('done', self._ctrl.job_status(jobId)['state'])
+        self._motor.release.set()
+        Poller(3).check(ExecutionProbe(
+            lambda: self.assertEqual(
+                'done', self._ctrl.job_status(jobId)['state'])))
+        self._ctrl.step()
+        status = self._rpcHandler.getLastPublished(self._statusSocket)
+        self.assertEqual(42, status[0].position)
+        self.assertEqual('done', status[0].motion_job['state'])
+
+    def test_wait_motion_done_waits_for_the_motion_job(self):
+        self._ctrl.move_to(1, 42)
+        jobId = self._ctrl.wait_motion_done(1, timeout_in_sec=3)
+        self._ctrl.step()
+        self.assertEqual('running', self._ctrl.job_status(jobId)['state'])
+        threading.Timer(0.1, self._motor.release.set).start()
+
+        def stepAndCheck():
+            self._ctrl.step()
+            self.assertEqual('done', self._ctrl.job_status(jobId)['state'])
+        Poller(3).check(ExecutionProbe(stepAndCheck))
+        self.assertEqual(42, self._motor.position(1))
+
+    def test_move_to_many_runs_after_the_queued_jobs(self):
+        self._ctrl.move_to(1, 42)
+        jobId = self._ctrl.move_to_many({1: 43}, wait_settled=True)
+        self._ctrl.step()
+        self.assertEqual('queued', self._ctrl.job_status(jobId)['state'])
+        self._motor.release.set()
+
+        def stepAndCheck():
+            self._ctrl.step()
+            self.assertEqual('done', self._ctrl.job_status(jobId)['state'])
+        Poller(3).check(ExecutionProbe(stepAndCheck))
+        self.assertEqual(43, self._motor.position(1))
+
 
 if __name__ == "__main__":
     # import sys;sys.argv = ['', 'Test.testName']
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+import unittest
+from test.fake_time_mod import FakeTimeMod
+from plico_motor_server.controller.delta_status import DeltaStatusEncoder, \
+    DeltaStatusDecoder, DeltaStatusGapException
+from plico_motor_server.devices.simulated_motor import SimulatedMotor
+
+
+class DeltaStatusTest(unittest.TestCase):
+
+    def setUp(self):
+        self._motor = SimulatedMotor()
+        self._timeMod = FakeTimeMod(timeInvocationDurationSec=0)
+        self._encoder = DeltaStatusEncoder(keyframePeriodSec=1.0,
+                                           timeMod=self._timeMod)
+        self._decoder = DeltaStatusDecoder()
+
+    def _encode(self):
+        return self._encoder.encode(self._motor.status_all_axes())
+
+    def test_first_message_is_a_keyframe(self):
+        msg = self._encode()
+        self.assertEqual(DeltaStatusEncoder.KEYFRAME, msg['type'])
+        self.assertEqual(1, msg['seq'])
+
+    def test_nothing_is_sent_when_nothing_changed(self):
+        self._encode()
+        self._timeMod.sleep(0.1)
+        self.assertIsNone(self._encode())
+
+    def test_changed_axes_are_sent_as_delta(self):
+        self._encode()
+        self._motor.move_to(1, 33)
+        msg = self._encode()
+        self.assertEqual(DeltaStatusEncoder.DELTA, msg['type'])
+        self.assertEqual(33, msg['status'][1].position)
+
+    def test_keyframe_is_periodic_and_on_request(self):
+        self._encode()
+        self._timeMod.sleep(1.0)
+        self.assertEqual(DeltaStatusEncoder.KEYFRAME, self._encode()['type'])
+        self._encoder.requestKeyframe()
+        self.assertEqual(DeltaStatusEncoder.KEYFRAME, self._encode()['type'])
+
+    def test_decoder_rebuilds_status_and_detects_gaps(self):
+        status = self._decoder.apply(self._encode())
+        self.assertEqual(0, status[0].position)
+        self._motor.move_to(1, 10)
+        status = self._decoder.apply(self._encode())
+        self.assertEqual(10, status[0].position)
+        self._motor.move_to(1, 20)
+        self._encode()
+        self._motor.move_to(1, 30)
+        self.assertRaises(DeltaStatusGapException,
+                          self._decoder.apply, self._encode())
+        self._motor.move_to(1, 40)
+        self.assertIsNone(self._decoder.apply(self._encode()))
+        self._encoder.requestKeyframe()
+        status = self._decoder.apply(self._encode())
+        self.assertEqual(40, status[0].position)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+import threading
+import unittest
+from test.test_helper import Poller, ExecutionProbe
+from plico_motor_server.controller.motion_jobs import MotionJobRunner, \
+    MotionJob
+
+
+class MotionJobRunnerTest(unittest.TestCase):
+
+    def test_blocking_job_runs_inline(self):
+        runner = MotionJobRunner()
+        calls = []
+        jobId = runner.submit(1, 'move_to', lambda: calls.append(1))
+        self.assertEqual([1], calls)
+        self.assertEqual(MotionJob.DONE, runner.jobStatus(jobId)['state'])
+
+    def test_blocking_job_failure_is_raised_and_recorded(self):
+        runner = MotionJobRunner()
+
+        def fail():
+            raise ValueError('boom')
+
+        self.assertRaises(ValueError, runner.submit, 1, 'home', fail)
+        job = runner.lastJob(1)
+        self.assertEqual(MotionJob.FAILED, job['state'])
+        self.assertEqual('boom', job['error'])
+
+    def test_non_blocking_job_returns_immediately(self):
+        runner = MotionJobRunner(nonBlocking=True)
+        release = threading.Event()
+        jobId = runner.submit(1, 'move_to', lambda: release.wait(5),
+                              target=10, startPosition=0)
+        self.assertFalse(runner.jobStatus(jobId)['state'] == MotionJob.DONE)
+        self.assertTrue(runner.hasActiveJobs())
+        self.assertEqual(0.5, runner.jobStatus(jobId, 5)['progress'])
+        release.set()
+        Poller(3).check(ExecutionProbe(
+            lambda: self.assertEqual(MotionJob.DONE,
+                                     runner.jobStatus(jobId)['state'])))
+        self.assertEqual(1.0, runner.jobStatus(jobId)['progress'])
+        self.assertFalse(runner.hasActiveJobs())
+        runner.shutdown()
+
+    def test_job_on_several_axes_is_ordered_on_each_axis(self):
+        runner = MotionJobRunner(nonBlocking=True)
+        release = threading.Event()
+        calls = []
+        runner.submit(2, 'move_to', lambda: release.wait(5) and
+                      calls.append('axis 2'))
+        jobId = runner.submitMany([1, 2], 'move_to_many',
+                                  lambda: calls.append('both'),
+                                  targets={1: 10, 2: 20},
+                                  startPositions={1: 0, 2: 0})
+        runner.submit(1, 'move_to', lambda: calls.append('axis 1'))
+        self.assertEqual(MotionJob.QUEUED, runner.jobStatus(jobId)['state'])
+        self.assertEqual(jobId, runner.lastJob(2)['job_id'])
+        release.set()
+        Poller(3).check(ExecutionProbe(
+            lambda: self.assertEqual(['axis 2', 'both', 'axis 1'], calls)))
+        self.assertEqual(MotionJob.DONE, runner.jobStatus(jobId)['state'])
+        runner.shutdown()
+
+    def test_progress_of_a_job_on_several_axes(self):
+        runner = MotionJobRunner(nonBlocking=True)
+        release = threading.Event()
+        jobId = runner.submitMany([1, 2], 'move_to_many',
+                                  lambda: release.wait(5),
+                                  targets={1: 10, 2: 20},
+                                  startPositions={1: 0, 2: 0})
+        Poller(3).check(ExecutionProbe(
+            lambda: self.assertEqual(MotionJob.RUNNING,
+                                     runner.jobStatus(jobId)['state'])))
+        self.assertEqual(0.25, runner.jobStatus(jobId, {1: 5, 2: 5})
+                         ['progress'])
+        self.assertEqual(0.5, runner.lastJob(1, 5)['progress'])
+        release.set()
+        runner.shutdown()
+
+    def test_settling_job_is_completed_by_the_caller(self):
+        runner = MotionJobRunner()
+        jobId = runner.submitMany([1], 'move_to_many', lambda: None,
+                                  settle=True)
+        self.assertEqual(MotionJob.RUNNING, runner.jobStatus(jobId)['state'])
+        self.assertFalse(runner.hasActiveJobs([1]))
+        self.assertIsNotNone(runner.lastEndTime([1]))
+        runner.finishWait(jobId)
+        self.assertEqual(MotionJob.DONE, runner.jobStatus(jobId)['state'])
+
+    def test_unknown_job(self):
+        self.assertRaises(KeyError, MotionJobRunner().jobStatus, 42)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+import unittest
+from test.fake_time_mod import FakeTimeMod
+from plico_motor_server.controller.status_cache import MotorStatusCache
+from plico_motor_server.devices.simulated_motor import SimulatedMotor
+
+
+class CountingMotor(SimulatedMotor):
+
+    def __init__(self):
+        SimulatedMotor.__init__(self)
+        self.calls = {}
+
+    def _count(self, field):
+        self.calls[field] = self.calls.get(field, 0) + 1
+
+    def type(self, axis):
+        self._count('type')
+        return SimulatedMotor.type(self, axis)
+
+    def was_homed(self, axis):
+        self._count('was_homed')
+        return SimulatedMotor.was_homed(self, axis)
+
+    def position(self, axis):
+        self._count('position')
+        return SimulatedMotor.position(self, axis)
+
+
+class MotorStatusCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self._motor = CountingMotor()
+        self._timeMod = FakeTimeMod(timeInvocationDurationSec=0)
+        self._cache = MotorStatusCache(self._motor, ttlSec=1.0,
+                                       timeMod=self._timeMod)
+
+    def test_static_fields_are_read_once(self):
+        for _ in range(5):
+            self._cache.motorStatus(1)
+            self._timeMod.sleep(10)
+        self.assertEqual(1, self._motor.calls['type'])
+        stats = self._cache.statistics()
+        self.assertEqual(4, stats['type']['hits'])
+        self.assertEqual(1, stats['type']['misses'])
+
+    def test_live_fields_are_always_read(self):
+        for _ in range(3):
+            self._cache.motorStatus(1)
+        self.assertEqual(3, self._motor.calls['position'])
+        self.assertEqual(0, self._cache.statistics()['position']['hits'])
+
+    def test_slow_fields_expire_after_ttl(self):
+        self._cache.get('was_homed', 1)
+        self._timeMod.sleep(0.5)
+        self._cache.get('was_homed', 1)
+        self.assertEqual(1, self._motor.calls['was_homed'])
+        self._timeMod.sleep(0.6)
+        self._cache.get('was_homed', 1)
+        self.assertEqual(2, self._motor.calls['was_homed'])
+
+    def test_invalidate_forces_a_new_read(self):
+        self.assertFalse(self._cache.get('was_homed', 1))
+        self._motor.home(1)
+        self._cache.invalidate(1)
+        self.assertTrue(self._cache.get('was_homed', 1))
+        self.assertEqual(2, self._motor.calls['was_homed'])
+
+
+if __name__ == "__main__":
+    unittest.main()
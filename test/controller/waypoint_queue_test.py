@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+import unittest
+from plico_motor_server.controller.waypoint_queue import WaypointQueue, \
+    WaypointQueueException
+
+
+class WaypointQueueTest(unittest.TestCase):
+
+    def test_visits_waypoints_with_dwell(self):
+        queue = WaypointQueue(1, [10, 20], dwellSec=1.0)
+        self.assertIsNone(queue.nextPosition(0))
+        queue.start(0)
+        self.assertEqual(10, queue.nextPosition(0))
+        queue.motionStarted(1)
+        self.assertIsNone(queue.nextPosition(0))
+        queue.motionDone(5)
+        self.assertIsNone(queue.nextPosition(5.5))
+        self.assertEqual(20, queue.nextPosition(6))
+        queue.motionStarted(2)
+        queue.motionDone(7)
+        self.assertEqual(WaypointQueue.DONE, queue.state())
+        self.assertEqual(2, queue.progress()['reached'])
+
+    def test_abort(self):
+        queue = WaypointQueue(1, [10, 20])
+        queue.start(0)
+        queue.abort()
+        self.assertFalse(queue.isActive())
+        self.assertIsNone(queue.nextPosition(1))
+
+    def test_invalid_queues(self):
+        self.assertRaises(WaypointQueueException, WaypointQueue, 1, [])
+        queue = WaypointQueue(1, [1])
+        queue.start(0)
+        self.assertRaises(WaypointQueueException, queue.start, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
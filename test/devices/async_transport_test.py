@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+import asyncio
+import os
+import sys
+import threading
+import unittest
+import serial
+from plico_motor_server.devices.async_transport import DeviceIoLoop, \
+    AsyncTcpTransport, AsyncSerialTransport, AsyncTransportException
+from plico_motor_server.devices.fake_newfocus8742 import \
+    FakeNewFocus8742Server
+from plico_motor_server.devices.multi_motor import MultiMotor
+from plico_motor_server.devices.picomotor import Picomotor
+
+
+class AsyncTcpTransportTest(unittest.TestCase):
+
+    def setUp(self):
+        self._ioLoop = DeviceIoLoop()
+        self._server = FakeNewFocus8742Server()
+        self._transport = AsyncTcpTransport(
+            self._ioLoop, '127.0.0.1', self._server.port, timeoutSec=0.5)
+
+    def tearDown(self):
+        self._transport.close()
+        self._server.close()
+        self._ioLoop.stop()
+
+    def test_ask(self):
+        self._transport.sendSync(b'1PR10\n')
+        self.assertEqual([b'10'], self._transport.askSync(b'1PA?\n'))
+
+    def test_several_replies(self):
+        self.assertEqual([b'0', b'1'],
+                         self._transport.askSync(b'1PA?;1MD?\n', 2))
+
+    def test_pipelined_requests_get_their_own_replies(self):
+        self._transport.sendSync(b'1PR1;2PR2;3PR3;4PR4\n')
+
+        async def askAll():
+            return await asyncio.gather(*[
+                self._transport.ask(b'%dPA?\n' % axis)
+                for axis in range(1, 5)])
+
+        replies = self._ioLoop.call(askAll())
+        self.assertEqual([[b'1'], [b'2'], [b'3'], [b'4']], replies)
+
+    def test_timeout_drops_the_connection(self):
+        # Two replies expected, only one will come
+        self.assertRaises(AsyncTransportException,
+                          self._transport.askSync, b'1PA?\n', 2)
+        self.assertEqual([b'0'], self._transport.askSync(b'1PA?\n'))
+
+    def test_connection_refused(self):
+        self._server.close()
+        transport = AsyncTcpTransport(
+            self._ioLoop, '127.0.0.1', self._server.port, timeoutSec=0.5)
+        self.assertRaises(AsyncTransportException,
+                          transport.askSync, b'1PA?\n')
+
+    def test_blocking_call_from_the_loop_thread_raises(self):
+
+        async def blockingCall():
+            return self._transport.askSync(b'1PA?\n')
+
+        self.assertRaises(RuntimeError, self._ioLoop.call, blockingCall())
+
+
+class PicomotorOnIoLoopTest(unittest.TestCase):
+
+    def setUp(self):
+        self._ioLoop = DeviceIoLoop()
+        self._servers = [FakeNewFocus8742Server() for _ in range(2)]
+        self._motors = [Picomotor('127.0.0.1', port=server.port, naxis=2,
+                                  timeout=0.5, ioLoop=self._ioLoop)
+                        for server in self._servers]
+
+    def tearDown(self):
+        for motor in self._motors:
+            motor.disconnect()
+        for server in self._servers:
+            server.close()
+        self._ioLoop.stop()
+
+    def test_is_thread_safe(self):
+        self.assertTrue(self._motors[0].THREAD_SAFE)
+
+    def test_move_and_read(self):
+        motor = self._motors[0]
+        motor.move_to(1, 10)
+        motor.move_by(2, -4)
+        self.assertEqual([10, -4], motor.positions([1, 2]))
+        self.assertEqual(([10, -4], [False, False]),
+                         motor.positions_and_moving([1, 2]))
+
+    def test_async_positions_and_moving(self):
+        motor = self._motors[0]
+        motor.move_to_many({1: 3, 2: 7})
+        self.assertEqual(
+            ([3, 7], [False, False]),
+            self._ioLoop.call(motor.async_positions_and_moving([1, 2])))
+
+    def test_multi_motor_gathers_the_devices(self):
+        multi = MultiMotor(self._motors, ioLoop=self._ioLoop)
+        multi.move_to_many({1: 1, 2: 2, 3: 3, 4: 4})
+        self.assertEqual(([4, 1, 3], [False, False, False]),
+                         multi.positions_and_moving([4, 1, 3]))
+
+
+@unittest.skipIf(sys.platform == "win32", "pty is not available on Windows")
+class AsyncSerialTransportTest(unittest.TestCase):
+
+    def setUp(self):
+        self._master, slave = os.openpty()
+        self._ser = serial.Serial(os.ttyname(slave))
+        os.close(slave)
+        self._ioLoop = DeviceIoLoop()
+        self._transport = AsyncSerialTransport(
+            self._ioLoop, self._ser, b'>', timeoutSec=0.2)
+
+    def tearDown(self):
+        self._transport.close()
+        self._ioLoop.stop()
+        self._ser.close()
+        os.close(self._master)
+
+    def _replyInChunks(self, chunks):
+        def reply():
+            os.read(self._master, 100)
+            for chunk in chunks:
+                os.write(self._master, chunk)
+        thread = threading.Thread(target=reply)
+        thread.start()
+        return thread
+
+    def test_reply_is_read_up_to_the_terminator(self):
+        thread = self._replyInChunks([b'pos?\r', b'3\r', b'>'])
+        self.assertEqual('pos?\r3\r>', self._transport.query('pos?\r'))
+        thread.join()
+
+    def test_missing_terminator_raises(self):
+        thread = self._replyInChunks([b'pos?\r3\r'])
+        self.assertRaises(AsyncTransportException,
+                          self._transport.query, 'pos?\r')
+        thread.join()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+import sys
+import unittest
+import serial
+from plico.utils.reconnect import ConnectionException
+from test.fake_time_mod import FakeTimeMod
+from plico_motor_server.devices.serial_transport import SerialTransport
+from plico_motor_server.devices.async_transport import DeviceIoLoop
+from plico_motor_server.devices.FW102B_thorlabs import FilterWheel
+
+
+class FakeSerialOrUSB():
+
+    def __init__(self, portName):
+        self._portName = portName
+
+    def port_name(self):
+        return self._portName
+
+
+@unittest.skipIf(sys.platform == "win32", "pty is not available on Windows")
+class FakeFW102BTest(unittest.TestCase):
+
+    def setUp(self):
+        # Imported here: pty fakes need termios, missing on Windows
+        from plico_motor_server.devices.fake_fw102b import FakeFW102B
+        self._timeMod = FakeTimeMod(timeInvocationDurationSec=0)
+        self._device = FakeFW102B(slotTimeSec=0.5, timeMod=self._timeMod)
+        self._device.start()
+        self._ser = serial.Serial(self._device.portName(), 115200)
+        self._transport = SerialTransport(self._ser, b'>', timeoutSec=1)
+
+    def tearDown(self):
+        self._ser.close()
+        self._device.stop()
+
+    def test_query_is_echoed(self):
+        self.assertEqual('pos?\r1\r>', self._transport.query('pos?\r'))
+
+    def test_rotation_takes_the_shortest_way(self):
+        self.assertEqual('pos=6\r>', self._transport.query('pos=6\r'))
+        self.assertAlmostEqual(0.5, self._timeMod.getLastSleepDurationSec())
+        self._transport.query('pos=3\r')
+        self.assertAlmostEqual(1.5, self._timeMod.getLastSleepDurationSec())
+        self.assertEqual('pos?\r3\r>', self._transport.query('pos?\r'))
+
+    def test_errors(self):
+        self.assertEqual('pos=7\rCommand error CMD_ARG_INVALID\r>',
+                         self._transport.query('pos=7\r'))
+        self.assertEqual('foo\rCommand error CMD_NOT_DEFINED\r>',
+                         self._transport.query('foo\r'))
+
+    def test_with_the_driver(self):
+        self._ser.close()
+        wheel = FilterWheel('FilterWheel',
+                            FakeSerialOrUSB(self._device.portName()),
+                            115200, timeout=1)
+        wheel.move_to(1, 4)
+        self.assertEqual(4, wheel.position(1))
+        self.assertEqual(self._device.IDN, wheel.get_id())
+        wheel.disconnect()
+
+    def test_async_transport_timeout_reconnects(self):
+        self._ser.close()
+        ioLoop = DeviceIoLoop()
+        wheel = FilterWheel('FilterWheel',
+                            FakeSerialOrUSB(self._device.portName()),
+                            115200, timeout=0.2, ioLoop=ioLoop)
+        try:
+            self.assertEqual(1, wheel.position(1))
+            firstSerial = wheel.ser
+            self._device.reply = lambda cmd: b''
+            self.assertRaises(ConnectionException, wheel.position, 1)
+            self.assertIsNone(wheel.ser)
+            del self._device.reply
+            self.assertEqual(1, wheel.position(1))
+            self.assertIsNot(firstSerial, wheel.ser)
+        finally:
+            wheel.disconnect()
+            ioLoop.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
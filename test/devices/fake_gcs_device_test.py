@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+import unittest
+from test.fake_time_mod import FakeTimeMod
+from plico_motor_server.devices.fake_gcs_device import FakeGCSDevice, \
+    FakeGCSError
+
+
+class FakeGCSDeviceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.timeMod = FakeTimeMod(timeInvocationDurationSec=0)
+        self.gcs = FakeGCSDevice(naxes=2, velocity=2.0, referenceTimeSec=1.0,
+                                 timeMod=self.timeMod)
+
+    def test_keys_follow_the_arguments(self):
+        self.assertEqual({1: 0.0}, dict(self.gcs.qPOS(1)))
+        self.assertEqual({'1': 0.0, '2': 0.0}, dict(self.gcs.qPOS()))
+        self.assertEqual(['2', '1'], list(self.gcs.qPOS(['2', '1']).keys()))
+
+    def test_motion(self):
+        self.gcs.MOV(1, 2.0)
+        self.assertTrue(self.gcs.IsMoving(1)[1])
+        self.assertFalse(self.gcs.qONT(1)[1])
+        self.timeMod.sleep(0.5)
+        self.assertAlmostEqual(1.0, self.gcs.qPOS(1)[1])
+        self.timeMod.sleep(0.5)
+        self.assertAlmostEqual(2.0, self.gcs.qPOS(1)[1])
+        self.assertTrue(self.gcs.qONT(1)[1])
+
+    def test_multi_axis_and_relative_moves(self):
+        self.gcs.MOV([1, 2], [1.0, -1.0])
+        self.gcs.MVR(2, -1.0)
+        self.timeMod.sleep(10)
+        self.assertEqual({'1': 1.0, '2': -2.0}, dict(self.gcs.qPOS()))
+        self.assertEqual(3, self.gcs.ncalls)
+
+    def test_reference_move(self):
+        self.gcs.MOV(2, 4.0)
+        self.timeMod.sleep(2)
+        self.gcs.FRF(2)
+        self.timeMod.sleep(0.5)
+        self.assertFalse(self.gcs.qFRF(2)[2])
+        self.assertAlmostEqual(2.0, self.gcs.qPOS(2)[2])
+        self.timeMod.sleep(0.5)
+        self.assertEqual({'1': False, '2': True}, dict(self.gcs.qFRF()))
+        self.assertEqual(0.0, self.gcs.qPOS(2)[2])
+
+    def test_servo(self):
+        self.gcs.SVO(1, 1)
+        self.assertEqual({'1': True, '2': False}, dict(self.gcs.qSVO()))
+
+    def test_unknown_axis(self):
+        self.assertRaises(FakeGCSError, self.gcs.MOV, 3, 1.0)
+
+    def test_call_delay(self):
+        gcs = FakeGCSDevice(callDelaySec=0.01, timeMod=self.timeMod)
+        gcs.qPOS()
+        self.assertEqual(0.01, self.timeMod.getLastSleepDurationSec())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+import sys
+import unittest
+import serial
+from test.fake_time_mod import FakeTimeMod
+from test.devices.fake_fw102b_test import FakeSerialOrUSB
+from plico_motor_server.devices.serial_transport import SerialTransport
+from plico_motor_server.devices.KURIOSVB1_thorlabs import TunableFilter
+
+
+@unittest.skipIf(sys.platform == "win32", "pty is not available on Windows")
+class FakeKuriosVB1Test(unittest.TestCase):
+
+    def setUp(self):
+        # Imported here: pty fakes need termios, missing on Windows
+        from plico_motor_server.devices.fake_kuriosvb1 import FakeKuriosVB1
+        self._timeMod = FakeTimeMod(timeInvocationDurationSec=0)
+        self._device = FakeKuriosVB1(tuneTimeSec=0.05, warmUpSec=10,
+                                     timeMod=self._timeMod)
+        self._device.start()
+        self._ser = serial.Serial(self._device.portName(), 115200)
+        self._transport = SerialTransport(self._ser, b'>', timeoutSec=1)
+
+    def tearDown(self):
+        self._ser.close()
+        self._device.stop()
+
+    def test_tuning(self):
+        self.assertEqual('>', self._transport.query('WL=600.000\r'))
+        self.assertAlmostEqual(0.05, self._timeMod.getLastSleepDurationSec())
+        self.assertEqual('WL=600.000\r>', self._transport.query('WL?\r'))
+
+    def test_out_of_range(self):
+        self.assertEqual('CMD_ARG_INVALID\r>',
+                         self._transport.query('WL=800\r'))
+
+    def test_warm_up(self):
+        self.assertEqual('1\r>', self._transport.query('ST?\r'))
+        self._timeMod.sleep(10)
+        self.assertEqual('2\r>', self._transport.query('ST?\r'))
+
+    def test_with_the_driver(self):
+        self._ser.close()
+        tunable = TunableFilter('TunableFilter',
+                                FakeSerialOrUSB(self._device.portName()),
+                                115200, timeout=1, shadowRevalidationSec=60)
+        tunable.move_to(1, 500)
+        self.assertEqual(500.0, self._device.wavelength)
+        # Served from the shadow position, without querying WL?
+        self._device.wavelength = 510.0
+        self.assertEqual(500.0, tunable.position(1))
+        tunable.disconnect()
+
+
+if __name__ == "__main__":
+    unittest.main()
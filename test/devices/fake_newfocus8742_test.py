@@ -0,0 +1,211 @@
+import socket
+import time
+import unittest
+from test.fake_time_mod import FakeTimeMod
+from test.test_helper import Poller, ExecutionProbe
+from plico_motor_server.utils.simulated_clock import SimulatedClock
+from plico_motor_server.devices.fake_newfocus8742 import \
+    NewFocus8742ServerProtocol, NewFocus8742Model, FakeNewFocus8742Server
+
+
+class RecordingTransport():
+
+    def __init__(self):
+        self.written = b''
+
+    def get_extra_info(self, name):
+        return ('localhost', 12345)
+
+    def write(self, data):
+        self.written += data
+
+
+class NewFocus8742ServerProtocolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.transport = RecordingTransport()
+        self.protocol = NewFocus8742ServerProtocol()
+        self.protocol.connection_made(self.transport)
+
+    def test_single_command(self):
+        self.protocol.data_received(b'1PR10\n')
+        self.protocol.data_received(b'1PA?\n')
+        self.assertEqual(b'10\r\n', self.transport.written)
+
+    def test_several_commands_on_one_line(self):
+        self.protocol.data_received(b'1PR10;2PR-3;1PA?;2PA?;3PA?\n')
+        self.assertEqual(b'10\r\n-3\r\n0\r\n', self.transport.written)
+
+    def test_commands_split_across_segments(self):
+        self.protocol.data_received(b'1PR')
+        self.protocol.data_received(b'4;1P')
+        self.assertEqual(b'', self.transport.written)
+        self.protocol.data_received(b'A?\n2PA?\n')
+        self.assertEqual(b'4\r\n0\r\n', self.transport.written)
+
+    def test_moves_are_instantaneous_by_default(self):
+        self.protocol.data_received(b'1PR10;1MD?;1PA?\n')
+        self.assertEqual(b'1\r\n10\r\n', self.transport.written)
+
+
+class NewFocus8742TimingModelTest(unittest.TestCase):
+
+    def setUp(self):
+        self.timeMod = FakeTimeMod(timeInvocationDurationSec=0)
+        self.transport = RecordingTransport()
+        self.protocol = NewFocus8742ServerProtocol(
+            verbose=False, stepRate=100, timeMod=self.timeMod)
+        self.protocol.connection_made(self.transport)
+
+    def _ask(self, cmd):
+        self.transport.written = b''
+        self.protocol.data_received(cmd + b'\n')
+        return self.transport.written
+
+    def test_motion_takes_time(self):
+        self._ask(b'1PR100')
+        self.assertEqual(b'0\r\n0\r\n', self._ask(b'1MD?;1TP?'))
+        self.timeMod.sleep(0.5)
+        self.assertEqual(b'0\r\n50\r\n', self._ask(b'1MD?;1TP?'))
+        self.timeMod.sleep(0.6)
+        self.assertEqual(b'1\r\n100\r\n', self._ask(b'1MD?;1TP?'))
+
+    def test_pa_query_is_the_target(self):
+        self._ask(b'1PR100')
+        self.timeMod.sleep(0.5)
+        self.assertEqual(b'100\r\n50\r\n', self._ask(b'1PA?;1TP?'))
+
+    def test_relative_move_during_motion_extends_the_target(self):
+        self._ask(b'2PR100')
+        self.timeMod.sleep(0.5)
+        self._ask(b'2PR-20')
+        self.timeMod.sleep(1)
+        self.assertEqual(b'1\r\n80\r\n', self._ask(b'2MD?;2PA?'))
+
+
+    def test_stop(self):
+        self._ask(b'1PR100')
+        self.timeMod.sleep(0.3)
+        self._ask(b'1ST')
+        self.timeMod.sleep(1)
+        self.assertEqual(b'1\r\n30\r\n', self._ask(b'1MD?;1PA?'))
+
+    def test_absolute_move(self):
+        self._ask(b'1PR10')
+        self.timeMod.sleep(1)
+        self._ask(b'1PA-40')
+        self.timeMod.sleep(0.25)
+        self.assertEqual(b'-15\r\n', self._ask(b'1TP?'))
+
+    def test_velocity(self):
+        self._ask(b'3VA200')
+        self.assertEqual(b'200\r\n', self._ask(b'3VA?'))
+        self._ask(b'3PR100')
+        self.timeMod.sleep(0.5)
+        self.assertEqual(b'1\r\n', self._ask(b'3MD?'))
+
+    def test_non_positive_velocity_is_rejected(self):
+        self.assertEqual(b'3VA0\r\n', self._ask(b'3VA0'))
+        self.assertEqual(b'3AC-5\r\n', self._ask(b'3AC-5'))
+        self.assertEqual(b'100\r\n', self._ask(b'3VA?'))
+        self._ask(b'3PR100')
+        self.timeMod.sleep(1)
+        self.assertEqual(b'1\r\n', self._ask(b'3MD?'))
+
+
+class NewFocus8742AccelerationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.timeMod = FakeTimeMod(timeInvocationDurationSec=0)
+        # 1 s to reach 100 steps/s, covering 50 steps
+        self.model = NewFocus8742Model(stepRate=100, acceleration=100,
+                                       timeMod=self.timeMod)
+
+    def test_trapezoidal_profile(self):
+        self.model.move_relative(1, 200)
+        self.timeMod.sleep(0.5)
+        self.assertEqual(12, self.model.position(1))
+        self.timeMod.sleep(1.0)
+        self.assertEqual(100, self.model.position(1))
+        self.timeMod.sleep(1.0)
+        self.assertEqual(187, self.model.position(1))
+        self.assertTrue(self.model.is_moving(1))
+        self.timeMod.sleep(0.5)
+        self.assertEqual(200, self.model.position(1))
+        self.assertFalse(self.model.is_moving(1))
+
+    def test_short_moves_never_reach_full_speed(self):
+        self.model.move_relative(1, 25)
+        self.assertEqual('100', self.model.handle('1AC?'))
+        self.timeMod.sleep(0.99)
+        self.assertTrue(self.model.is_moving(1))
+        self.timeMod.sleep(0.01)
+        self.assertFalse(self.model.is_moving(1))
+
+
+class NewFocus8742SharedModelTest(unittest.TestCase):
+
+    def test_clients_share_the_controller_state(self):
+        model = NewFocus8742Model()
+        transports = [RecordingTransport(), RecordingTransport()]
+        protocols = [NewFocus8742ServerProtocol(verbose=False, model=model)
+                     for _ in transports]
+        for protocol, transport in zip(protocols, transports):
+            protocol.connection_made(transport)
+        protocols[0].data_received(b'2PR7\n')
+        protocols[1].data_received(b'2PA?;*IDN?\n')
+        self.assertTrue(transports[1].written.startswith(b'7\r\nNew_Focus'))
+
+    def test_dropped_replies(self):
+        model = NewFocus8742Model(dropRate=1.0)
+        transport = RecordingTransport()
+        protocol = NewFocus8742ServerProtocol(verbose=False, model=model)
+        protocol.connection_made(transport)
+        protocol.data_received(b'1PR5;1PA?\n')
+        self.assertEqual(b'', transport.written)
+        self.assertEqual(5, model.position(1))
+
+
+class FakeNewFocus8742ServerTest(unittest.TestCase):
+
+    def test_replies_are_delayed_and_ordered(self):
+        with FakeNewFocus8742Server(latencySec=0.05, jitterSec=0.05,
+                                    seed=1) as server:
+            sock = socket.create_connection((server.host, server.port))
+            t0 = time.time()
+            sock.sendall(b'1PR3;1PA?;2PA?;1MD?\n')
+            data = b''
+            while data.count(b'\r\n') < 3:
+                data += sock.recv(100)
+            self.assertGreaterEqual(time.time() - t0, 0.05)
+            self.assertEqual(b'3\r\n0\r\n1\r\n', data)
+            sock.close()
+
+    def test_latency_is_spent_on_the_simulated_clock(self):
+        clock = SimulatedClock()
+        with FakeNewFocus8742Server(latencySec=60, stepRate=1,
+                                    timeMod=clock) as server:
+            sock = socket.create_connection((server.host, server.port))
+            sock.settimeout(5)
+            sock.sendall(b'1PR100;1MD?\n')
+            # Nothing is sent, and the clock does not move, until the
+            # test advances it
+            Poller(3).check(ExecutionProbe(
+                lambda: self.assertEqual(1, clock.pendingTimers())))
+            self.assertEqual(0, clock.time())
+            clock.advance(60)
+            self.assertEqual(b'0\r\n', sock.recv(100))
+            sock.sendall(b'1MD?;1TP?\n')
+            Poller(3).check(ExecutionProbe(
+                lambda: self.assertEqual(2, clock.pendingTimers())))
+            clock.advance(60)
+            data = b''
+            while data.count(b'\r\n') < 2:
+                data += sock.recv(100)
+            # Replies are computed when the command is received
+            self.assertEqual(b'0\r\n60\r\n', data)
+            self.assertEqual(120, clock.time())
+            sock.close()
+
+if __name__ == "__main__":
+    unittest.main()
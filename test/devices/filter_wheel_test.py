@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+import unittest
+from plico_motor_server.devices.FW102B_thorlabs import FilterWheel
+
+
+class FakeFilterWheelTransport():
+
+    def __init__(self):
+        self.queries = []
+        self.position = 1
+
+    def query(self, cmd):
+        self.queries.append(cmd)
+        if cmd == 'pos?\r':
+            return 'pos?\r%d\r>' % self.position
+        self.position = int(cmd[len('pos='):])
+        return '%s>' % cmd
+
+    def close(self):
+        pass
+
+
+class FilterWheelShadowTest(unittest.TestCase):
+
+    def _createWheel(self, **kwargs):
+        wheel = FilterWheel('FilterWheel', None, 115200, **kwargs)
+        self._transport = FakeFilterWheelTransport()
+        # Skip the serial port opening
+        wheel.ser = object()
+        wheel._transport = self._transport
+        wheel._reconnectInfo.connected = True
+        return wheel
+
+    def test_every_read_queries_the_device_by_default(self):
+        wheel = self._createWheel()
+        for _ in range(3):
+            self.assertEqual(1, wheel.position(1))
+        self.assertEqual(3, len(self._transport.queries))
+
+    def test_commanded_position_is_served_without_queries(self):
+        wheel = self._createWheel(shadowRevalidationSec=3600)
+        wheel.move_to(1, 4)
+        for _ in range(3):
+            self.assertEqual(4, wheel.position(1))
+        self.assertEqual(['pos=4\r'], self._transport.queries)
+        self.assertEqual(4, wheel.last_commanded_position(1))
+
+    def test_unexpected_echo_invalidates(self):
+        wheel = self._createWheel(shadowRevalidationSec=3600)
+        self._transport.query = lambda cmd: 'pos?\r2\r>' \
+            if cmd == 'pos?\r' else 'Command error\r>'
+        wheel.move_to(1, 4)
+        self.assertEqual(2, wheel.position(1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+import unittest
+from plico_motor_server.devices.multi_motor import MultiMotor
+from plico_motor_server.devices.simulated_motor import SimulatedMotor
+
+
+class MultiMotorTest(unittest.TestCase):
+
+    def setUp(self):
+        self._x = SimulatedMotor('X')
+        self._y = SimulatedMotor('Y')
+        self._z = SimulatedMotor('Z')
+        self._motor = MultiMotor([self._x, self._y, self._z], name='XYZ')
+
+    def test_axes_are_numbered_consecutively(self):
+        self.assertEqual(3, self._motor.naxes())
+        self.assertEqual((self._y, 1), self._motor.device_axis(2))
+        self._motor.move_to(3, 33)
+        self.assertEqual(33, self._z.position(1))
+        self.assertEqual(33, self._motor.position(3))
+
+    def test_bulk_queries_keep_axes_order(self):
+        self._x.move_to(1, 1)
+        self._y.move_to(1, 2)
+        self._z.move_to(1, 3)
+        self.assertEqual([3, 1, 2], self._motor.positions([3, 1, 2]))
+        self.assertEqual([False, False], self._motor.are_moving([2, 3]))
+        self.assertEqual(([2, 1], [False, False]),
+                         self._motor.positions_and_moving([2, 1]))
+
+    def test_move_to_many(self):
+        self._motor.move_to_many({1: 10, 2: 20, 3: 30})
+        self.assertEqual([10, 20, 30], self._motor.positions([1, 2, 3]))
+
+    def test_status_all_axes(self):
+        status = self._motor.status_all_axes()
+        self.assertEqual([1, 2, 3], [s.axisno for s in status])
+        self.assertEqual('XYZ', status[0].name)
+
+
+if __name__ == "__main__":
+    unittest.main()
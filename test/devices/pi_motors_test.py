@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+import functools
+import time
+import unittest
+from plico_motor_server.devices.fake_gcs_device import FakeGCSDevice
+from plico_motor_server.devices.PI_motors import PI_E861
+from plico_motor_server.utils.simulated_clock import SimulatedClock
+
+
+class PI_E861WithFakeGCSTest(unittest.TestCase):
+
+    def setUp(self):
+        gcsDeviceClass = functools.partial(
+            FakeGCSDevice, naxes=2, velocity=0.1, referenceTimeSec=0.01)
+        self.motor = PI_E861('PI', None, None, usb_id_string='fake',
+                             naxis=2, gcsDeviceClass=gcsDeviceClass)
+
+    def test_home(self):
+        self.assertFalse(self.motor.was_homed(2))
+        self.motor.home(2)
+        self.assertTrue(self.motor.was_homed(2))
+        self.assertTrue(self.motor.gcs.qSVO(2)[2])
+
+    def test_move_and_read(self):
+        self.motor.move_to_many({1: 1000, 2: -2000})
+        self.motor.move_by(1, 500)
+        self.assertEqual([True, True], self.motor.are_moving([1, 2]))
+        # E-861 units are mm: 2000 steps take 20 ms
+        time.sleep(0.05)
+        self.assertEqual([1500, -2000], self.motor.positions([1, 2]))
+        self.assertFalse(self.motor.is_moving(1))
+        self.assertEqual(1500, self.motor.position(1))
+        self.assertEqual(1500, self.motor.last_commanded_position(1))
+
+    def test_last_commanded_position(self):
+        self.motor.move_to(2, 300)
+        self.assertEqual(300, self.motor.last_commanded_position(2))
+        # Unknown after a restart: read from the device target
+        self.motor.gcs.MOV(1, 200 * self.motor.steps_to_PIsteps)
+        self.motor.move_by(1, 50)
+        self.assertEqual(250, self.motor.last_commanded_position(1))
+
+
+class PI_E861OnSimulatedClockTest(unittest.TestCase):
+
+    def test_home(self):
+        clock = SimulatedClock()
+        gcsDeviceClass = functools.partial(
+            FakeGCSDevice, referenceTimeSec=60, timeMod=clock)
+        motor = PI_E861('PI', None, None, usb_id_string='fake',
+                        gcsDeviceClass=gcsDeviceClass, timeMod=clock)
+        motor.home_timeout = 120
+        t0 = time.time()
+        motor.home(1)
+        self.assertTrue(motor.was_homed(1))
+        self.assertGreaterEqual(clock.time(), 60)
+        self.assertLess(time.time() - t0, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
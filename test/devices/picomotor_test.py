@@ -2,15 +2,81 @@ import unittest
 from plico_motor_server.devices.picomotor import Picomotor
 
 
+class FakeSocket():
+
+    def __init__(self, chunks):
+        self.sent = []
+        self._chunks = list(chunks)
+
+    def send(self, data):
+        self.sent.append(data)
+
+    def recv(self, bufsize):
+        return self._chunks.pop(0)
+
+
 class TestPicomotor(unittest.TestCase):
 
     def setUp(self):
         self.ip = 'localhost'
         self.picomotor = Picomotor(self.ip, timeout=2, name='foo')
 
+    def _useFakeSocket(self, chunks):
+        self.picomotor._sock = FakeSocket(chunks)
+        self.picomotor._reconnectInfo.connected = True
+        return self.picomotor._sock
+
     def test_creation(self):
         self.assertEqual(self.ip, self.picomotor.ipaddr)
 
+    def test_positions_are_read_with_a_single_write(self):
+        sock = self._useFakeSocket([b'10\r\n20\r', b'\n-3\r\n'])
+        self.assertEqual([10, 20, -3], self.picomotor.positions([1, 2, 4]))
+        self.assertEqual([b'1PA?;2PA?;4PA?\n'], sock.sent)
+
+    def test_position_uses_the_buffered_reader(self):
+        sock = self._useFakeSocket([b'1', b'2\r\n3'])
+        self.assertEqual(12, self.picomotor.position(1))
+        self.assertEqual([b'1PA?\n'], sock.sent)
+        self.assertEqual(b'3', self.picomotor._reader.pending())
+
+    def test_replies_split_across_calls_are_not_lost(self):
+        self._useFakeSocket([b'10\r\n20', b'\r\n'])
+        self.assertEqual([10], self.picomotor.positions([1]))
+        self.assertEqual([20], self.picomotor.positions([2]))
+
+    def test_garbage_bytes_on_reconnection_are_skipped(self):
+        self._useFakeSocket([b'\xff\xfb\x01', b'7\r\n'])
+        self.assertEqual(7, self.picomotor.position(1))
+
+    def test_move_to_many_sends_a_single_move_write(self):
+        sock = self._useFakeSocket([b'10\r\n20\r\n'])
+        self.picomotor.move_to_many({1: 15, 2: 0})
+        self.assertEqual(b'1PR5;2PR-20\n', sock.sent[-1])
+        self.assertEqual(15, self.picomotor.last_commanded_position(1))
+
+    def test_motion_flags_are_read_with_md(self):
+        sock = self._useFakeSocket([b'0\r\n1\r\n'])
+        self.assertEqual([True, False], self.picomotor.are_moving([1, 3]))
+        self.assertEqual([b'1MD?;3MD?\n'], sock.sent)
+
+    def test_positions_and_motion_flags_share_one_write(self):
+        sock = self._useFakeSocket([b'5\r\n-2\r\n0\r\n1\r\n'])
+        positions, moving = self.picomotor.positions_and_moving([1, 2])
+        self.assertEqual([5, -2], positions)
+        self.assertEqual([True, False], moving)
+        self.assertEqual([b'1PA?;2PA?;1MD?;2MD?\n'], sock.sent)
+
+    def test_move_by_does_not_query_the_position(self):
+        sock = self._useFakeSocket([b'13\r\n'])
+        self.picomotor.move_by(2, -7)
+        self.assertEqual([b'2PR-7\n'], sock.sent)
+        # Unknown after a restart: read from the device target
+        self.assertEqual(13, self.picomotor.last_commanded_position(2))
+        self.assertEqual(b'2PA?\n', sock.sent[-1])
+        self.picomotor.move_by(2, 4)
+        self.assertEqual(17, self.picomotor.last_commanded_position(2))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+import os
+import sys
+import threading
+import unittest
+import serial
+from plico_motor_server.devices.serial_transport import SerialTransport, \
+    SerialTimeoutException
+
+
+@unittest.skipIf(sys.platform == "win32", "pty is not available on Windows")
+class SerialTransportTest(unittest.TestCase):
+
+    def setUp(self):
+        self._master, slave = os.openpty()
+        self._ser = serial.Serial(os.ttyname(slave))
+        os.close(slave)
+        self._transport = SerialTransport(self._ser, b'>', timeoutSec=0.2)
+
+    def tearDown(self):
+        self._ser.close()
+        os.close(self._master)
+
+    def _replyInChunks(self, chunks):
+        def reply():
+            os.read(self._master, 100)
+            for chunk in chunks:
+                os.write(self._master, chunk)
+        thread = threading.Thread(target=reply)
+        thread.start()
+        return thread
+
+    def test_reply_is_read_up_to_the_terminator(self):
+        thread = self._replyInChunks([b'pos?\r', b'3\r', b'>'])
+        self.assertEqual('pos?\r3\r>', self._transport.query('pos?\r'))
+        thread.join()
+
+    def test_missing_terminator_raises(self):
+        thread = self._replyInChunks([b'pos?\r3\r'])
+        self.assertRaises(SerialTimeoutException,
+                          self._transport.query, 'pos?\r')
+        thread.join()
+
+    def test_stale_bytes_are_discarded(self):
+        os.write(self._master, b'garbage>')
+        thread = self._replyInChunks([b'ok>'])
+        self.assertEqual('ok>', self._transport.query('cmd\r'))
+        thread.join()
+
+    def test_reply_with_several_terminators(self):
+        thread = self._replyInChunks([b'W?>', b'W 550.000>'])
+        self.assertEqual('W?>W 550.000>',
+                         self._transport.query('W?\r', nterminators=2))
+        thread.join()
+
+    def test_reply_of_fixed_length(self):
+        thread = self._replyInChunks([b'0'])
+        self.assertEqual('0', self._transport.queryBytes('@', 1))
+        thread.join()
+
+    def test_short_reply_of_fixed_length_raises(self):
+        thread = self._replyInChunks([b'0'])
+        self.assertRaises(SerialTimeoutException,
+                          self._transport.queryBytes, '@', 2)
+        thread.join()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -24,10 +24,24 @@ class SimulatedMotorTest(unittest.TestCase):
         self._motor.move_to(1, 123)
         self.assertEqual(123, self._motor.position(1))
 
+    def test_move_by(self):
+        self._motor.move_to(1, 123)
+        self._motor.move_by(1, -23)
+        self.assertEqual(100, self._motor.position(1))
+
     def test_velocity(self):
         self._motor.set_velocity(1, 987.6)
         self.assertEqual(987.6, self._motor.velocity(1))
 
+    def test_bulk_queries(self):
+        self._motor.move_to(1, 42)
+        self.assertEqual([42], self._motor.positions([1]))
+        self.assertEqual([False], self._motor.are_moving([1]))
+        status = self._motor.status_all_axes()
+        self.assertEqual(1, len(status))
+        self.assertEqual(42, status[0].position)
+        self.assertEqual(1, status[0].axisno)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+import os
+import unittest
+from plico_motor_server.devices.serial_transport import SerialTransport, \
+    SerialTimeoutException
+from plico_motor_server.devices.tunable_filter import TunableFilter, \
+    TunableFilterException
+
+LCTF_YAML = os.path.join(os.path.dirname(__file__), '..', '..',
+                         'plico_motor_server', 'conf', 'lctf.yaml')
+
+
+class FakeLctfSerial(object):
+    '''
+    Serial port of a fake LCTF: line commands are echoed, queries
+    before their answer, the single character ones answered with one
+    byte.
+    '''
+
+    def __init__(self, wavelength=550.0):
+        self.timeout = None
+        self.wavelength = wavelength
+        self.wlReply = None
+        self._buffer = b''
+        self.commands = []
+
+    def reset_input_buffer(self):
+        self._buffer = b''
+
+    def write(self, data):
+        cmd = data.decode('utf-8')
+        self.commands.append(cmd)
+        if cmd == '@':
+            self._buffer += b'0'
+        elif cmd == 'W?\r':
+            reply = self.wlReply or 'W %.3f\r' % self.wavelength
+            self._buffer += data + reply.encode('utf-8')
+        elif cmd.startswith('W'):
+            self.wavelength = float(cmd[1:])
+            self._buffer += data
+        else:
+            self._buffer += data
+
+    def read_until(self, terminator):
+        idx = self._buffer.find(terminator)
+        if idx < 0:
+            reply, self._buffer = self._buffer, b''
+        else:
+            end = idx + len(terminator)
+            reply, self._buffer = self._buffer[:end], self._buffer[end:]
+        return reply
+
+    def read(self, size):
+        reply, self._buffer = self._buffer[:size], self._buffer[size:]
+        return reply
+
+
+class TunableFilterTest(unittest.TestCase):
+
+    def setUp(self):
+        self._ser = FakeLctfSerial()
+        self._filter = TunableFilter(LCTF_YAML)
+        self._filter.ser = self._ser
+        self._filter._transport = SerialTransport(
+            self._ser, self._filter.currfilt.terminator,
+            self._filter.currfilt.timeout)
+
+    def test_framing_from_yaml(self):
+        self.assertEqual(b'\r', self._filter.currfilt.terminator)
+        self.assertEqual(2, self._filter.currfilt.query_reply_lines)
+        self.assertEqual(1, self._filter.currfilt.command_reply_lines)
+        self.assertEqual('\x1b', self._filter.currfilt.escape)
+
+    def test_position_skips_the_echo(self):
+        self.assertEqual(550.0, self._filter.position(1))
+        self.assertEqual(['W?\r'], self._ser.commands)
+
+    def test_move_to(self):
+        self._filter.move_to(1, 633)
+        self.assertEqual(633.0, self._filter.position(1))
+        self.assertEqual(633, self._filter.last_commanded_position(1))
+
+    def test_status_has_no_terminator(self):
+        self.assertEqual('0', self._filter.get_status())
+
+    def test_malformed_reply_raises(self):
+        self._ser.wlReply = 'W\r'
+        self.assertRaises(TunableFilterException, self._filter.position, 1)
+        self._ser.wlReply = 'W nan?\r'
+        self.assertRaises(TunableFilterException, self._filter.position, 1)
+
+    def test_missing_reply_line_forces_a_reconnect(self):
+        self._ser.wlReply = 'W 550.000'
+        self.assertRaises(SerialTimeoutException, self._filter.position, 1)
+        self.assertIsNone(self._filter.ser)
+
+
+if __name__ == "__main__":
+    unittest.main()
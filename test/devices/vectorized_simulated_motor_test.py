@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+import unittest
+from plico_motor_server.devices.vectorized_simulated_motor import \
+    VectorizedSimulatedMotor
+from test.fake_time_mod import FakeTimeMod
+
+
+class VectorizedSimulatedMotorTest(unittest.TestCase):
+
+    def setUp(self):
+        self._timeMod = FakeTimeMod(timeInvocationDurationSec=0)
+        self._motor = VectorizedSimulatedMotor(
+            3, velocity=100, acceleration=100, timeMod=self._timeMod)
+
+    def test_trapezoidal_profile(self):
+        # 1 s acceleration (50 steps), 9 s cruise, 1 s deceleration
+        self._motor.move_to(1, 1000)
+        self._timeMod.sleep(0.5)
+        self.assertEqual(12, self._motor.position(1))
+        self.assertAlmostEqual(50, self._motor.velocity(1))
+        self._timeMod.sleep(5)
+        self.assertEqual(500, self._motor.position(1))
+        self.assertAlmostEqual(100, self._motor.velocity(1))
+        self.assertTrue(self._motor.is_moving(1))
+        self._timeMod.sleep(4.5)
+        self.assertEqual(950, self._motor.position(1))
+        self._timeMod.sleep(0.5)
+        self.assertEqual(988, self._motor.position(1))
+        self.assertAlmostEqual(50, self._motor.velocity(1))
+        self._timeMod.sleep(0.5)
+        self.assertEqual(1000, self._motor.position(1))
+        self.assertFalse(self._motor.is_moving(1))
+        self.assertEqual(0, self._motor.velocity(1))
+
+    def test_triangular_profile(self):
+        self._motor.move_to(2, -25)
+        self._timeMod.sleep(0.5)
+        self.assertEqual(-12, self._motor.position(2))
+        self.assertAlmostEqual(-50, self._motor.velocity(2))
+        self._timeMod.sleep(0.5)
+        self.assertEqual(-25, self._motor.position(2))
+        self.assertFalse(self._motor.is_moving(2))
+
+    def test_axes_move_independently(self):
+        self._motor.move_to_many({1: 1000, 3: 25})
+        self._timeMod.sleep(1)
+        positions, moving = self._motor.positions_and_moving([1, 2, 3])
+        self.assertEqual([50, 0, 25], positions)
+        self.assertEqual([True, False, False], moving)
+        self.assertEqual(1000, self._motor.last_commanded_position(1))
+
+    def test_retarget_keeps_speed(self):
+        self._motor.move_to(1, 1000)
+        self._timeMod.sleep(2)
+        self._motor.move_to(1, 2000)
+        self.assertAlmostEqual(100, self._motor.velocity(1))
+        self._timeMod.sleep(1)
+        self.assertEqual(250, self._motor.position(1))
+
+    def test_stop_decelerates(self):
+        self._motor.move_to(1, 1000)
+        self._timeMod.sleep(2)
+        self._motor.stop(1)
+        self._timeMod.sleep(2)
+        self.assertEqual(200, self._motor.position(1))
+        self.assertFalse(self._motor.is_moving(1))
+
+    def test_move_by_and_home(self):
+        self._motor.move_to(1, 20)
+        self._timeMod.sleep(10)
+        self._motor.move_by(1, -10)
+        self._timeMod.sleep(10)
+        self.assertEqual(10, self._motor.position(1))
+        self.assertFalse(self._motor.was_homed(1))
+        self._motor.home(1)
+        self._timeMod.sleep(10)
+        self.assertEqual(0, self._motor.position(1))
+        self.assertTrue(self._motor.was_homed(1))
+
+    def test_set_velocity(self):
+        self._motor.set_velocity(1, 10)
+        self._motor.move_to(1, 100)
+        self._timeMod.sleep(5)
+        self.assertAlmostEqual(10, self._motor.velocity(1))
+        self.assertRaises(ValueError, self._motor.set_velocity, 1, 0)
+
+    def test_io_latency(self):
+        motor = VectorizedSimulatedMotor(2, ioLatencySec=0.01,
+                                         timeMod=self._timeMod)
+        motor.positions([1, 2])
+        self.assertEqual(0.01, self._timeMod.getLastSleepDurationSec())
+
+    def test_status_all_axes(self):
+        self._motor.move_to(3, 1000)
+        self._timeMod.sleep(1)
+        status = self._motor.status_all_axes()
+        self.assertEqual(3, len(status))
+        self.assertEqual(3, status[2].axisno)
+        self.assertEqual(50, status[2].position)
+        self.assertTrue(status[2].is_moving)
+        self.assertEqual(1000, status[2].last_commanded_position)
+
+    def test_invalid_axis(self):
+        self.assertRaises(ValueError, self._motor.position, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
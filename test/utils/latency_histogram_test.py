@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+import unittest
+from plico_motor_server.utils.latency_histogram import LatencyHistogram, \
+    LoopStatistics
+
+
+class LatencyHistogramTest(unittest.TestCase):
+
+    def test_empty(self):
+        h = LatencyHistogram()
+        self.assertEqual(0, h.count())
+        self.assertEqual(0.0, h.percentile(50))
+
+    def test_percentiles_within_one_bucket(self):
+        h = LatencyHistogram(bucketsPerDecade=10)
+        for _ in range(98):
+            h.record(1e-3)
+        h.record(0.1)
+        h.record(0.5)
+        self.assertAlmostEqual(1e-3, h.percentile(50), delta=0.26e-3)
+        self.assertAlmostEqual(0.1, h.percentile(99), delta=0.026)
+        self.assertEqual(0.5, h.max())
+        self.assertEqual(100, h.summary()['count'])
+
+    def test_overflow_uses_max(self):
+        h = LatencyHistogram(maxSec=1.0)
+        h.record(42.0)
+        self.assertEqual(42.0, h.percentile(99))
+
+
+class LoopStatisticsTest(unittest.TestCase):
+
+    def test_timing(self):
+        stats = LoopStatistics()
+        with stats.timing('foo'):
+            pass
+        stats.record('bar', 0.01)
+        summary = stats.summary()
+        self.assertEqual(1, summary['foo']['count'])
+        self.assertEqual(0.01, summary['bar']['max'])
+        self.assertIn('bar: n=1', stats.format())
+        stats.reset()
+        self.assertEqual({}, stats.summary())
+
+
+if __name__ == "__main__":
+    unittest.main()
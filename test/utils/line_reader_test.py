@@ -0,0 +1,61 @@
+import unittest
+from plico_motor_server.utils.line_reader import LineReader
+
+
+class ChunkSource():
+
+    def __init__(self, chunks):
+        self._chunks = list(chunks)
+
+    def recv(self, bufsize):
+        if len(self._chunks) == 0:
+            return b''
+        return self._chunks.pop(0)
+
+
+class LineReaderTest(unittest.TestCase):
+
+    def _reader(self, chunks):
+        return LineReader(ChunkSource(chunks).recv)
+
+    def test_one_line_per_read(self):
+        reader = self._reader([b'1\r\n', b'2\r\n'])
+        self.assertEqual(b'1', reader.readline())
+        self.assertEqual(b'2', reader.readline())
+
+    def test_coalesced_lines_are_not_lost(self):
+        reader = self._reader([b'1\r\n2\r\n3'])
+        self.assertEqual(b'1', reader.readline())
+        self.assertEqual(b'2', reader.readline())
+        self.assertEqual(b'3', reader.pending())
+
+    def test_terminator_split_across_reads(self):
+        reader = self._reader([b'12', b'34\r', b'\n'])
+        self.assertEqual(b'1234', reader.readline())
+        self.assertEqual(b'', reader.pending())
+
+    def test_telnet_negotiation_is_stripped(self):
+        reader = self._reader([b'\xff\xfb\x01\xff\xfd\x03', b'7\r\n'])
+        self.assertEqual(b'7', reader.readline())
+
+    def test_telnet_sequence_split_across_reads(self):
+        reader = self._reader([b'5\xff', b'\xfb', b'\x01\r\n'])
+        self.assertEqual(b'5', reader.readline())
+
+    def test_telnet_subnegotiation_and_escaped_iac(self):
+        reader = self._reader([b'\xff\xfa\x18\x01\xff\xf0a\xff\xffb\r\n'])
+        self.assertEqual(b'a\xffb', reader.readline())
+
+    def test_reset_discards_pending_bytes(self):
+        reader = self._reader([b'ok\r\n'])
+        reader.feed(b'stale\xff')
+        reader.reset()
+        self.assertEqual(b'ok', reader.readline())
+
+    def test_closed_connection_raises(self):
+        reader = self._reader([b'1'])
+        self.assertRaises(ConnectionResetError, reader.readline)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+import unittest
+import numpy as np
+from plico_motor_server.utils.position_history import PositionHistory
+
+
+class PositionHistoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self._history = PositionHistory(4)
+
+    def _fill(self, n):
+        for i in range(n):
+            self._history.append(float(i), 10 * i, i % 2 == 1)
+
+    def test_empty(self):
+        self.assertEqual(0, len(self._history))
+        self.assertEqual(0, len(self._history.samples()))
+
+    def test_samples_oldest_first(self):
+        self._fill(3)
+        samples = self._history.samples()
+        np.testing.assert_array_equal([0, 1, 2], samples['timestamp'])
+        np.testing.assert_array_equal([0, 10, 20], samples['position'])
+        np.testing.assert_array_equal([False, True, False],
+                                      samples['is_moving'])
+
+    def test_oldest_samples_are_overwritten(self):
+        self._fill(7)
+        self.assertEqual(4, len(self._history))
+        np.testing.assert_array_equal(
+            [3, 4, 5, 6], self._history.samples()['timestamp'])
+
+    def test_since_is_exclusive(self):
+        self._fill(7)
+        np.testing.assert_array_equal(
+            [5, 6], self._history.samples(since=4)['timestamp'])
+        self.assertEqual(0, len(self._history.samples(since=6)))
+
+    def test_paging_with_max_samples(self):
+        self._fill(7)
+        page = self._history.samples(maxSamples=3)
+        np.testing.assert_array_equal([3, 4, 5], page['timestamp'])
+        page = self._history.samples(since=page['timestamp'][-1],
+                                     maxSamples=3)
+        np.testing.assert_array_equal([6], page['timestamp'])
+
+    def test_samples_are_a_copy(self):
+        self._fill(2)
+        samples = self._history.samples()
+        self._fill(4)
+        np.testing.assert_array_equal([0, 1], samples['timestamp'])
+
+    def test_invalid_capacity(self):
+        self.assertRaises(ValueError, PositionHistory, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
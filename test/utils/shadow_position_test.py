@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+import unittest
+from test.fake_time_mod import FakeTimeMod
+from plico_motor_server.utils.shadow_position import ShadowPosition
+
+
+class ShadowPositionTest(unittest.TestCase):
+
+    def setUp(self):
+        self._timeMod = FakeTimeMod(timeInvocationDurationSec=0)
+        self._shadow = ShadowPosition(10.0, timeMod=self._timeMod)
+        self._devicePosition = 3
+
+    def _read(self):
+        return self._devicePosition
+
+    def test_first_get_reads_the_device(self):
+        self.assertIsNone(self._shadow.cached())
+        self.assertEqual(3, self._shadow.get(self._read))
+        self.assertEqual(1, self._shadow.reads())
+
+    def test_known_position_is_served_without_reads(self):
+        self._shadow.set(5)
+        for _ in range(10):
+            self.assertEqual(5, self._shadow.get(self._read))
+        self.assertEqual(0, self._shadow.reads())
+
+    def test_revalidation_catches_manual_changes(self):
+        self._shadow.get(self._read)
+        self._devicePosition = 4
+        self._timeMod.sleep(9.9)
+        self.assertEqual(3, self._shadow.get(self._read))
+        self._timeMod.sleep(0.1)
+        self.assertEqual(4, self._shadow.get(self._read))
+        self.assertEqual(2, self._shadow.reads())
+
+    def test_invalidate(self):
+        self._shadow.set(5)
+        self._shadow.invalidate()
+        self.assertEqual(3, self._shadow.get(self._read))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+import time
+import unittest
+from plico.utils.logger import Logger
+from plico_motor_server.utils.simulated_clock import SimulatedClock
+from plico_motor_server.controller.adaptive_control_loop import \
+    AdaptiveRateControlLoop
+from plico_motor_server.controller.controller import MotorController
+from plico_motor_server.devices.vectorized_simulated_motor import \
+    VectorizedSimulatedMotor
+
+
+class MyRpcHandler():
+
+    def handleRequest(self, obj, socket, multi):
+        pass
+
+    def publishPickable(self, socket, anObject):
+        pass
+
+
+class SimulatedClockTest(unittest.TestCase):
+
+    def setUp(self):
+        self._clock = SimulatedClock(startTime=100)
+
+    def test_sleep_advances_the_clock(self):
+        self.assertEqual(100, self._clock.time())
+        self._clock.sleep(3600)
+        self.assertEqual(3700, self._clock.time())
+        self.assertEqual(3700, self._clock.monotonic())
+
+    def test_time_never_goes_backwards(self):
+        self._clock.advanceTo(50)
+        self.assertEqual(100, self._clock.time())
+        self.assertRaises(ValueError, self._clock.advance, -1)
+
+    def test_actions_are_called_in_time_order(self):
+        calls = []
+        self._clock.callAt(130, lambda: calls.append(
+            ('b', self._clock.time())))
+        self._clock.callLater(10, lambda: calls.append(
+            ('a', self._clock.time())))
+        self._clock.sleep(20)
+        self.assertEqual([('a', 110)], calls)
+        self._clock.sleep(20)
+        self.assertEqual([('a', 110), ('b', 130)], calls)
+        self.assertEqual(140, self._clock.time())
+        self.assertEqual(0, self._clock.pendingTimers())
+
+    def test_speedup_waits_in_real_time(self):
+        clock = SimulatedClock(speedup=100)
+        t0 = time.time()
+        clock.sleep(5)
+        self.assertGreaterEqual(time.time() - t0, 0.05)
+        self.assertEqual(5, clock.time())
+
+
+class SimulatedScanTest(unittest.TestCase):
+
+    def test_hour_long_scan_runs_in_simulated_time(self):
+        clock = SimulatedClock()
+        motor = VectorizedSimulatedMotor(2, velocity=100, acceleration=10,
+                                         timeMod=clock)
+        ctrl = MotorController('scan', None, motor, None, None,
+                               MyRpcHandler(), timeMod=clock,
+                               fastLoopPeriodSec=30, idleLoopPeriodSec=60)
+        positions = []
+        for i in range(6):
+            clock.callAt(i * 600, lambda i=i: ctrl.move_to(1, 50000 * i))
+            clock.callAt(i * 600 + 590, lambda: positions.append(
+                motor.position(1)))
+        clock.callAt(3600, ctrl.terminate)
+        t0 = time.time()
+        AdaptiveRateControlLoop(ctrl, Logger.of('scan'), clock).start()
+        self.assertLess(time.time() - t0, 10)
+        self.assertEqual([50000 * i for i in range(6)], positions)
+        self.assertGreaterEqual(clock.time(), 3600)
+
+
+if __name__ == "__main__":
+    unittest.main()